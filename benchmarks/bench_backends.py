@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Compara os backends de inferência (pytorch, pytorch-int8, onnx).
+
+Cada backend roda num subprocesso separado para que o consumo de memória
+(RSS) seja medido isoladamente. Reporta tempo de carga, memória, latência
+p50/p95 por email, vazão em lote e a paridade com o backend eager.
+
+Uso: python benchmarks/bench_backends.py [--backends pytorch,onnx] [--samples 64]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np  # noqa: E402
+
+
+def sample_texts(count):
+    samples = [
+        (BASE_DIR / name).read_text(encoding='utf-8')
+        for name in ('exemplo_email_produtivo.txt', 'exemplo_email_neutro.txt',
+                     'exemplo_email_improdutivo.txt')
+    ]
+    texts = []
+    for i in range(count):
+        text = samples[i % len(samples)]
+        # Variar o tamanho para que o lote tenha preenchimento realista
+        texts.append(text[: 200 + (i * 97) % max(1, len(text) - 200)])
+    return texts
+
+
+def run_worker(name, count, batch_size):
+    import config
+    from email_analyzer.backends import current_rss_mb, load_backend
+
+    texts = sample_texts(count)
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    backend = load_backend(name, config.HUGGING_FACE_MODEL)
+    load_seconds = time.perf_counter() - started
+    rss_loaded = current_rss_mb()
+
+    backend.predict_proba(texts[:2])  # aquecimento
+    latencies = []
+    for text in texts:
+        started = time.perf_counter()
+        backend.predict_proba([text])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    probabilities = np.concatenate([
+        backend.predict_proba(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+    ])
+    batch_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        'backend': name,
+        'load_seconds': round(load_seconds, 3),
+        'rss_model_mb': round(rss_loaded - rss_before, 1),
+        'rss_peak_mb': round(current_rss_mb(), 1),
+        'latency_ms_p50': round(float(np.percentile(latencies, 50)) * 1000, 2),
+        'latency_ms_p95': round(float(np.percentile(latencies, 95)) * 1000, 2),
+        'batch_throughput_per_sec': round(len(texts) / batch_seconds, 2),
+        'probabilities': probabilities.tolist(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--backends', default='pytorch,pytorch-int8,onnx')
+    parser.add_argument('--samples', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.samples, args.batch_size)
+        return
+
+    from email_analyzer.backends import compare_probabilities
+
+    results = {}
+    for name in args.backends.split(','):
+        completed = subprocess.run(
+            [sys.executable, __file__, '--worker', name,
+             '--samples', str(args.samples), '--batch-size', str(args.batch_size)],
+            capture_output=True, text=True, env=dict(os.environ, TRANSFORMERS_VERBOSITY='error')
+        )
+        if completed.returncode != 0:
+            print(f"{name}: falhou\n{completed.stderr.strip().splitlines()[-1:]}")
+            continue
+        results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    reference = results.get('pytorch')
+    header = f"{'backend':<14}{'carga (s)':>10}{'RSS (MB)':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'lote/s':>10}  paridade"
+    print(header)
+    for name, result in results.items():
+        parity = '-'
+        if reference is not None and name != 'pytorch':
+            report = compare_probabilities(reference['probabilities'], result['probabilities'])
+            parity = (f"{'ok' if report['passed'] else 'FALHOU'} "
+                      f"(acordo {report['label_agreement']:.0%}, Δmax {report['max_abs_diff']:.4f})")
+        print(f"{name:<14}{result['load_seconds']:>10}{result['rss_model_mb']:>10}"
+              f"{result['latency_ms_p50']:>10}{result['latency_ms_p95']:>10}"
+              f"{result['batch_throughput_per_sec']:>10}  {parity}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark do armazenamento deduplicado e comprimido dos corpos.
+
+Gera N emails (padrão: 200 mil) em que parte vem de campanhas em massa (o
+mesmo corpo repetido milhares de vezes) e o resto é texto único, com
+respostas sugeridas dos modelos do classificador. Grava o mesmo conjunto em
+duas bases SQLite: uma tabela com o texto inline (como antes) e o
+EmailMessage atual via bulk_create. Compara o espaço das tabelas de emails
+(o índice de busca, que só existe na segunda base, é mostrado à parte), o
+tempo de gravação e o de ler todos os corpos.
+
+Uso: python benchmarks/bench_body_store.py [--count N] [--mass-share 0.7]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+CAMPAIGNS = 300
+RESPONSES = [
+    'Obrigado pelo contato. Vamos analisar sua solicitação e retornaremos em breve.',
+    'Recebemos seu email e já encaminhamos para a equipe responsável.',
+    'Agradecemos a mensagem! No momento não há ação necessária da nossa parte.',
+    'Obrigado pelo retorno. Seguimos à disposição para qualquer dúvida.',
+]
+
+
+def setup_django(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web_django.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def make_corpus(count, mass_share, rng):
+    words = ' '.join((BASE_DIR / f'exemplo_email_{name}.txt').read_text(encoding='utf-8')
+                     for name in ('produtivo', 'improdutivo', 'neutro')).split()
+
+    def text(length):
+        return ' '.join(rng.choice(words) for _ in range(length))
+
+    campaigns = [text(500) for _ in range(CAMPAIGNS)]
+    for i in range(count):
+        content = rng.choice(campaigns) if rng.random() < mass_share else text(rng.randint(80, 400))
+        yield f'Assunto {i}', content, f'user{i % 5000}@empresa.com', rng.choice(RESPONSES)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def inline_baseline(path, corpus, batch):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE email (id INTEGER PRIMARY KEY, subject TEXT, content TEXT, "
+                       "sender TEXT, suggested_response TEXT)")
+
+    def write():
+        for start in range(0, len(corpus), batch):
+            connection.executemany("INSERT INTO email (subject, content, sender, suggested_response) "
+                                   "VALUES (?, ?, ?, ?)", corpus[start:start + batch])
+            connection.commit()
+
+    def read():
+        return sum(len(content) for content, in connection.execute("SELECT content FROM email"))
+
+    write_time, _ = timed(write)
+    read_time, chars = timed(read)
+    connection.execute('VACUUM')
+    sizes = table_sizes(connection.cursor())
+    connection.close()
+    return sizes, (write_time, read_time, chars)
+
+
+def body_store(corpus, batch):
+    from email_analyzer.body_store import attach_bodies, decode
+    from email_analyzer.models import EmailMessage
+
+    def write():
+        # Tempo de attach_bodies (hash, compressão e consulta dos corpos) à parte
+        # do resto do bulk_create (ORM e índice de busca)
+        storing = 0.0
+        for start in range(0, len(corpus), batch):
+            emails = [
+                EmailMessage(subject=subject, content=content, sender=sender,
+                             suggested_response=response, is_processed=True)
+                for subject, content, sender, response in corpus[start:start + batch]
+            ]
+            storing += timed(lambda: attach_bodies(emails))[0]
+            EmailMessage.objects.bulk_create(emails)
+        return storing
+
+    def read():
+        # Mesma leitura crua da base inline, mais a junção e a descompressão
+        rows = EmailMessage.objects.values_list('content_body__data', 'content_body__codec')
+        return sum(len(decode(data, codec)) for data, codec in rows.iterator(chunk_size=2000))
+
+    write_time, storing = timed(write)
+    read_time, chars = timed(read)
+    return write_time, read_time, chars, storing
+
+
+def table_sizes(cursor):
+    """Bytes per table (indexes included) from SQLite's dbstat: (data, search index)"""
+    cursor.execute("SELECT coalesce(tbl_name, dbstat.name), sum(pgsize) FROM dbstat "
+                   "LEFT JOIN sqlite_master ON sqlite_master.name = dbstat.name GROUP BY 1")
+    data = search = 0
+    for table, size in cursor.fetchall():
+        if table.startswith('email_analyzer_emailsearch'):
+            search += size
+        elif table.startswith('email'):
+            data += size
+    return data, search
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=200_000)
+    parser.add_argument('--mass-share', type=float, default=0.7)
+    parser.add_argument('--batch', type=int, default=1000)
+    args = parser.parse_args()
+
+    corpus = list(make_corpus(args.count, args.mass_share, random.Random(42)))
+    with tempfile.TemporaryDirectory() as tmp:
+        inline_path = Path(tmp) / 'inline.sqlite3'
+        store_path = Path(tmp) / 'store.sqlite3'
+        inline_sizes, inline = inline_baseline(inline_path, corpus, args.batch)
+
+        setup_django(store_path)
+        from django.db import connection
+        from email_analyzer.body_store import space_report
+        store = body_store(corpus, args.batch)
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+            store_sizes = table_sizes(cursor)
+        report = space_report()
+
+        print(f"{args.count} emails, {args.mass_share:.0%} de campanhas em massa")
+        print(f"{'':<16} {'emails (MB)':>12} {'busca (MB)':>11} {'gravação (s)':>13} {'leitura (s)':>12}")
+        for label, (data, search), (write_time, read_time, *_) in (('texto inline', inline_sizes, inline),
+                                                                  ('EmailBody', store_sizes, store)):
+            print(f"{label:<16} {data / 2**20:>12.1f} {search / 2**20:>11.1f} {write_time:>13.2f} {read_time:>12.2f}")
+        print(f"gravação do EmailBody: {store[3]:.2f}s em attach_bodies, o resto é ORM e índice de busca")
+        print(f"corpos distintos: {report['bodies']}  deduplicação {report['dedup_ratio']:.1f}x  "
+              f"compressão {report['compression_ratio']:.1f}x  "
+              f"texto {report['logical_bytes'] / 2**20:.1f} MB -> {report['stored_bytes'] / 2**20:.1f} MB")
+        assert inline[2] == store[2], "leitura divergente"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark da lista de emails (paginação por cursor vs. OFFSET).
+
+Cria bancos SQLite temporários com 1 mil, 100 mil e 1 milhão de emails (com
+um corpo de ~2 KB compartilhado) e mede a renderização completa da view email_list na
+primeira página, numa página profunda (seguindo cursores) e com filtros.
+Para comparação, mede a mesma página profunda lida com OFFSET.
+
+Uso: python benchmarks/bench_email_list.py [--sizes 1000 100000 1000000] [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+SENDERS = [f'user{i}@empresa.com' for i in range(500)]
+DEEP_PAGE = 0.9  # Fração da tabela pulada pela página profunda
+
+
+def setup_django(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web_django.settings')
+    import django
+    django.setup()
+    from django.test import override_settings
+    # Sem collectstatic não há manifesto para o storage do whitenoise
+    override_settings(STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    }).enable()
+
+
+def fill(count, batch=50_000):
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    call_command('migrate', verbosity=0)
+
+    from email_analyzer.body_store import digest, encode
+
+    rng = random.Random(42)
+    body = 'Conteúdo do email com o histórico da conversa. ' * 40
+    with connection.cursor() as cursor:
+        codec, data = encode(body)
+        cursor.execute("INSERT INTO email_analyzer_emailbody (id, digest, codec, data, size) VALUES (1, %s, %s, %s, %s)",
+                       [digest(body), codec, data, len(body.encode('utf-8'))])
+    start = datetime(2024, 1, 1)
+    sql = ("INSERT INTO email_analyzer_emailmessage (id, subject, content_body_id, preview, sender, received_date, "
+           "category, confidence_score, is_processed, claimed_by, attempts, last_error) "
+           "VALUES (%s, 'Assunto', 1, %s, %s, %s, %s, %s, 1, '', 0, '')")
+    for first in range(1, count + 1, batch):
+        rows = [
+            # Alguns emails compartilham o mesmo instante, como num import em lote;
+            # a data vai no formato em que o Django grava no SQLite (UTC, sem fuso)
+            (i, body[:100], rng.choice(SENDERS),
+             (start + timedelta(seconds=i // 3)).strftime('%Y-%m-%d %H:%M:%S'),
+             rng.choice(['produtivo', 'improdutivo']), rng.random())
+            for i in range(first, min(first + batch, count + 1))
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def deep_cursor(count):
+    """Cursor of the row DEEP_PAGE of the way through the newest-first order"""
+    from email_analyzer.models import EmailMessage
+    from email_analyzer.pagination import encode_cursor
+    received_date, pk = (EmailMessage.objects.order_by('-received_date', '-id')
+                         .values_list('received_date', 'id')[int(count * DEEP_PAGE)])
+    return encode_cursor(received_date, pk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'bench.sqlite3'
+        setup_django(db_path)
+        import config
+        from django.db import connection
+        from django.test import RequestFactory
+        from email_analyzer.forms import EmailListFilterForm
+        from email_analyzer.models import EmailMessage
+        from email_analyzer.pagination import decode_cursor, keyset_page
+        from email_analyzer.views import email_list
+
+        factory = RequestFactory()
+
+        def render(query):
+            response = email_list(factory.get('/email/list/', query))
+            assert response.status_code == 200
+            return response.content.count(b'class="email-card"')
+
+        def query(params):
+            # Mesma consulta da view, sem o template
+            emails = EmailListFilterForm(params).filter(EmailMessage.objects.defer('last_error'))
+            rows, _, _ = keyset_page(emails, config.EMAIL_LIST_PAGE_SIZE, after=decode_cursor(params.get('after')))
+            return len(rows)
+
+        def offset_page(offset):
+            return len(EmailMessage.objects.order_by('-received_date', '-id')
+                       [offset:offset + config.EMAIL_LIST_PAGE_SIZE])
+
+        print(f"{'emails':>9} {'cenário':<28} {'linhas':>7} {'consulta (ms)':>14} {'view (ms)':>10}")
+        for count in args.sizes:
+            # Cada tamanho usa um banco novo
+            connection.close()
+            db_path.unlink(missing_ok=True)
+            began = time.perf_counter()
+            fill(count)
+            print(f"{count} emails gravados em {time.perf_counter() - began:.1f}s")
+
+            cursor = deep_cursor(count)
+            scenarios = [
+                ('primeira página', {}),
+                ('página profunda (cursor)', {'after': cursor}),
+                ('categoria + confiança', {'category': 'produtivo', 'confidence': 'otimo'}),
+                ('remetente', {'sender': SENDERS[7]}),
+                ('profunda + categoria', {'category': 'improdutivo', 'after': cursor}),
+            ]
+            for label, params in scenarios:
+                query_time, rows = timed(lambda: query(params), args.repeat)
+                view_time, _ = timed(lambda: render(params), args.repeat)
+                print(f"{count:>9} {label:<28} {rows:>7} {query_time * 1000:>14.2f} {view_time * 1000:>10.2f}")
+            query_time, rows = timed(lambda: offset_page(int(count * DEEP_PAGE)), args.repeat)
+            print(f"{count:>9} {'página profunda (OFFSET)':<28} {rows:>7} {query_time * 1000:>14.2f} {'-':>10}")
+
+
+if __name__ == '__main__':
+    main()
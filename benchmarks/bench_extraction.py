@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark da extração do corpo antes da classificação.
+
+Monta mensagens MIME de 100 KB a 8 MB (texto novo curto, versão HTML,
+histórico citado e um anexo base64 que cresce com o tamanho) e compara o
+tempo de classificar a mensagem bruta com o de extrair o corpo e classificar
+só o texto novo.
+
+Uso: python benchmarks/bench_extraction.py [--repeat N]
+"""
+
+import argparse
+import base64
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from email_analyzer.extraction import extract_body  # noqa: E402
+from email_analyzer.nlp_processor import EmailProcessor  # noqa: E402
+
+SIZES = [100_000, 1_000_000, 4_000_000, 8_000_000]
+
+
+def build_message(size):
+    """Multipart com texto novo curto, HTML, citação e anexo ocupando o resto"""
+    new_text = (BASE_DIR / 'exemplo_email_produtivo.txt').read_text(encoding='utf-8')
+    quoted = ''.join(f"> {line}\n" for line in new_text.splitlines()) * 20
+    plain = f"{new_text}\n\nEm seg., 1 de jan. de 2024, Fulano <fulano@empresa.com> escreveu:\n{quoted}"
+    html = f"<html><body><p>{new_text}</p><div class=\"gmail_quote\"><blockquote>{quoted}</blockquote></div></body></html>"
+    head = (
+        "From: gerente@empresa.com\nSubject: Projeto\nMIME-Version: 1.0\n"
+        "Content-Type: multipart/mixed; boundary=\"outer\"\n\n"
+        "--outer\nContent-Type: multipart/alternative; boundary=\"alt\"\n\n"
+        f"--alt\nContent-Type: text/plain; charset=utf-8\n\n{plain}\n"
+        f"--alt\nContent-Type: text/html; charset=utf-8\n\n{html}\n--alt--\n"
+        "--outer\nContent-Type: application/pdf\nContent-Transfer-Encoding: base64\n"
+        "Content-Disposition: attachment; filename=\"anexo.pdf\"\n\n"
+    )
+    attachment_size = max(0, size - len(head.encode('utf-8'))) * 3 // 4
+    attachment = base64.encodebytes(os.urandom(attachment_size)).decode('ascii')
+    return (head + attachment + "--outer--\n").encode('utf-8')
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    processor = EmailProcessor(load_model=False)
+
+    def classify(text):
+        return processor._classify_processed(processor.preprocess_text(text))
+
+    print(f"{'tamanho':>10} {'texto novo':>11} {'bruto (ms)':>11} {'extraído (ms)':>14} {'speed-up':>9}")
+    for size in SIZES:
+        raw = build_message(size)
+        raw_time, _ = timed(lambda: classify(raw.decode('utf-8')), args.repeat)
+        new_time, body = timed(lambda: extract_body(raw), args.repeat)
+        classify_time, _ = timed(lambda: classify(body), args.repeat)
+        total = new_time + classify_time
+        print(f"{len(raw):>10} {len(body):>11} {raw_time * 1000:>11.2f} {total * 1000:>14.2f} {raw_time / total:>8.1f}x")
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('TRANSFORMERS_VERBOSITY', 'error')
+    main()
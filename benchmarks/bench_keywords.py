@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cálculo de confiança por palavras-chave.
+
+Compara a implementação anterior (um ``word in text`` / ``text.count(word)``
+por palavra-chave e por fator) com o KeywordMatcher compilado, em emails de
+1 KB a 1 MB, e verifica que os scores são idênticos.
+
+Uso: python benchmarks/bench_keywords.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from email_analyzer.keywords import (  # noqa: E402
+    PRODUCTIVE_KEYWORDS, UNPRODUCTIVE_KEYWORDS, WORK_CONTEXT_INDICATORS,
+    SPAM_CONTEXT_INDICATORS, WORK_INDICATOR_GROUPS, PRODUCTIVE_COMBINATIONS,
+    UNPRODUCTIVE_COMBINATIONS, BOOST_COMBINATIONS, FORMAL_LANGUAGE,
+    SPECIFIC_DETAILS, PRODUCTIVE_STRUCTURE, UNPRODUCTIVE_CALL_TO_ACTION,
+    UNPRODUCTIVE_BLESSINGS, EMOJIS, PRODUCTIVE_TIEBREAK, UNPRODUCTIVE_TIEBREAK,
+)
+from email_analyzer.nlp_processor import EmailProcessor  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+class LegacyScorer:
+    """Padrão de acesso anterior: cada fator reescaneia o texto inteiro"""
+
+    def keyword_factor(self, text, category):
+        keywords = PRODUCTIVE_KEYWORDS if category == 'produtivo' else UNPRODUCTIVE_KEYWORDS
+        combinations = PRODUCTIVE_COMBINATIONS if category == 'produtivo' else UNPRODUCTIVE_COMBINATIONS
+        found = sum(1 for word in keywords if word in text)
+        frequency = 0
+        for word in keywords:
+            frequency += text.count(word)
+        position_bonus = 0
+        first_line = text.split('\n')[0].lower()
+        for word in keywords:
+            if word in first_line:
+                position_bonus += 0.1
+        combination_bonus = 0
+        for combination in combinations:
+            if all(word in text for word in combination):
+                combination_bonus += 0.15
+        base = {0: 0.2, 1: 0.4, 2: 0.6, 3: 0.75}.get(found, 0.9)
+        score = base + min(0.1, frequency * 0.02) + position_bonus + combination_bonus
+        return min(0.95, max(0.1, score))
+
+    def structure_factor(self, text, category):
+        lines = text.split('\n')
+        word_count = len(text.split())
+        indicators = 0
+        if category == 'produtivo':
+            indicators += any(':' in line for line in lines)
+            indicators += word_count > 50
+            indicators += any(line.strip().startswith('-') for line in lines)
+            indicators += any(word in text for word in PRODUCTIVE_STRUCTURE)
+        else:
+            indicators += any(any(emoji in line for emoji in EMOJIS) for line in lines)
+            indicators += any(word in text for word in UNPRODUCTIVE_CALL_TO_ACTION)
+            indicators += any(word in text for word in UNPRODUCTIVE_BLESSINGS)
+            indicators += word_count < 30
+        return min(0.9, 0.4 + (indicators * 0.15))
+
+    def context_factor(self, text, category):
+        words = WORK_CONTEXT_INDICATORS if category == 'produtivo' else SPAM_CONTEXT_INDICATORS
+        matches = sum(1 for word in words if word in text)
+        return 0.8 if matches >= 2 else 0.6 if matches == 1 else 0.4
+
+    def boost(self, confidence, text):
+        indicators = sum(1 for group in WORK_INDICATOR_GROUPS if any(word in text for word in group))
+        boost = 0.0
+        for threshold, value in ((6, 0.25), (5, 0.20), (4, 0.15), (3, 0.10), (2, 0.05)):
+            if indicators >= threshold:
+                boost += value
+                break
+        for combination in BOOST_COMBINATIONS:
+            if all(word in text for word in combination):
+                boost += 0.10
+        if any(word in text for word in FORMAL_LANGUAGE):
+            boost += 0.05
+        if any(word in text for word in SPECIFIC_DETAILS):
+            boost += 0.05
+        return confidence + boost
+
+    def enhanced(self, base, text, category):
+        confidence = (
+            base * 0.4 +
+            self.keyword_factor(text, category) * 0.3 +
+            self.structure_factor(text, category) * 0.2 +
+            self.context_factor(text, category) * 0.1
+        )
+        if category == 'produtivo':
+            confidence = self.boost(confidence, text)
+        return max(0.0, min(1.0, confidence))
+
+    def classify(self, text):
+        productive = sum(1 for word in PRODUCTIVE_KEYWORDS if word in text)
+        unproductive = sum(1 for word in UNPRODUCTIVE_KEYWORDS if word in text)
+        if productive > unproductive:
+            return 'produtivo', self.enhanced(0.7, text, 'produtivo')
+        if unproductive > productive:
+            return 'improdutivo', self.enhanced(0.7, text, 'improdutivo')
+        if any(word in text for word in PRODUCTIVE_TIEBREAK):
+            return 'produtivo', self.enhanced(0.6, text, 'produtivo')
+        if any(word in text for word in UNPRODUCTIVE_TIEBREAK):
+            return 'improdutivo', self.enhanced(0.6, text, 'improdutivo')
+        return 'improdutivo', 0.5
+
+
+def build_text(processor, size):
+    samples = [
+        (BASE_DIR / name).read_text(encoding='utf-8')
+        for name in ('exemplo_email_produtivo.txt', 'exemplo_email_neutro.txt',
+                     'exemplo_email_improdutivo.txt')
+    ]
+    corpus = processor.preprocess_text(' '.join(samples))
+    return (corpus * (size // len(corpus) + 1))[:size]
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    processor = EmailProcessor(load_model=False)
+    legacy = LegacyScorer()
+
+    print(f"{'tamanho':>10} {'anterior (ms)':>14} {'compilado (ms)':>15} {'speed-up':>9}")
+    for size in SIZES:
+        text = build_text(processor, size)
+        old_time, old_result = timed(lambda: legacy.classify(text), args.repeat)
+        new_time, new_result = timed(lambda: processor._keyword_based_classification(text), args.repeat)
+        assert old_result == new_result, (size, old_result, new_result)
+        print(f"{size:>10} {old_time * 1000:>14.2f} {new_time * 1000:>15.2f} {old_time / new_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('TRANSFORMERS_VERBOSITY', 'error')
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca de quase-duplicatas (SimHash + bandas indexadas).
+
+Cria um banco SQLite temporário com N emails e impressões digitais
+aleatórias (padrão: 1 milhão), mais alguns emails reais, e mede a latência
+p50/p95/p99 de NearDuplicateIndex.find para variações desses emails e para
+textos sem duplicata. Informa também a taxa de acerto das variações.
+
+Uso: python benchmarks/bench_near_duplicates.py [--count N] [--queries N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+
+def setup_django(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web_django.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def fill(count, batch=50_000):
+    from django.db import connection, transaction
+    from email_analyzer.near_duplicates import BANDS, bands, _to_signed
+
+    rng = random.Random(42)
+    email_sql = ("INSERT INTO email_analyzer_emailmessage (id, subject, preview, sender, received_date, "
+                 "category, confidence_score, is_processed, claimed_by, attempts, last_error) "
+                 "VALUES (%s, 'x', '', 'x', '2024-01-01', %s, 0.8, 1, '', 0, '')")
+    band_columns = ', '.join(f'band_{i}' for i in range(BANDS))
+    fingerprint_sql = (f"INSERT INTO email_analyzer_emailfingerprint (email_id, simhash, {band_columns}) "
+                       f"VALUES (%s, %s, {', '.join(['%s'] * BANDS)})")
+    for start in range(1, count + 1, batch):
+        ids = range(start, min(start + batch, count + 1))
+        fingerprints = [rng.getrandbits(64) for _ in ids]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(email_sql, [(i, 'produtivo' if i % 2 else 'improdutivo') for i in ids])
+            cursor.executemany(fingerprint_sql, [(i, _to_signed(f), *bands(f)) for i, f in zip(ids, fingerprints)])
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        from email_analyzer.models import EmailMessage
+        from email_analyzer.near_duplicates import NearDuplicateIndex, fingerprint_email
+
+        start = time.perf_counter()
+        fill(args.count)
+        print(f"{args.count} impressões digitais gravadas em {time.perf_counter() - start:.1f}s")
+
+        samples = [(BASE_DIR / f'exemplo_email_{name}.txt').read_text(encoding='utf-8')
+                   for name in ('produtivo', 'improdutivo', 'neutro')]
+        for text in samples:
+            # O post_save indexa os emails reais
+            EmailMessage.objects.create(subject='Amostra', content=text, sender='a@b.com',
+                                        category='produtivo', is_processed=True)
+
+        index = NearDuplicateIndex()
+        rng = random.Random(7)
+        for label, make_text in (
+            ('variações', lambda: rng.choice(samples) + ' ' + rng.choice(['Obrigado!', 'Att.', 'Abraços'])),
+            ('sem duplicata', lambda: ' '.join(rng.choice(samples).split()[::-1])),
+        ):
+            latencies, hits = [], 0
+            for _ in range(args.queries):
+                fingerprint = fingerprint_email('Amostra', make_text())
+                began = time.perf_counter()
+                hits += index.find(fingerprint) is not None
+                latencies.append((time.perf_counter() - began) * 1000)
+            print(f"{label:>14}: p50 {percentile(latencies, 50):.3f} ms  p95 {percentile(latencies, 95):.3f} ms  "
+                  f"p99 {percentile(latencies, 99):.3f} ms  encontrados {hits}/{args.queries}")
+
+
+if __name__ == '__main__':
+    main()
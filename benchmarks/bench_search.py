@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca textual (índice FTS5) contra o LIKE '%...%' do admin.
+
+Cria um banco SQLite temporário com N emails (padrão: 1 milhão) de texto
+aleatório com distribuição de Zipf, que o trigger da migração 0007 indexa
+na inserção, e mede a latência p50/p95 de search.search para termos raros,
+comuns e prefixos, ordenando por relevância e por data. Para comparação,
+mede uma varredura LIKE em assunto, remetente e corpo descomprimido.
+
+Uso: python benchmarks/bench_search.py [--count N] [--queries N]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+VOCABULARY_SIZE = 20_000
+
+
+def setup_django(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web_django.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def make_vocabulary(rng):
+    letters = 'abcdefghijklmnopqrstuvwxyzçãéõ'
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(words)
+
+
+def fill(count, vocabulary, batch=20_000):
+    from django.db import connection, transaction
+    from email_analyzer.body_store import digest, encode
+
+    rng = random.Random(42)
+    # Pesos de Zipf: poucas palavras muito comuns, muitas raras
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    body_sql = ("INSERT INTO email_analyzer_emailbody (id, digest, codec, data, size, search_text) "
+                "VALUES (%s, %s, %s, %s, %s, %s)")
+    sql = ("INSERT INTO email_analyzer_emailmessage (id, subject, content_body_id, preview, sender, received_date, "
+           "category, confidence_score, is_processed, claimed_by, attempts, last_error) "
+           "VALUES (%s, %s, %s, %s, %s, '2024-01-01 00:00:00', 'produtivo', 0.8, 1, '', 0, '')")
+    for first in range(1, count + 1, batch):
+        bodies, rows = [], []
+        for i in range(first, min(first + batch, count + 1)):
+            words = rng.choices(vocabulary, cum_weights=cum_weights, k=120)
+            content = ' '.join(words[6:])
+            bodies.append((i, digest(content), *encode(content), len(content.encode('utf-8')), content))
+            rows.append((i, ' '.join(words[:6]), i, content[:100], f'user{i % 5000}@empresa.com'))
+        # O trigger do índice lê o search_text do corpo já gravado
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(body_sql, bodies)
+            cursor.executemany(sql, rows)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+def measure(func, terms):
+    latencies, results = [], 0
+    for term in terms:
+        began = time.perf_counter()
+        results += func(term)
+        latencies.append((time.perf_counter() - began) * 1000)
+    return latencies, results / len(terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(Path(tmp) / 'bench.sqlite3')
+        from django.db import connection
+        from email_analyzer import search
+
+        rng = random.Random(7)
+        vocabulary = make_vocabulary(random.Random(42))
+        start = time.perf_counter()
+        fill(args.count, vocabulary)
+        print(f"{args.count} emails gravados e indexados em {time.perf_counter() - start:.1f}s")
+
+        def page(order):
+            return lambda term: len(search.search(term, order=order)['results'])
+
+        def like(term):
+            # Varredura sem índice: LIKE no assunto, remetente e corpo
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT email.id FROM email_analyzer_emailmessage email "
+                    "LEFT JOIN email_analyzer_emailbody body ON body.id = email.content_body_id "
+                    "WHERE email.subject LIKE %s OR email.sender LIKE %s OR body.search_text LIKE %s "
+                    "ORDER BY email.id DESC LIMIT 20", [f'%{term}%'] * 3
+                )
+                return len(cursor.fetchall())
+
+        rare = [rng.choice(vocabulary[-5000:]) for _ in range(args.queries)]
+        common = [rng.choice(vocabulary[:20]) for _ in range(args.queries)]
+        scenarios = [
+            ('termo raro', page('relevance'), rare),
+            ('raro + comum', page('relevance'), [f'{a} {b}' for a, b in zip(rare, common)]),
+            ('prefixo raro', page('relevance'), [f'{term[:4]}*' for term in rare]),
+            ('termo comum (relevância)', page('relevance'), common[:10]),
+            ('termo comum (recentes)', page('recent'), common),
+            ('termo ausente', page('relevance'), ['inexistente'] * 5),
+            ('LIKE termo raro', like, rare[:5]),
+            ('LIKE termo ausente', like, ['inexistente'] * 3),
+        ]
+        print(f"{'cenário':<26} {'p50 (ms)':>9} {'p95 (ms)':>9} {'resultados':>11}")
+        for label, func, terms in scenarios:
+            latencies, results = measure(func, terms)
+            print(f"{label:<26} {percentile(latencies, 50):>9.2f} {percentile(latencies, 95):>9.2f} {results:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tempo de inicialização e da memória dos processos.
+
+Cada cenário roda num processo novo, --repeat vezes (vale o mais rápido):
+- manage.py check: o custo de qualquer comando (migrate, collectstatic, ...);
+- boot do worker: importar web_django.wsgi, como um worker do gunicorn
+  (sem o aquecimento do modelo, WARMUP_ENABLED=false);
+- primeira requisição: POST /api/email/process/ logo depois do boot, que
+  carrega o modelo; a segunda requisição mostra o custo normal;
+- boot com PRELOAD_MODEL=true: o modelo carregado antes de servir;
+- import transformers: o que cada processo pagaria se ele fosse importado
+  no topo do módulo.
+Para cada um informa o tempo, o RSS e quais bibliotecas pesadas já estavam
+carregadas. Com --importtime, soma o tempo de import do boot por pacote
+(python -X importtime). Usa um banco SQLite temporário.
+
+Uso: python benchmarks/bench_startup.py [--repeat 3] [--importtime] [--json startup.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ['numpy', 'transformers', 'torch', 'onnxruntime', 'tokenizers']
+
+# Executado no processo filho; imprime uma linha JSON
+CHILD = r'''
+import io, json, os, sys, time
+from wsgiref.util import setup_testing_defaults
+
+def rss_mb():
+    with open('/proc/self/status') as status:
+        fields = dict(line.split(':', 1) for line in status)
+    return int(fields['VmRSS'].split()[0]) / 1024, int(fields['VmHWM'].split()[0]) / 1024
+
+def loaded():
+    return [name for name in HEAVY if name in sys.modules]
+
+def request(application):
+    body = json.dumps({'sender': 'a@b.com', 'subject': 'Reunião de projeto',
+                       'content': 'Precisamos agendar uma reunião com o cliente.'}).encode()
+    environ = {}
+    setup_testing_defaults(environ)
+    environ.update({'REQUEST_METHOD': 'POST', 'PATH_INFO': '/api/email/process/',
+                    'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+                    'HTTP_HOST': '127.0.0.1', 'wsgi.input': io.BytesIO(body)})
+    statuses = []
+    started = time.perf_counter()
+    b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    return time.perf_counter() - started, statuses[0]
+
+HEAVY = %(heavy)r
+scenario = %(scenario)r
+result = {}
+started = time.perf_counter()
+if scenario == 'transformers':
+    import transformers
+    from transformers import AutoTokenizer  # noqa: F401
+    result['seconds'] = time.perf_counter() - started
+else:
+    from web_django.wsgi import application
+    result['seconds'] = time.perf_counter() - started
+    if scenario == 'first_request':
+        result['seconds'], result['status'] = request(application)
+        result['second_request_seconds'], _ = request(application)
+result['rss_mb'], result['peak_rss_mb'] = rss_mb()
+result['modules'] = loaded()
+print(json.dumps(result))
+'''
+
+
+def run_child(scenario, env, importtime=False):
+    """(wall seconds, result dict, stderr) of one fresh interpreter"""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD % {'heavy': HEAVY_MODULES, 'scenario': scenario}]
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if process.returncode != 0:
+        raise RuntimeError(f"{scenario} falhou:\n{process.stderr[-2000:]}")
+    return elapsed, json.loads(process.stdout.strip().splitlines()[-1]), process.stderr
+
+
+def run_check(env):
+    """Wall seconds and peak RSS (MB) of `manage.py check`"""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'manage.py', 'check'], cwd=BASE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    # wait4: uso de recursos só deste filho (RUSAGE_CHILDREN acumularia os anteriores)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"manage.py check falhou:\n{process.stderr.read()[-2000:]}")
+    process.stderr.close()
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def import_time_by_package(stderr, count):
+    """Own import time (µs) of every module, summed per top-level package"""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        try:
+            own = int(own)
+        except ValueError:
+            continue  # Linha de cabeçalho
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + own
+    return sorted(((total, package) for package, total in totals.items()), reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--importtime', action='store_true')
+    parser.add_argument('--json', type=Path)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='web_django.settings', ALLOWED_HOSTS='127.0.0.1',
+                   DATABASE_URL=f"sqlite:///{directory}/db.sqlite3", PRELOAD_MODEL='false',
+                   WARMUP_ENABLED='false')
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+                       cwd=BASE_DIR, env=env, check=True)
+
+        results = {}
+        for _ in range(args.repeat):
+            # Rodadas alternadas; o menor tempo de cada cenário descarta o ruído da máquina
+            elapsed, peak = run_check(env)
+            best = results.get('manage.py check')
+            if best is None or elapsed < best['seconds']:
+                results['manage.py check'] = {'seconds': elapsed, 'peak_rss_mb': peak}
+            for label, scenario, overrides in (
+                ('boot do worker', 'boot', {}),
+                ('primeira requisição', 'first_request', {}),
+                ('boot com PRELOAD_MODEL', 'boot', {'PRELOAD_MODEL': 'true'}),
+                ('import transformers', 'transformers', {}),
+            ):
+                try:
+                    _, result, _ = run_child(scenario, dict(env, **overrides))
+                except RuntimeError as e:
+                    results[label] = {'error': str(e).splitlines()[-1]}
+                    continue
+                best = results.get(label)
+                if best is None or 'error' in best or result['seconds'] < best['seconds']:
+                    results[label] = result
+
+        imports = []
+        if args.importtime:
+            _, _, stderr = run_child('boot', env, importtime=True)
+            imports = import_time_by_package(stderr, 12)
+
+    print(f"{'cenário':<26} {'tempo s':>9} {'RSS MB':>8} {'pico MB':>8}  bibliotecas carregadas")
+    for label, result in results.items():
+        if 'error' in result:
+            print(f"{label:<26} erro: {result['error']}")
+            continue
+        rss = f"{result['rss_mb']:>8.1f}" if 'rss_mb' in result else f"{'':>8}"
+        print(f"{label:<26} {result['seconds']:>9.3f} {rss} {result['peak_rss_mb']:>8.1f}  "
+              f"{', '.join(result['modules']) or '-' if 'modules' in result else ''}")
+        if 'second_request_seconds' in result:
+            print(f"{'  segunda requisição':<26} {result['second_request_seconds']:>9.3f}"
+                  f"{'':>19}  ({result['status']})")
+    if imports:
+        print("\ntempo de import no boot do worker, por pacote:")
+        for total, package in imports:
+            print(f"  {package:<40} {total / 1000:>8.1f} ms")
+
+    if args.json:
+        args.json.write_text(json.dumps({'python': sys.version.split()[0], 'results': results,
+                                         'import_us_by_package': imports}, indent=2), encoding='utf-8')
+        print(f"\nresultados em {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Suíte reproduzível de vazão e latência do EmailProcessor.
+
+Mede, em emails sintéticos de 100 bytes a 5 MB (benchmarks/corpus.py, com
+semente fixa), cada parte do caminho de classificação:
+- preprocess_text;
+- keyword_factors: uma varredura de palavras-chave e os fatores de
+  palavra-chave, estrutura e contexto das duas categorias;
+- classify_email sem modelo (só palavras-chave) e com o modelo;
+- process_email de ponta a ponta (extração, classificação e resposta);
+  a extração corta o texto em MAX_EMAIL_LENGTH, então acima disso o
+  custo para de crescer.
+Os processadores são criados sem cache nem quase-duplicatas, para que toda
+operação faça o trabalho completo; os casos com modelo são pulados quando
+ele não carrega (sem rede, sem torch) ou com --no-model.
+
+Cada caso roda por pelo menos --min-time segundos, divididos em --rounds
+rodadas das quais vale a mais rápida, e informa ops/s, p50/p95/p99 e o
+pico de memória alocada por operação (tracemalloc, numa passada separada
+para não pesar no tempo). Os resultados vão para um JSON;
+com --baseline, são comparados com uma execução anterior e o processo sai
+com código 1 se algum caso piorar mais que --tolerance. Compare apenas
+execuções na mesma máquina.
+
+Uso: python benchmarks/bench_suite.py [--sizes 100B,1KB,...] [--baseline base.json] [--save-baseline]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import config  # noqa: E402
+from benchmarks.corpus import SIZES, CorpusGenerator, parse_size  # noqa: E402
+from email_analyzer.nlp_processor import EmailProcessor, preprocess_text  # noqa: E402
+
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+FORMAT_VERSION = 1
+# Abaixo disso a diferença de memória é ruído do alocador, não regressão
+MEMORY_NOISE_KB = 64
+
+
+def percentile(sorted_values, fraction):
+    """Linear interpolation between the closest ranks"""
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def build_cases(use_model):
+    """[(name, processor kind, prepare(email) -> args, run(*args))]"""
+    def factors(processor, text):
+        hits = processor._scan_keywords(text)
+        for category in ('produtivo', 'improdutivo'):
+            processor._calculate_keyword_factor(text, category, hits)
+            processor._calculate_structure_factor(text, category, hits)
+            processor._calculate_context_factor(text, category, hits)
+
+    def full_text(email):
+        return (f"{email['subject']} {email['content']}",)
+
+    def preprocessed(email):
+        return (preprocess_text(*full_text(email)),)
+
+    def classify_args(email):
+        return email['subject'], email['content']
+
+    def process_args(email):
+        return email['subject'], email['content'], email['sender']
+
+    cases = [
+        ('preprocess_text', 'keywords', full_text, lambda p: p.preprocess_text),
+        ('keyword_factors', 'keywords', preprocessed, lambda p: lambda text: factors(p, text)),
+        ('classify_email[keywords]', 'keywords', classify_args, lambda p: p.classify_email),
+        ('process_email[keywords]', 'keywords', process_args, lambda p: p.process_email),
+    ]
+    if use_model:
+        cases += [
+            ('classify_email[model]', 'model', classify_args, lambda p: p.classify_email),
+            ('process_email[model]', 'model', process_args, lambda p: p.process_email),
+        ]
+    return cases
+
+
+def measure(run, inputs, min_time, min_ops, max_ops, rounds):
+    """Latency of each call in the fastest of `rounds` rounds, cycling through the inputs"""
+    for args in inputs:
+        run(*args)  # Aquecimento
+    best = None
+    # Várias rodadas curtas; a mais rápida descarta o ruído da máquina
+    for _ in range(rounds):
+        gc.collect()
+        latencies = []
+        started = time.perf_counter()
+        while len(latencies) < max_ops and (len(latencies) < min_ops
+                                            or time.perf_counter() - started < min_time / rounds):
+            args = inputs[len(latencies) % len(inputs)]
+            start = time.perf_counter()
+            run(*args)
+            latencies.append(time.perf_counter() - start)
+        if best is None or sum(latencies) / len(latencies) < sum(best) / len(best):
+            best = latencies
+    return best
+
+
+def peak_memory(run, inputs):
+    """Largest allocation peak of a single call over the inputs, in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        peak = 0
+        for args in inputs:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            run(*args)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def summarize(latencies, peak, inputs_bytes):
+    ordered = sorted(latencies)
+    total = sum(latencies)
+    return {
+        'ops': len(latencies),
+        'ops_per_sec': round(len(latencies) / total, 3),
+        'mean_ms': round(total / len(latencies) * 1000, 4),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 4),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'mb_per_sec': round(inputs_bytes * len(latencies) / total / 1e6, 3),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'inference_backend': config.INFERENCE_BACKEND,
+            'model': config.HUGGING_FACE_MODEL,
+            'batch_inference_enabled': config.BATCH_INFERENCE_ENABLED,
+            'cascade_enabled': config.CASCADE_ENABLED,
+            'body_extraction_enabled': config.BODY_EXTRACTION_ENABLED,
+            'max_email_length': config.MAX_EMAIL_LENGTH,
+            'metrics_enabled': config.METRICS_ENABLED,
+        },
+    }
+
+
+def run_suite(args):
+    generator = CorpusGenerator(args.seed)
+    # A resposta sugerida sorteia entre modelos de texto: mesma semente, mesmas respostas
+    np.random.seed(args.seed)
+    processors = {'keywords': EmailProcessor(load_model=False)}
+    cases = build_cases(not args.no_model)
+    if any(kind == 'model' for _, kind, _, _ in cases):
+        processors['model'] = EmailProcessor(load_model=True)
+
+    results = {}
+    for label in args.sizes:
+        size = parse_size(label)
+        emails = generator.corpus(size, args.emails)
+        for name, kind, prepare, bind in cases:
+            key = f"{name}/{label}"
+            if args.filter and args.filter not in key:
+                continue
+            processor = processors[kind]
+            if kind == 'model' and processor.classifier is None:
+                results[key] = {'skipped': 'modelo indisponível'}
+                print_row(key, results[key])
+                continue
+            inputs = [prepare(email) for email in emails]
+            run = bind(processor)
+            latencies = measure(run, inputs, args.min_time, args.min_ops, args.max_ops, args.rounds)
+            results[key] = summarize(latencies, peak_memory(run, inputs), size)
+            print_row(key, results[key])
+
+    for processor in processors.values():
+        processor.dispose()
+    return {
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'seed': args.seed, 'emails': args.emails, 'sizes': args.sizes,
+                     'min_time': args.min_time, 'rounds': args.rounds, 'min_ops': args.min_ops},
+        'results': results,
+    }
+
+
+def print_header():
+    print(f"{'caso':<34} {'ops/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'pico KB':>10}")
+
+
+def print_row(key, result):
+    if 'skipped' in result:
+        print(f"{key:<34} pulado: {result['skipped']}")
+        return
+    print(f"{key:<34} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} "
+          f"{result['p99_ms']:>10.3f} {result['peak_memory_kb']:>10.1f}")
+
+
+def compare(current, baseline, tolerance):
+    """Cases that got slower or heavier than the baseline by more than tolerance"""
+    regressions = []
+    for key, result in current['results'].items():
+        old = baseline['results'].get(key)
+        if old is None or 'skipped' in old or 'skipped' in result:
+            continue
+        checks = [
+            ('ops/s', old['ops_per_sec'] / result['ops_per_sec'] - 1),
+            ('p95', result['p95_ms'] / old['p95_ms'] - 1 if old['p95_ms'] else 0.0),
+        ]
+        if result['peak_memory_kb'] - old['peak_memory_kb'] > MEMORY_NOISE_KB:
+            checks.append(('memória', result['peak_memory_kb'] / max(old['peak_memory_kb'], 1) - 1))
+        for metric, change in checks:
+            if change > tolerance:
+                regressions.append((key, metric, change))
+    return regressions
+
+
+def print_comparison(current, baseline, tolerance):
+    old_env, new_env = baseline.get('environment', {}), current['environment']
+    for field in ('machine', 'cpu_count', 'python'):
+        if old_env.get(field) != new_env.get(field):
+            print(f"⚠️  baseline de outro ambiente ({field}: {old_env.get(field)} -> {new_env.get(field)})")
+
+    print(f"\n{'caso':<34} {'ops/s base':>12} {'ops/s agora':>12} {'variação':>10}")
+    for key, result in current['results'].items():
+        old = baseline['results'].get(key)
+        if old is None or 'skipped' in old or 'skipped' in result:
+            continue
+        change = result['ops_per_sec'] / old['ops_per_sec'] - 1
+        print(f"{key:<34} {old['ops_per_sec']:>12.1f} {result['ops_per_sec']:>12.1f} {change:>+10.1%}")
+
+    regressions = compare(current, baseline, tolerance)
+    if not regressions:
+        print(f"\nsem regressões acima de {tolerance:.0%} (baseline {baseline.get('environment', {}).get('git_commit')})")
+    for key, metric, change in regressions:
+        print(f"❌ regressão em {key}: {metric} piorou {change:.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=lambda value: value.split(','), default=list(SIZES),
+                        help="tamanhos separados por vírgula (ex.: 100B,10KB,1MB)")
+    parser.add_argument('--emails', type=int, default=6, help="emails distintos por tamanho")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--min-time', type=float, default=1.0, help="segundos medidos por caso")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--min-ops', type=int, default=3, help="operações mínimas por rodada")
+    parser.add_argument('--max-ops', type=int, default=100_000)
+    parser.add_argument('--filter', default='', help="só casos cujo nome contém o texto")
+    parser.add_argument('--no-model', action='store_true', help="pula os casos com modelo")
+    parser.add_argument('--output', type=Path, default=RESULTS_DIR / 'latest.json')
+    parser.add_argument('--baseline', type=Path, default=RESULTS_DIR / 'baseline.json')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="grava os resultados como a nova baseline em vez de comparar")
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    print_header()
+    current = run_suite(args)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(current, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\nresultados em {args.output}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(current, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"baseline gravada em {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"sem baseline em {args.baseline} (use --save-baseline)")
+        return
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+    if baseline.get('format_version') != FORMAT_VERSION:
+        sys.exit(f"baseline em formato {baseline.get('format_version')}, esperado {FORMAT_VERSION}")
+    if print_comparison(current, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
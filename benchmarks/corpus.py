@@ -0,0 +1,144 @@
+"""
+Corpus sintético e reproduzível para os benchmarks.
+
+Os emails são montados a partir dos exemplos (exemplo_email_*.txt) e das
+listas de palavras-chave: cada categoria usa as frases do seu exemplo e as
+palavras que o classificador procura para ela (o neutro não recebe
+nenhuma). O conteúdo é cortado no tamanho pedido, de 100 bytes a vários
+MB. A mesma semente gera sempre os mesmos emails, e cada email depende só
+de (semente, tamanho, categoria, índice): pedir outros tamanhos ou mais
+emails não muda os que já existiam.
+
+Uso: python benchmarks/corpus.py [--seed 42] [--size 10KB] [--count 3]
+"""
+
+import argparse
+import random
+import re
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from email_analyzer.keywords import (  # noqa: E402
+    PRODUCTIVE_KEYWORDS, UNPRODUCTIVE_KEYWORDS, WORK_CONTEXT_INDICATORS,
+    SPAM_CONTEXT_INDICATORS, FORMAL_LANGUAGE, SPECIFIC_DETAILS, PRODUCTIVE_STRUCTURE,
+    UNPRODUCTIVE_CALL_TO_ACTION, UNPRODUCTIVE_BLESSINGS, EMOJIS,
+)
+
+CATEGORIES = ('produtivo', 'improdutivo', 'neutro')
+
+SIZES = {
+    '100B': 100,
+    '1KB': 1_000,
+    '10KB': 10_000,
+    '100KB': 100_000,
+    '1MB': 1_000_000,
+    '5MB': 5_000_000,
+}
+
+KEYWORDS = {
+    'produtivo': PRODUCTIVE_KEYWORDS + WORK_CONTEXT_INDICATORS + FORMAL_LANGUAGE
+    + SPECIFIC_DETAILS + PRODUCTIVE_STRUCTURE,
+    'improdutivo': UNPRODUCTIVE_KEYWORDS + SPAM_CONTEXT_INDICATORS + UNPRODUCTIVE_CALL_TO_ACTION
+    + UNPRODUCTIVE_BLESSINGS + EMOJIS,
+    'neutro': [],
+}
+
+# Frases com palavras-chave; a proporção mantém o texto parecido com um email real
+TEMPLATES = [
+    "Sobre {0}: precisamos alinhar os próximos passos.",
+    "Segue a atualização de {0} e {1}.",
+    "Não esqueça: {0}, {1}!",
+    "{0} - ver detalhes abaixo.",
+]
+KEYWORD_SENTENCE_RATE = 0.3
+DOMAINS = ['empresa.com.br', 'cliente.com', 'email.com', 'exemplo.org']
+
+
+def parse_size(value: str) -> int:
+    """'100B', '10KB', '5MB' or a plain number of bytes"""
+    match = re.fullmatch(r'(\d+)\s*(B|KB|MB)?', value.strip().upper())
+    if not match:
+        raise ValueError(f"Tamanho inválido: {value}")
+    return int(match.group(1)) * {'B': 1, None: 1, 'KB': 1_000, 'MB': 1_000_000}[match.group(2)]
+
+
+def _truncate(text: str, size: int) -> str:
+    # Corta em bytes UTF-8 sem deixar um caractere pela metade
+    return text.encode('utf-8')[:size].decode('utf-8', errors='ignore')
+
+
+def load_examples():
+    """{category: (sender, subject, body)} from the exemplo_email_*.txt files"""
+    examples = {}
+    for category in CATEGORIES:
+        text = (BASE_DIR / f'exemplo_email_{category}.txt').read_text(encoding='utf-8')
+        header, _, body = text.partition('\n\n')
+        fields = dict(line.split(':', 1) for line in header.splitlines() if ':' in line)
+        examples[category] = (fields.get('De', '').strip(), fields.get('Assunto', '').strip(), body.strip())
+    return examples
+
+
+class CorpusGenerator:
+    """Seeded generator of emails of a given size and category"""
+
+    def __init__(self, seed: int = 42):
+        self.seed = seed
+        self.examples = load_examples()
+        self.sentences = {
+            category: [s for s in re.split(r'(?<=[.!?:])\s+|\n+', body) if s.strip()]
+            for category, (_, _, body) in self.examples.items()
+        }
+
+    def _sentence(self, rng: random.Random, category: str) -> str:
+        keywords = KEYWORDS[category]
+        if keywords and rng.random() < KEYWORD_SENTENCE_RATE:
+            return rng.choice(TEMPLATES).format(*rng.sample(keywords, 2))
+        return rng.choice(self.sentences[category])
+
+    def email(self, size: int, category: str, index: int = 0) -> dict:
+        """One email whose content has `size` bytes (UTF-8)"""
+        rng = random.Random(f"{self.seed}-{size}-{category}-{index}")
+        sender, subject, body = self.examples[category]
+        if index:
+            sender = f"{sender.split('@')[0]}{index}@{rng.choice(DOMAINS)}"
+            subject = f"{subject} #{index}"
+
+        parts = [body]
+        length = len(body.encode('utf-8'))
+        while length < size:
+            # Parágrafos de 2 a 6 frases, como um email comprido de verdade
+            paragraph = ' '.join(self._sentence(rng, category) for _ in range(rng.randint(2, 6)))
+            parts.append(paragraph)
+            length += len(paragraph.encode('utf-8')) + 2
+        return {
+            'sender': sender,
+            'subject': subject,
+            'content': _truncate('\n\n'.join(parts), size),
+            'category': category,
+        }
+
+    def corpus(self, size: int, count: int, categories=CATEGORIES) -> list:
+        """`count` emails of one size, alternating the categories"""
+        return [self.email(size, categories[i % len(categories)], i // len(categories))
+                for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--size', default='1KB')
+    parser.add_argument('--count', type=int, default=3)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(args.seed)
+    for email in generator.corpus(parse_size(args.size), args.count):
+        print(f"--- {email['category']} | {email['sender']} | {email['subject']} "
+              f"| {len(email['content'].encode('utf-8'))} bytes")
+        print(email['content'][:300])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga HTTP para a API de classificação.
+
+Envia emails sintéticos (benchmarks/corpus.py) para /api/email/process/ e,
+com --bulk-share, lotes NDJSON para /api/email/process/bulk/, por um pool
+de conexões keep-alive sobre asyncio (só biblioteca padrão). Dois modos:
+- closed: --concurrency clientes, cada um envia a próxima requisição assim
+  que recebe a resposta (mede a capacidade do servidor);
+- open: chegadas a --rate requisições/s, independentes das respostas (mede
+  a latência sob uma carga fixa). A latência conta a partir do instante
+  agendado, então a espera por uma conexão livre também entra nela.
+A mistura de tamanhos e categorias vem de --sizes e --categories
+(ex.: 1KB:60,10KB:30,100KB:10). A cada --interval segundos imprime vazão,
+erros e p50/p95/p99; no fim, o detalhamento dos erros e um histograma de
+latência por endpoint, e com --json grava tudo em um arquivo.
+
+--in-process sobe o Django numa thread deste processo, com um banco SQLite
+temporário, para testar sem rede nem servidor. Cliente e servidor dividem o
+GIL: use para conferir o caminho, não para medir capacidade.
+
+Uso: python benchmarks/load_test.py [--url http://localhost:8000 | --in-process]
+     [--mode closed --concurrency 8 | --mode open --rate 50] [--duration 30]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from benchmarks.corpus import CorpusGenerator, parse_size  # noqa: E402
+
+# Limites dos baldes do histograma de latência, em ms
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+
+class HTTPError(Exception):
+    """Malformed response from the server"""
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, at most `size` open at a time"""
+
+    def __init__(self, url: str, size: int):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = parts.scheme == 'https' or None
+        self.opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method: str, path: str, body: bytes, content_type: str):
+        """(status, body) of one request, reusing an idle connection when there is one"""
+        async with self._slots:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else await self._connect()
+            try:
+                status, data, keep_alive = await self._exchange(connection, method, path, body, content_type)
+            except (OSError, asyncio.IncompleteReadError, HTTPError):
+                if not reused:
+                    raise
+                # O servidor pode ter fechado a conexão ociosa: tenta uma nova
+                connection = await self._connect()
+                status, data, keep_alive = await self._exchange(connection, method, path, body, content_type)
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                connection[1].close()
+            return status, data
+
+    async def _connect(self):
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def _exchange(self, connection, method, path, body, content_type):
+        try:
+            return await self._roundtrip(*connection, method, path, body, content_type)
+        except BaseException:
+            # Erro, timeout ou cancelamento no meio da resposta: a conexão não serve mais
+            connection[1].close()
+            raise
+
+    async def _roundtrip(self, reader, writer, method, path, body, content_type):
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: keep-alive\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        try:
+            _, status, _ = status_line.decode('latin-1').split(' ', 2)
+            status = int(status)
+        except ValueError:
+            raise HTTPError(f"linha de status inválida: {status_line[:80]!r}")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b''.join(chunks)
+        elif 'content-length' in headers:
+            data = await reader.readexactly(int(headers['content-length']))
+        else:
+            # Streaming sem tamanho (ex.: o endpoint em lote): o corpo vai até o fim da conexão
+            data = await reader.read()
+            return status, data, False
+        return status, data, headers.get('connection', '').lower() != 'close'
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class Recorder:
+    """Latencies and errors per interval of completion time"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.latencies = defaultdict(list)   # endpoint -> [s]
+        self.timeline = defaultdict(lambda: {'ok': 0, 'errors': 0, 'latencies': []})
+        self.errors = Counter()
+        self.records = 0
+
+    def success(self, endpoint: str, latency: float, records: int = 1):
+        self.latencies[endpoint].append(latency)
+        self.records += records
+        window = self.timeline[int((time.perf_counter() - self.started) / self.interval)]
+        window['ok'] += 1
+        window['latencies'].append(latency)
+
+    def error(self, kind: str):
+        self.errors[kind] += 1
+        self.timeline[int((time.perf_counter() - self.started) / self.interval)]['errors'] += 1
+
+
+def percentile(sorted_values, fraction):
+    """Linear interpolation between the closest ranks"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def parse_weights(value: str):
+    """'1KB:60,10KB:40' -> [('1KB', 60.0), ('10KB', 40.0)]; no weight means 1"""
+    weights = []
+    for item in value.split(','):
+        name, _, weight = item.partition(':')
+        weights.append((name.strip(), float(weight or 1)))
+    return weights
+
+
+class Workload:
+    """Request bodies drawn from the synthetic corpus with the configured mix"""
+
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        generator = CorpusGenerator(args.seed)
+        sizes = parse_weights(args.sizes)
+        categories = parse_weights(args.categories)
+        self.emails = [
+            (generator.email(parse_size(size), category, index), size_weight * category_weight)
+            for size, size_weight in sizes for category, category_weight in categories
+            for index in range(args.variants)
+        ]
+        self.weights = [weight for _, weight in self.emails]
+        self.bulk_share = args.bulk_share
+        self.bulk_size = args.bulk_size
+        self.unique = not args.repeat
+        self.endpoint = args.endpoint
+        self.bulk_endpoint = args.bulk_endpoint
+        self.sequence = 0
+
+    def _email(self):
+        email = dict(self.rng.choices(self.emails, self.weights)[0][0])
+        del email['category']
+        if self.unique:
+            # Assunto diferente a cada envio: o cache de resultados não esconde o custo
+            self.sequence += 1
+            email['subject'] = f"{email['subject']} [{self.sequence}]"
+        return email
+
+    def next_request(self):
+        """(endpoint label, path, body, content type, records)"""
+        if self.bulk_share and self.rng.random() < self.bulk_share:
+            lines = [json.dumps(self._email(), ensure_ascii=False) for _ in range(self.bulk_size)]
+            return 'bulk', self.bulk_endpoint, '\n'.join(lines).encode('utf-8'), 'application/x-ndjson', len(lines)
+        body = json.dumps(self._email(), ensure_ascii=False).encode('utf-8')
+        return 'process', self.endpoint, body, 'application/json', 1
+
+
+def error_message(data: bytes) -> str:
+    """': <error field>' of a JSON error response, shortened, to tell failures apart"""
+    try:
+        message = json.loads(data).get('error')
+    except (ValueError, AttributeError):
+        return ''
+    return f": {str(message)[:60]}" if message else ''
+
+
+async def send(pool, workload, recorder, timeout, scheduled=None):
+    label, path, body, content_type, records = workload.next_request()
+    started = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        status, data = await asyncio.wait_for(pool.request('POST', path, body, content_type), timeout)
+    except asyncio.TimeoutError:
+        recorder.error('timeout')
+        return
+    except HTTPError:
+        recorder.error('resposta inválida')
+        return
+    except (OSError, asyncio.IncompleteReadError) as e:
+        recorder.error(type(e).__name__)
+        return
+    latency = time.perf_counter() - started
+    if status != 200:
+        recorder.error(f"HTTP {status}{error_message(data)}")
+        return
+    if label == 'bulk':
+        # 200 mesmo com registros inválidos: cada linha traz o próprio erro
+        failed = sum(1 for line in data.splitlines() if line and 'error' in json.loads(line))
+        for _ in range(failed):
+            recorder.error('registro do lote com erro')
+        records -= failed
+    recorder.success(label, latency, records)
+
+
+async def closed_loop(pool, workload, recorder, args, deadline):
+    async def client():
+        while time.perf_counter() < deadline:
+            await send(pool, workload, recorder, args.timeout)
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+
+
+async def open_loop(pool, workload, recorder, args, deadline):
+    rng = random.Random(args.seed)
+    in_flight = set()
+    scheduled = time.perf_counter()
+    while scheduled < deadline:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= args.max_in_flight:
+            # O cliente não acompanha a taxa pedida: conta em vez de atrasar as próximas
+            recorder.error('descartada (limite de requisições em voo)')
+        else:
+            task = asyncio.ensure_future(send(pool, workload, recorder, args.timeout, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        # Chegadas de Poisson (ou intervalos fixos com --arrival constant)
+        scheduled += rng.expovariate(args.rate) if args.arrival == 'poisson' else 1 / args.rate
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+
+def window_row(index, window, interval):
+    ordered = sorted(window['latencies'])
+    return {
+        'second': round(index * interval, 3),
+        'ok': window['ok'],
+        'errors': window['errors'],
+        'rps': round(window['ok'] / interval, 2),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def print_window(row):
+    print(f"{row['second']:>7.1f} {row['ok']:>7} {row['errors']:>7} {row['rps']:>9.1f} "
+          f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}")
+
+
+async def report_progress(recorder, stop):
+    """Print each interval as soon as it is over"""
+    printed = 0
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), recorder.interval)
+        except asyncio.TimeoutError:
+            pass
+        current = int((time.perf_counter() - recorder.started) / recorder.interval)
+        while printed < current:
+            print_window(window_row(printed, recorder.timeline[printed], recorder.interval))
+            printed += 1
+    return printed
+
+
+def histogram(latencies):
+    """[(upper bound in ms or None for overflow, count)]"""
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for latency in latencies:
+        ms = latency * 1000
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS))
+        counts[index] += 1
+    return list(zip(BUCKETS_MS + [None], counts))
+
+
+def summarize(recorder, elapsed, pool):
+    endpoints = {}
+    for label, latencies in recorder.latencies.items():
+        ordered = sorted(latencies)
+        endpoints[label] = {
+            'ok': len(ordered),
+            'rps': round(len(ordered) / elapsed, 2),
+            'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2),
+            'histogram_ms': [[bound, count] for bound, count in histogram(ordered)],
+        }
+    ok = sum(endpoint['ok'] for endpoint in endpoints.values())
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'requests_ok': ok,
+        'requests_failed': sum(recorder.errors.values()),
+        'rps': round(ok / elapsed, 2),
+        'emails_per_sec': round(recorder.records / elapsed, 2),
+        'connections_opened': pool.opened,
+        'errors': dict(recorder.errors.most_common()),
+        'endpoints': endpoints,
+        'timeline': [window_row(index, recorder.timeline[index], recorder.interval)
+                     for index in sorted(recorder.timeline)],
+    }
+
+
+def print_summary(summary):
+    print(f"\n{summary['requests_ok']} requisições ok, {summary['requests_failed']} erros em "
+          f"{summary['elapsed_s']:.1f} s: {summary['rps']:.1f} req/s, "
+          f"{summary['emails_per_sec']:.1f} emails/s ({summary['connections_opened']} conexões abertas)")
+    if summary['errors']:
+        print("\nerros:")
+        for kind, count in summary['errors'].items():
+            print(f"  {kind:<70} {count:>7}")
+    for label, endpoint in summary['endpoints'].items():
+        print(f"\n{label}: {endpoint['ok']} ok, p50 {endpoint['p50_ms']:.1f} ms, p95 {endpoint['p95_ms']:.1f} ms, "
+              f"p99 {endpoint['p99_ms']:.1f} ms, máx {endpoint['max_ms']:.1f} ms")
+        largest = max(count for _, count in endpoint['histogram_ms']) or 1
+        for bound, count in endpoint['histogram_ms']:
+            if count:
+                name = f"<= {bound} ms" if bound is not None else f"> {BUCKETS_MS[-1]} ms"
+                print(f"  {name:>12} {count:>7} {'#' * max(1, round(count / largest * 40))}")
+
+
+async def run(args, url):
+    pool = ConnectionPool(url, args.concurrency if args.mode == 'closed' else args.connections)
+    workload = Workload(args)
+    warmup = Recorder(args.interval)
+    for _ in range(args.warmup):
+        # Carga do modelo e conexões fora da medição
+        await send(pool, workload, warmup, args.timeout)
+    if warmup.errors:
+        print(f"aquecimento com erros: {dict(warmup.errors)}")
+
+    recorder = Recorder(args.interval)
+    deadline = recorder.started + args.duration
+    stop = asyncio.Event()
+    print(f"{'t (s)':>7} {'ok':>7} {'erros':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    progress = asyncio.ensure_future(report_progress(recorder, stop))
+    if args.mode == 'closed':
+        await closed_loop(pool, workload, recorder, args, deadline)
+    else:
+        await open_loop(pool, workload, recorder, args, deadline)
+    elapsed = time.perf_counter() - recorder.started
+    stop.set()
+    printed = await progress
+    for index in sorted(recorder.timeline):
+        if index >= printed:
+            print_window(window_row(index, recorder.timeline[index], recorder.interval))
+    pool.close()
+    return summarize(recorder, elapsed, pool)
+
+
+def start_in_process_server():
+    """Serve the Django app from a thread of this process; returns its URL"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp(prefix='load_test_')}/db.sqlite3"
+    os.environ['ALLOWED_HOSTS'] = '127.0.0.1,localhost'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web_django.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+    call_command('migrate', verbosity=0)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--in-process', action='store_true', help="sobe o Django neste processo")
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--concurrency', type=int, default=8, help="clientes simultâneos (closed)")
+    parser.add_argument('--rate', type=float, default=20.0, help="requisições por segundo (open)")
+    parser.add_argument('--arrival', choices=['poisson', 'constant'], default='poisson')
+    parser.add_argument('--connections', type=int, default=64, help="tamanho do pool (open)")
+    parser.add_argument('--max-in-flight', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--interval', type=float, default=1.0)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--sizes', default='1KB:60,10KB:30,100KB:10')
+    parser.add_argument('--categories', default='produtivo,improdutivo,neutro')
+    parser.add_argument('--variants', type=int, default=5, help="emails distintos por tamanho e categoria")
+    parser.add_argument('--repeat', action='store_true', help="repete emails idênticos (exercita o cache)")
+    parser.add_argument('--endpoint', default='/api/email/process/')
+    parser.add_argument('--bulk-endpoint', default='/api/email/process/bulk/')
+    parser.add_argument('--bulk-share', type=float, default=0.0, help="fração das requisições em lote")
+    parser.add_argument('--bulk-size', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', type=Path, help="grava o resumo e a linha do tempo neste arquivo")
+    args = parser.parse_args()
+
+    url = start_in_process_server() if args.in_process else args.url
+    print(f"{args.mode} loop contra {url}: "
+          + (f"{args.concurrency} clientes" if args.mode == 'closed' else f"{args.rate:g} req/s ({args.arrival})")
+          + f" por {args.duration:g} s")
+    summary = asyncio.run(run(args, url))
+    print_summary(summary)
+    if args.json:
+        settings = {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()}
+        args.json.write_text(json.dumps({'url': url, 'settings': settings, **summary}, indent=2,
+                                        ensure_ascii=False), encoding='utf-8')
+        print(f"\nresultados em {args.json}")
+    if not summary['requests_ok']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ Configurações do Sistema de Classificação de Emails
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Configurações do Django
@@ -12,6 +13,34 @@ DJANGO_SETTINGS_MODULE = 'web_django.settings'
 # Configurações do Modelo de IA
 HUGGING_FACE_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
 MODEL_MAX_LENGTH = 512  # Máximo de tokens para o modelo
+# Backend de inferência: pytorch, pytorch-int8 (quantizado) ou onnx
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'pytorch')
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', str(Path(__file__).resolve().parent / 'models' / 'onnx'))
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', '0'))  # 0 = padrão da biblioteca
+# Carregar o modelo na inicialização do worker (wsgi/asgi) em vez de na primeira requisição
+PRELOAD_MODEL = os.getenv('PRELOAD_MODEL', 'False').lower() == 'true'
+# Diretório local com o modelo exportado (manage.py export_model): carregado sem acesso à rede
+MODEL_DIR = os.getenv('MODEL_DIR', '')
+# Conferir os arquivos do modelo com o MANIFEST.sha256 antes de carregar
+MODEL_VERIFY_CHECKSUMS = os.getenv('MODEL_VERIFY_CHECKSUMS', 'True').lower() == 'true'
+# Aquecimento: carregar o modelo e rodar algumas inferências antes de receber tráfego
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'True').lower() == 'true'
+WARMUP_INFERENCES = int(os.getenv('WARMUP_INFERENCES', '3'))
+# Ligado pelo gunicorn.conf.py com preload: cada worker aquece no post_fork, não o master
+WARMUP_AFTER_FORK = os.getenv('WARMUP_AFTER_FORK', 'False').lower() == 'true'
+# /ready/ só responde 200 com o modelo carregado (false: aceita o classificador por palavras-chave)
+READINESS_REQUIRE_MODEL = os.getenv('READINESS_REQUIRE_MODEL', 'True').lower() == 'true'
+
+# Emails longos: janelas de tokens sobrepostas em vez de truncar o texto
+LONG_EMAIL_MODE = os.getenv('LONG_EMAIL_MODE', 'True').lower() == 'true'
+LONG_EMAIL_OVERLAP = int(os.getenv('LONG_EMAIL_OVERLAP', '64'))  # Tokens repetidos entre janelas
+LONG_EMAIL_MAX_WINDOWS = int(os.getenv('LONG_EMAIL_MAX_WINDOWS', '8'))  # Limite de latência por email
+LONG_EMAIL_AGGREGATION = os.getenv('LONG_EMAIL_AGGREGATION', 'mean')  # mean, max ou position
+
+# Configurações de Micro-batching (agrupa requisições concorrentes no modelo)
+BATCH_INFERENCE_ENABLED = os.getenv('BATCH_INFERENCE_ENABLED', 'False').lower() == 'true'
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '16'))
+BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', '10'))
 
 # Configurações de Classificação
 PRODUCTIVE_KEYWORDS = [
@@ -53,6 +82,45 @@ UNPRODUCTIVE_RESPONSES = [
     "Não estou interessado em promoções."
 ]
 
+# Cascata: o modelo só é chamado quando a confiança das palavras-chave
+# fica dentro da faixa de incerteza [CASCADE_LOWER, CASCADE_UPPER)
+CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'False').lower() == 'true'
+CASCADE_LOWER = float(os.getenv('CASCADE_LOWER', '0.0'))
+CASCADE_UPPER = float(os.getenv('CASCADE_UPPER', '0.85'))
+
+# Quase-duplicatas (SimHash): emails parecidos reutilizam a classificação já gravada.
+# Desligado por padrão: muda resultados e acrescenta uma consulta e uma gravação por email
+NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', 'False').lower() == 'true'
+# Similaridade mínima (bits iguais / 64); 0.95 = até 3 bits diferentes. Precisa ser maior que
+# 0.9375: as 4 faixas do índice só garantem encontrar emails com até 3 bits diferentes
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.95'))
+NEAR_DUPLICATE_MAX_CANDIDATES = int(os.getenv('NEAR_DUPLICATE_MAX_CANDIDATES', '200'))
+
+# API em lote: registros classificados e gravados por vez
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '32'))
+# Tamanho máximo de um registro (caracteres): um registro quebrado não faz o corpo inteiro ir para a memória
+BULK_MAX_RECORD_SIZE = int(os.getenv('BULK_MAX_RECORD_SIZE', str(8 * 1024 * 1024)))
+
+# Fila de classificação em segundo plano (manage.py classify_worker)
+QUEUE_BATCH_SIZE = int(os.getenv('QUEUE_BATCH_SIZE', '32'))
+QUEUE_MAX_ATTEMPTS = int(os.getenv('QUEUE_MAX_ATTEMPTS', '3'))
+# Reivindicações mais antigas que isso são de workers mortos e voltam para a fila
+QUEUE_CLAIM_TIMEOUT = int(os.getenv('QUEUE_CLAIM_TIMEOUT', '300'))  # Segundos
+QUEUE_POLL_INTERVAL = float(os.getenv('QUEUE_POLL_INTERVAL', '1.0'))  # Segundos
+
+# Emails por página na lista (paginação por cursor)
+EMAIL_LIST_PAGE_SIZE = int(os.getenv('EMAIL_LIST_PAGE_SIZE', '50'))
+
+# Armazenamento dos corpos: cada texto distinto uma vez, comprimido (zlib ou zstd)
+BODY_STORE_CODEC = os.getenv('BODY_STORE_CODEC', 'zlib')
+BODY_STORE_LEVEL = int(os.getenv('BODY_STORE_LEVEL', '6'))
+
+# Busca textual (FTS5 no SQLite, tsvector + GIN no Postgres)
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', '100'))
+# Resultados mais recentes considerados na ordenação por relevância
+SEARCH_RANK_WINDOW = int(os.getenv('SEARCH_RANK_WINDOW', '10000'))
+
 # Configurações de Threshold
 MIN_CONFIDENCE_THRESHOLD = 0.3
 KEYWORD_BOOST_FACTOR = 0.1
@@ -60,7 +128,11 @@ MAX_KEYWORD_CONFIDENCE = 0.8
 
 # Configurações de API
 API_RATE_LIMIT = 100  # Requisições por hora
-API_TIMEOUT = 30  # Segundos
+API_TIMEOUT = int(os.getenv('API_TIMEOUT', '30'))  # Segundos
+# API assíncrona: requisições simultâneas por processo ASGI (acima disso, 503)
+API_MAX_IN_FLIGHT = int(os.getenv('API_MAX_IN_FLIGHT', '1000'))
+# Threads dedicadas à inferência chamada a partir das views assíncronas
+INFERENCE_EXECUTOR_WORKERS = int(os.getenv('INFERENCE_EXECUTOR_WORKERS', '4'))
 
 # Configurações de Log
 LOG_LEVEL = "INFO"
@@ -69,10 +141,35 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 # Configurações de Cache
 CACHE_TTL = 3600  # 1 hora em segundos
 MODEL_CACHE_KEY = "email_classifier_model"
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True').lower() == 'true'
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '10000'))
+# Alias de settings.CACHES para compartilhar resultados entre workers (vazio = só local)
+RESULT_CACHE_SHARED_ALIAS = os.getenv('RESULT_CACHE_SHARED_ALIAS', '')
+# Incrementar ao alterar palavras-chave ou pesos para invalidar resultados em cache
+RULES_VERSION = "2"
 
 # Configurações de Monitoramento
-METRICS_ENABLED = True
-PERFORMANCE_TRACKING = True
+# Métricas Prometheus em /metrics (contadores por categoria e tempo de carga do modelo)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+# Histogramas de latência de cada etapa (parse, preprocess, inference, ...)
+PERFORMANCE_TRACKING = os.getenv('PERFORMANCE_TRACKING', 'True').lower() == 'true'
+# Com vários workers (gunicorn), cada processo grava seus valores neste diretório
+# e /metrics soma todos; vazio = só o processo que atende a coleta
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '2'))  # Segundos
+
+# Profiling sob demanda (email_analyzer.profiling.ProfilingMiddleware)
+# Amostrar a pilha de todas as requisições; guardar o perfil das lentas
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+# Cabeçalho X-Profile com este valor (ou de um usuário staff) amostra só aquela requisição
+PROFILING_HEADER_TOKEN = os.getenv('PROFILING_HEADER_TOKEN', '')
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', '5'))
+# Perfis (pilhas no formato "folded" + metadados JSON), compartilhados entre workers
+PROFILE_DIR = os.getenv('PROFILE_DIR', str(Path(tempfile.gettempdir()) / 'email_analyzer_profiles'))
+PROFILE_MAX_DUMPS = int(os.getenv('PROFILE_MAX_DUMPS', '200'))
+# Requisições acima deste tempo vão para o log de lentas, com o tempo por etapa (0 = desligado)
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '0'))
+SLOW_REQUEST_LOG = os.getenv('SLOW_REQUEST_LOG', '')  # Arquivo JSON lines; vazio = stdout
 
 # Configurações de Desenvolvimento
 DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
@@ -82,6 +179,8 @@ DEVELOPMENT_MODE = os.getenv('DEVELOPMENT_MODE', 'False').lower() == 'true'
 CSRF_ENABLED = True
 API_KEY_REQUIRED = False  # Para uso interno
 MAX_EMAIL_LENGTH = 10000  # Máximo de caracteres por email
+# Extrair o texto novo (sem anexos, HTML, citações e assinaturas) antes de classificar
+BODY_EXTRACTION_ENABLED = os.getenv('BODY_EXTRACTION_ENABLED', 'True').lower() == 'true'
 
 # Configurações de Backup
 BACKUP_ENABLED = True
@@ -94,26 +193,62 @@ def get_config():
         'django_settings': DJANGO_SETTINGS_MODULE,
         'model': HUGGING_FACE_MODEL,
         'max_length': MODEL_MAX_LENGTH,
+        'inference_backend': INFERENCE_BACKEND,
+        'onnx_model_dir': ONNX_MODEL_DIR,
+        'inference_threads': INFERENCE_THREADS,
+        'preload_model': PRELOAD_MODEL,
+        'model_dir': MODEL_DIR,
+        'warmup_enabled': WARMUP_ENABLED,
+        'long_email_mode': LONG_EMAIL_MODE,
+        'long_email_overlap': LONG_EMAIL_OVERLAP,
+        'long_email_max_windows': LONG_EMAIL_MAX_WINDOWS,
+        'long_email_aggregation': LONG_EMAIL_AGGREGATION,
+        'batch_inference_enabled': BATCH_INFERENCE_ENABLED,
+        'batch_max_size': BATCH_MAX_SIZE,
+        'batch_max_wait_ms': BATCH_MAX_WAIT_MS,
         'productive_keywords': PRODUCTIVE_KEYWORDS,
         'unproductive_keywords': UNPRODUCTIVE_KEYWORDS,
         'productive_responses': PRODUCTIVE_RESPONSES,
         'unproductive_responses': UNPRODUCTIVE_RESPONSES,
+        'near_duplicate_enabled': NEAR_DUPLICATE_ENABLED,
+        'near_duplicate_threshold': NEAR_DUPLICATE_THRESHOLD,
+        'cascade_enabled': CASCADE_ENABLED,
+        'cascade_lower': CASCADE_LOWER,
+        'cascade_upper': CASCADE_UPPER,
         'min_confidence': MIN_CONFIDENCE_THRESHOLD,
         'keyword_boost': KEYWORD_BOOST_FACTOR,
         'max_keyword_confidence': MAX_KEYWORD_CONFIDENCE,
         'api_rate_limit': API_RATE_LIMIT,
         'api_timeout': API_TIMEOUT,
+        'api_max_in_flight': API_MAX_IN_FLIGHT,
+        'bulk_batch_size': BULK_BATCH_SIZE,
+        'bulk_max_record_size': BULK_MAX_RECORD_SIZE,
+        'queue_batch_size': QUEUE_BATCH_SIZE,
+        'queue_max_attempts': QUEUE_MAX_ATTEMPTS,
+        'email_list_page_size': EMAIL_LIST_PAGE_SIZE,
+        'search_page_size': SEARCH_PAGE_SIZE,
+        'body_store_codec': BODY_STORE_CODEC,
+        'inference_executor_workers': INFERENCE_EXECUTOR_WORKERS,
         'log_level': LOG_LEVEL,
         'log_format': LOG_FORMAT,
         'cache_ttl': CACHE_TTL,
         'model_cache_key': MODEL_CACHE_KEY,
+        'result_cache_enabled': RESULT_CACHE_ENABLED,
+        'result_cache_max_entries': RESULT_CACHE_MAX_ENTRIES,
+        'result_cache_shared_alias': RESULT_CACHE_SHARED_ALIAS,
+        'rules_version': RULES_VERSION,
         'metrics_enabled': METRICS_ENABLED,
         'performance_tracking': PERFORMANCE_TRACKING,
+        'metrics_dir': METRICS_DIR,
+        'profiling_enabled': PROFILING_ENABLED,
+        'profile_dir': PROFILE_DIR,
+        'slow_request_ms': SLOW_REQUEST_MS,
         'debug': DEBUG,
         'development_mode': DEVELOPMENT_MODE,
         'csrf_enabled': CSRF_ENABLED,
         'api_key_required': API_KEY_REQUIRED,
         'max_email_length': MAX_EMAIL_LENGTH,
+        'body_extraction_enabled': BODY_EXTRACTION_ENABLED,
         'backup_enabled': BACKUP_ENABLED,
         'backup_frequency': BACKUP_FREQUENCY,
         'backup_retention_days': BACKUP_RETENTION_DAYS
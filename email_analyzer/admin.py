@@ -1,5 +1,7 @@
 from django.contrib import admin
+from email_analyzer.forms import EmailMessageForm
 from email_analyzer.models import LogMessage, EmailMessage
+from email_analyzer import search
 
 @admin.register(LogMessage)
 class LogMessageAdmin(admin.ModelAdmin):
@@ -9,6 +11,7 @@ class LogMessageAdmin(admin.ModelAdmin):
 
 @admin.register(EmailMessage)
 class EmailMessageAdmin(admin.ModelAdmin):
+    form = EmailMessageForm
     list_display = ('sender', 'subject', 'category', 'confidence_score', 'received_date', 'is_processed')
     list_filter = ('category', 'is_processed', 'received_date')
     search_fields = ('sender', 'subject', 'content')
@@ -25,3 +28,9 @@ class EmailMessageAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).order_by('-received_date')
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Índice de texto completo em vez de LIKE '%...%' em cada corpo
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
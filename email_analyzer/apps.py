@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EmailAnalyzerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "email_analyzer"
+
+    def ready(self):
+        from email_analyzer import signals  # noqa: F401
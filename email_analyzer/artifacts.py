@@ -0,0 +1,94 @@
+"""
+Local, checksum-verified model artifacts.
+
+``manage.py export_model`` saves the tokenizer, config and safetensors
+weights to a directory together with a MANIFEST.sha256 in ``sha256sum``
+format (so ``sha256sum -c MANIFEST.sha256`` works too). With MODEL_DIR
+pointing at it, the backends load from disk only, after checking every file
+against the manifest: a truncated copy, a tampered file or a file nobody
+listed fails the load instead of serving a different model.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict
+
+MANIFEST = 'MANIFEST.sha256'
+
+
+class ArtifactError(Exception):
+    """The artifact directory is missing, incomplete or does not match its manifest"""
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as artifact:
+        for chunk in iter(lambda: artifact.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _files(directory: Path):
+    return sorted(path for path in directory.rglob('*') if path.is_file() and path.name != MANIFEST)
+
+
+def write_manifest(directory) -> Path:
+    """Hash every file of the directory into its MANIFEST.sha256"""
+    directory = Path(directory)
+    lines = [f"{_sha256(path)}  {path.relative_to(directory).as_posix()}\n" for path in _files(directory)]
+    manifest = directory / MANIFEST
+    manifest.write_text(''.join(lines), encoding='utf-8')
+    return manifest
+
+
+def read_manifest(directory) -> Dict[str, str]:
+    """{relative path: sha256} listed in the directory's manifest"""
+    manifest = Path(directory) / MANIFEST
+    try:
+        lines = manifest.read_text(encoding='utf-8').splitlines()
+    except OSError:
+        raise ArtifactError(f"{manifest} não encontrado; gere o diretório com 'python manage.py export_model'")
+    entries = {}
+    for line in lines:
+        if line.strip():
+            checksum, _, name = line.partition('  ')
+            entries[name.strip()] = checksum.strip()
+    return entries
+
+
+def verify(directory) -> Dict[str, str]:
+    """Check every file against the manifest; returns the manifest or raises ArtifactError"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise ArtifactError(f"Diretório do modelo não encontrado: {directory}")
+    expected = read_manifest(directory)
+    if not expected:
+        raise ArtifactError(f"{directory / MANIFEST} está vazio")
+
+    present = {path.relative_to(directory).as_posix() for path in _files(directory)}
+    # Um arquivo fora do manifesto (ex.: pesos antigos) poderia ser carregado sem verificação
+    unlisted = present - set(expected)
+    if unlisted:
+        raise ArtifactError(f"Arquivos fora do manifesto em {directory}: {', '.join(sorted(unlisted))}")
+    for name, checksum in expected.items():
+        path = directory / name
+        if name not in present:
+            raise ArtifactError(f"Arquivo do modelo ausente: {path}")
+        if _sha256(path) != checksum:
+            raise ArtifactError(f"Checksum divergente: {path}")
+    return expected
+
+
+def revision(manifest: Dict[str, str]) -> str:
+    """Short id of an artifact: the same files always give the same revision"""
+    digest = hashlib.sha256()
+    for name, checksum in sorted(manifest.items()):
+        digest.update(f"{checksum}  {name}\n".encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def use_offline_hub() -> None:
+    """Keep transformers and huggingface_hub from reaching the network in this process"""
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
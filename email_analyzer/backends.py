@@ -0,0 +1,297 @@
+"""
+CPU inference backends behind EmailProcessor.
+
+Every backend loads the same Hugging Face tokenizer and label mapping and
+only differs in how logits are computed:
+
+- ``pytorch``: eager PyTorch model (the original pipeline behaviour)
+- ``pytorch-int8``: the same model with Linear layers dynamically quantized
+- ``onnx``: ONNX Runtime session over a model exported with export_onnx()
+
+With MODEL_DIR (or for the onnx backend, always) the model comes from a local
+directory that is checked against its checksum manifest and loaded with the
+Hugging Face hub offline; see artifacts.py.
+
+Backends are callable like a ``transformers`` text-classification pipeline
+(``backend(texts) -> [{'label', 'score'}]``), so the micro-batcher and the
+label-to-category mapping work unchanged.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Union
+
+import numpy as np
+
+import config
+from . import artifacts
+from .chunking import softmax
+
+
+class InferenceBackend:
+    """Shared tokenization, batching and label mapping"""
+
+    name = 'base'
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.tokenizer = None
+        self.id2label: Dict[int, str] = {}
+        # Identifica o artefato local carregado (entra na versão do cache de resultados)
+        self.revision = None
+        self._load()
+
+    def _load(self) -> None:
+        raise NotImplementedError
+
+    def logits(self, encoded: Dict[str, np.ndarray]) -> np.ndarray:
+        """Return (batch, n_labels) logits for tokenized inputs"""
+        raise NotImplementedError
+
+    def dispose(self) -> None:
+        """Release model weights"""
+
+    def predict_proba(self, texts: Sequence[str], max_length: int = None) -> np.ndarray:
+        encoded = self.tokenizer(
+            list(texts), truncation=True, padding=True,
+            max_length=max_length or config.MODEL_MAX_LENGTH, return_tensors='np'
+        )
+        return softmax(self.logits(encoded))
+
+    def predict_windows(self, windows: Sequence[Sequence[int]]) -> np.ndarray:
+        """Label probabilities for token windows of one long email, in one batch"""
+        encoded = self.tokenizer.pad(
+            {'input_ids': [self.tokenizer.build_inputs_with_special_tokens(list(w)) for w in windows]},
+            return_tensors='np'
+        )
+        return softmax(self.logits(encoded))
+
+    def __call__(self, inputs: Union[str, Sequence[str]], batch_size: int = None,
+                 truncation: bool = True, max_length: int = None, **kwargs) -> List[Dict[str, Any]]:
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        batch_size = batch_size or len(texts) or 1
+
+        results = []
+        for start in range(0, len(texts), batch_size):
+            probabilities = self.predict_proba(texts[start:start + batch_size], max_length)
+            for row in probabilities:
+                best = int(np.argmax(row))
+                results.append({'label': self.id2label[best], 'score': float(row[best])})
+        return results
+
+    def _local_source(self, directory) -> str:
+        """Verify a local artifact directory and keep the hub offline before loading from it"""
+        if config.MODEL_VERIFY_CHECKSUMS:
+            self.revision = artifacts.revision(artifacts.verify(directory))
+        artifacts.use_offline_hub()
+        return str(directory)
+
+    def _load_tokenizer(self, source: str, local_files_only: bool = False) -> None:
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=local_files_only)
+        self.id2label = {
+            int(k): v
+            for k, v in AutoConfig.from_pretrained(source, local_files_only=local_files_only).id2label.items()
+        }
+
+
+class PyTorchBackend(InferenceBackend):
+    """Eager PyTorch model"""
+
+    name = 'pytorch'
+
+    def _load(self) -> None:
+        # Antes dos imports: o modo offline do hub é lido quando ele é importado
+        local = bool(config.MODEL_DIR)
+        source = self._local_source(config.MODEL_DIR) if local else self.model_name
+
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        if config.INFERENCE_THREADS:
+            torch.set_num_threads(config.INFERENCE_THREADS)
+        self._load_tokenizer(source, local)
+        self.model = AutoModelForSequenceClassification.from_pretrained(source, local_files_only=local)
+        self.model.eval()
+        self._torch = torch
+
+    def logits(self, encoded: Dict[str, np.ndarray]) -> np.ndarray:
+        torch = self._torch
+        inputs = {name: torch.from_numpy(np.asarray(value)) for name, value in encoded.items()}
+        with torch.inference_mode():
+            return self.model(**inputs).logits.float().numpy()
+
+    def dispose(self) -> None:
+        self.model = None
+
+
+class QuantizedPyTorchBackend(PyTorchBackend):
+    """PyTorch model with Linear layers dynamically quantized to int8"""
+
+    name = 'pytorch-int8'
+
+    def _load(self) -> None:
+        super()._load()
+        torch = self._torch
+        self.model = torch.ao.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+
+class ONNXRuntimeBackend(InferenceBackend):
+    """ONNX Runtime session over a model exported with export_onnx()"""
+
+    name = 'onnx'
+
+    def __init__(self, model_name: str, model_dir: str = None):
+        self.model_dir = Path(model_dir or config.ONNX_MODEL_DIR)
+        super().__init__(model_name)
+
+    def _load(self) -> None:
+        model_path = self.model_dir / 'model.onnx'
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"{model_path} não encontrado; execute 'python manage.py export_onnx' primeiro"
+            )
+        source = self._local_source(self.model_dir)
+
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("INFERENCE_BACKEND=onnx requer o pacote onnxruntime (pip install -r requirements.txt)")
+
+        self._load_tokenizer(source, local_files_only=True)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if config.INFERENCE_THREADS:
+            options.intra_op_num_threads = config.INFERENCE_THREADS
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=['CPUExecutionProvider']
+        )
+        self._input_names = [item.name for item in self.session.get_inputs()]
+
+    def logits(self, encoded: Dict[str, np.ndarray]) -> np.ndarray:
+        input_ids = np.asarray(encoded['input_ids'], dtype=np.int64)
+        feed = {}
+        for name in self._input_names:
+            value = encoded.get(name)
+            feed[name] = np.zeros_like(input_ids) if value is None else np.asarray(value, dtype=np.int64)
+        return self.session.run(None, feed)[0]
+
+    def dispose(self) -> None:
+        self.session = None
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PyTorchBackend, QuantizedPyTorchBackend, ONNXRuntimeBackend)
+}
+
+
+def load_backend(name: str, model_name: str) -> InferenceBackend:
+    """Instantiate the backend selected by INFERENCE_BACKEND"""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend de inferência desconhecido: {name} (opções: {', '.join(BACKENDS)})")
+    return backend_class(model_name)
+
+
+def export_onnx(model_name: str, output_dir: str, opset: int = 17) -> Path:
+    """Export the Hugging Face model, tokenizer and config for the onnx backend"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["exemplo de email"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['logits'] = {0: 'batch'}
+
+    torch.onnx.export(
+        model, tuple(sample[name] for name in input_names), str(output / 'model.onnx'),
+        input_names=input_names, output_names=['logits'],
+        dynamic_axes=dynamic_axes, opset_version=opset
+    )
+    tokenizer.save_pretrained(output)
+    model.config.save_pretrained(output)
+    artifacts.write_manifest(output)
+    return output
+
+
+def export_model(model_name: str, output_dir: str) -> Path:
+    """Save the Hugging Face model (safetensors), tokenizer and config with a checksum manifest, for MODEL_DIR"""
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output)
+    AutoModelForSequenceClassification.from_pretrained(model_name).save_pretrained(output, safe_serialization=True)
+    artifacts.write_manifest(output)
+    return output
+
+
+def check_parity(candidate: InferenceBackend, reference: InferenceBackend,
+                 texts: Sequence[str], tolerance: float = 0.05,
+                 min_agreement: float = 0.95) -> Dict[str, Any]:
+    """Compare a backend's probabilities and labels against the eager reference"""
+    report = compare_probabilities(
+        reference.predict_proba(texts), candidate.predict_proba(texts),
+        tolerance=tolerance, min_agreement=min_agreement
+    )
+    return {'backend': candidate.name, 'reference': reference.name, **report}
+
+
+def compare_probabilities(expected: np.ndarray, actual: np.ndarray, tolerance: float = 0.05,
+                          min_agreement: float = 0.95) -> Dict[str, Any]:
+    """Label agreement and largest probability difference between two backends"""
+    expected, actual = np.asarray(expected), np.asarray(actual)
+    label_agreement = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1))) if len(expected) else 1.0
+    max_abs_diff = float(np.abs(expected - actual).max()) if len(expected) else 0.0
+    return {
+        'samples': len(expected),
+        'label_agreement': label_agreement,
+        'max_abs_diff': max_abs_diff,
+        'passed': max_abs_diff <= tolerance and label_agreement >= min_agreement,
+    }
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (Linux), for memory comparisons"""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def process_memory_mb(pid: str = 'self') -> Dict[str, float]:
+    """RSS, PSS and USS (private pages) of a process in MB (Linux); empty when unavailable.
+
+    After a fork, pages still shared with the parent count fully in RSS, split
+    between the processes in PSS and not at all in USS.
+    """
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as rollup:
+            for line in rollup:
+                name, _, value = line.partition(':')
+                parts = value.split()
+                if len(parts) == 2 and parts[1] == 'kB':
+                    fields[name] = int(parts[0])
+    except OSError:
+        return {}
+    return {
+        'rss': fields.get('Rss', 0) / 1024,
+        'pss': fields.get('Pss', 0) / 1024,
+        'uss': (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024,
+    }
@@ -0,0 +1,196 @@
+"""
+Vectorized confidence scoring for many emails at once.
+
+The whole batch is scanned in a single KeywordMatcher pass and turned into
+a matrix of integer features; the weighted confidences, productive boosts
+and keyword category decisions are then computed with NumPy. The
+results match EmailProcessor._calculate_enhanced_confidence and
+_keyword_based_classification up to floating point rounding.
+"""
+
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+from .keywords import (
+    KeywordMatcher,
+    PRODUCTIVE_KEYWORDS, UNPRODUCTIVE_KEYWORDS,
+    WORK_CONTEXT_INDICATORS, SPAM_CONTEXT_INDICATORS,
+    WORK_INDICATOR_GROUPS, PRODUCTIVE_COMBINATIONS, UNPRODUCTIVE_COMBINATIONS,
+    BOOST_COMBINATIONS, FORMAL_LANGUAGE, SPECIFIC_DETAILS,
+    PRODUCTIVE_STRUCTURE, UNPRODUCTIVE_CALL_TO_ACTION, UNPRODUCTIVE_BLESSINGS, EMOJIS,
+    PRODUCTIVE_TIEBREAK, UNPRODUCTIVE_TIEBREAK,
+)
+
+FEATURE_COLUMNS = [
+    'productive_found', 'unproductive_found',
+    'productive_frequency', 'unproductive_frequency',
+    'productive_first_line', 'unproductive_first_line',
+    'productive_combinations', 'unproductive_combinations',
+    'has_colon', 'has_list', 'more_than_50_words', 'fewer_than_30_words',
+    'productive_structure', 'emojis', 'call_to_action', 'blessings',
+    'work_context', 'spam_context',
+    'work_indicators', 'boost_combinations', 'formal_language', 'specific_details',
+    'productive_tiebreak', 'unproductive_tiebreak',
+]
+_COLUMN = {name: index for index, name in enumerate(FEATURE_COLUMNS)}
+
+# Tabelas equivalentes às cadeias de if/elif do caminho escalar
+_KEYWORD_BASE_SCORE = np.array([0.2, 0.4, 0.6, 0.75, 0.9])
+_WORK_INDICATOR_BOOST = np.array([0.0, 0.0, 0.05, 0.10, 0.15, 0.20, 0.25, 0.25, 0.25])
+_CONTEXT_SCORE = np.array([0.4, 0.6, 0.8])
+
+WEIGHTS = {'sentiment': 0.4, 'keywords': 0.3, 'structure': 0.2, 'context': 0.1}
+
+
+def build_feature_matrix(texts: Sequence[str], matcher: KeywordMatcher) -> np.ndarray:
+    """Return an (N, len(FEATURE_COLUMNS)) integer matrix for preprocessed texts"""
+    counts, first_line = matcher.count_matrix(texts)
+    present = counts > 0
+
+    def columns(words):
+        return [matcher.index[word] for word in words]
+
+    def found(words, matrix=present):
+        return matrix[:, columns(words)].sum(axis=1)
+
+    def any_of(words):
+        return present[:, columns(words)].any(axis=1)
+
+    def all_of(combinations):
+        return sum(present[:, columns(words)].all(axis=1).astype(np.int32) for words in combinations)
+
+    # Indicadores estruturais que não dependem de palavras-chave
+    word_limits = [len(text.split(None, 50)) for text in texts]
+    has_list = [
+        '-' in text and any(line.strip().startswith('-') for line in text.split('\n'))
+        for text in texts
+    ]
+
+    feature_columns = {
+        'productive_found': found(PRODUCTIVE_KEYWORDS),
+        'unproductive_found': found(UNPRODUCTIVE_KEYWORDS),
+        'productive_frequency': counts[:, columns(PRODUCTIVE_KEYWORDS)].sum(axis=1),
+        'unproductive_frequency': counts[:, columns(UNPRODUCTIVE_KEYWORDS)].sum(axis=1),
+        'productive_first_line': found(PRODUCTIVE_KEYWORDS, first_line),
+        'unproductive_first_line': found(UNPRODUCTIVE_KEYWORDS, first_line),
+        'productive_combinations': all_of(PRODUCTIVE_COMBINATIONS),
+        'unproductive_combinations': all_of(UNPRODUCTIVE_COMBINATIONS),
+        'has_colon': [':' in text for text in texts],
+        'has_list': has_list,
+        'more_than_50_words': [limit > 50 for limit in word_limits],
+        'fewer_than_30_words': [limit < 30 for limit in word_limits],
+        'productive_structure': any_of(PRODUCTIVE_STRUCTURE),
+        'emojis': any_of(EMOJIS),
+        'call_to_action': any_of(UNPRODUCTIVE_CALL_TO_ACTION),
+        'blessings': any_of(UNPRODUCTIVE_BLESSINGS),
+        'work_context': found(WORK_CONTEXT_INDICATORS),
+        'spam_context': found(SPAM_CONTEXT_INDICATORS),
+        'work_indicators': sum(any_of(group).astype(np.int32) for group in WORK_INDICATOR_GROUPS),
+        'boost_combinations': all_of(BOOST_COMBINATIONS),
+        'formal_language': any_of(FORMAL_LANGUAGE),
+        'specific_details': any_of(SPECIFIC_DETAILS),
+        'productive_tiebreak': any_of(PRODUCTIVE_TIEBREAK),
+        'unproductive_tiebreak': any_of(UNPRODUCTIVE_TIEBREAK),
+    }
+
+    matrix = np.zeros((len(texts), len(FEATURE_COLUMNS)), dtype=np.int32)
+    for name, values in feature_columns.items():
+        matrix[:, _COLUMN[name]] = values
+    return matrix
+
+
+def enhanced_confidence(features: np.ndarray, base_confidences: np.ndarray,
+                        productive: np.ndarray) -> np.ndarray:
+    """Vectorized _calculate_enhanced_confidence for every row of ``features``"""
+    f = features.astype(np.float64)
+
+    def column(name):
+        return f[:, _COLUMN[name]]
+
+    def pick(productive_name, unproductive_name):
+        return np.where(productive, column(productive_name), column(unproductive_name))
+
+    # Fator de palavras-chave
+    found = pick('productive_found', 'unproductive_found').astype(np.int64)
+    keyword_factor = (
+        _KEYWORD_BASE_SCORE[np.minimum(found, 4)]
+        + np.minimum(0.1, pick('productive_frequency', 'unproductive_frequency') * 0.02)
+        + pick('productive_first_line', 'unproductive_first_line') * 0.1
+        + pick('productive_combinations', 'unproductive_combinations') * 0.15
+    )
+    keyword_factor = np.clip(keyword_factor, 0.1, 0.95)
+
+    # Fator de estrutura
+    structure_indicators = np.where(
+        productive,
+        column('has_colon') + column('more_than_50_words') + column('has_list') + column('productive_structure'),
+        column('emojis') + column('call_to_action') + column('blessings') + column('fewer_than_30_words'),
+    )
+    structure_factor = np.minimum(0.9, 0.4 + structure_indicators * 0.15)
+
+    # Fator de contexto
+    context_matches = pick('work_context', 'spam_context').astype(np.int64)
+    context_factor = _CONTEXT_SCORE[np.minimum(context_matches, 2)]
+
+    confidence = (
+        base_confidences * WEIGHTS['sentiment']
+        + keyword_factor * WEIGHTS['keywords']
+        + structure_factor * WEIGHTS['structure']
+        + context_factor * WEIGHTS['context']
+    )
+
+    # Boost final apenas para emails produtivos
+    boost = (
+        _WORK_INDICATOR_BOOST[column('work_indicators').astype(np.int64)]
+        + column('boost_combinations') * 0.10
+        + column('formal_language') * 0.05
+        + column('specific_details') * 0.05
+    )
+    confidence = np.where(productive, confidence + boost, confidence)
+
+    return np.clip(confidence, 0.0, 1.0)
+
+
+def keyword_decisions(features: np.ndarray):
+    """Vectorized category decision of _keyword_based_classification.
+
+    Returns ``(productive, base_confidences, ambiguous)`` boolean/float arrays.
+    """
+    productive_count = features[:, _COLUMN['productive_found']]
+    unproductive_count = features[:, _COLUMN['unproductive_found']]
+    tie = productive_count == unproductive_count
+    productive_tiebreak = features[:, _COLUMN['productive_tiebreak']].astype(bool)
+    unproductive_tiebreak = features[:, _COLUMN['unproductive_tiebreak']].astype(bool)
+
+    productive = (productive_count > unproductive_count) | (tie & productive_tiebreak)
+    base_confidences = np.where(tie, 0.6, 0.7)
+    ambiguous = tie & ~productive_tiebreak & ~unproductive_tiebreak
+    return productive, base_confidences, ambiguous
+
+
+def score_batch(texts: Sequence[str], matcher: KeywordMatcher,
+                base_confidences: Sequence[float] = None,
+                categories: Sequence[str] = None) -> Dict[str, Any]:
+    """Score many preprocessed texts at once.
+
+    Without ``categories`` the keyword-based decision is used, as in the
+    fallback path of classify_email. With ``categories`` and their
+    ``base_confidences`` (e.g. model scores) only the confidence is computed.
+    """
+    features = build_feature_matrix(texts, matcher)
+
+    if categories is None:
+        productive, bases, ambiguous = keyword_decisions(features)
+        confidences = enhanced_confidence(features, bases, productive)
+        confidences = np.where(ambiguous, 0.5, confidences)
+    else:
+        productive = np.asarray(categories) == 'produtivo'
+        bases = np.asarray(base_confidences, dtype=np.float64)
+        confidences = enhanced_confidence(features, bases, productive)
+
+    return {
+        'categories': np.where(productive, 'produtivo', 'improdutivo'),
+        'confidences': confidences,
+        'features': features,
+    }
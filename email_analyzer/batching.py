@@ -0,0 +1,206 @@
+"""
+Dynamic micro-batching in front of the Hugging Face classifier.
+
+Concurrent classify_email calls are queued and a background thread groups
+them into one forward pass, collecting requests for at most ``max_wait_ms``
+or until ``max_batch_size`` texts are waiting.
+"""
+
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+
+class _Request:
+    __slots__ = ('text', 'future', 'enqueued_at')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collect single predictions into batched classifier calls"""
+
+    def __init__(self, predict_batch: Callable[[List[str]], List[Dict[str, Any]]],
+                 max_batch_size: int = 16, max_wait_ms: float = 10.0,
+                 max_length_ratio: float = 2.0, stats_window: int = 1000,
+                 timeout: float = 30.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, max_batch_size)
+        # Espera máxima de submit(): um pedido nunca fica preso para sempre
+        self.timeout = timeout
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_length_ratio = max_length_ratio
+
+        self._queue: "queue.Queue[_Request | None]" = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._thread_lock = threading.Lock()
+        self._closed = False
+
+        # Estatísticas para ajuste do tamanho de lote e da janela
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=stats_window)
+        self._completions = deque(maxlen=stats_window)
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._total_items = 0
+        self._total_batches = 0
+
+    def submit(self, text: str, timeout: float = None) -> Dict[str, Any]:
+        """Queue one text and block until its prediction is ready"""
+        request = _Request(text)
+        with self._thread_lock:
+            # Sob o lock: close() não coloca o sentinela entre a verificação e o put
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._ensure_worker()
+            self._queue.put(request)
+        return request.future.result(timeout=self.timeout if timeout is None else timeout)
+
+    def close(self) -> None:
+        """Stop the worker thread after it serves the queued requests; fail what is left"""
+        with self._thread_lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            if thread is not None and self._pid == os.getpid():
+                self._queue.put(None)
+            else:
+                thread = None
+        if thread is not None:
+            thread.join(timeout=5)
+
+        # Thread parada por timeout (ou perdida num fork): ninguém mais atende a fila
+        error = RuntimeError("MicroBatcher is closed")
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None and not request.future.done():
+                request.future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return throughput and latency percentiles for recent requests"""
+        with self._stats_lock:
+            latencies = np.array(self._latencies, dtype=float)
+            completions = list(self._completions)
+            batch_sizes = np.array(self._batch_sizes, dtype=float)
+            total_items = self._total_items
+            total_batches = self._total_batches
+
+        throughput = 0.0
+        if len(completions) > 1 and completions[-1] > completions[0]:
+            throughput = (len(completions) - 1) / (completions[-1] - completions[0])
+
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies * 1000.0, [50, 95, 99])
+        else:
+            p50 = p95 = p99 = 0.0
+
+        return {
+            'total_items': total_items,
+            'total_batches': total_batches,
+            'avg_batch_size': float(batch_sizes.mean()) if batch_sizes.size else 0.0,
+            'throughput_per_sec': round(throughput, 2),
+            'latency_ms': {
+                'p50': round(float(p50), 2),
+                'p95': round(float(p95), 2),
+                'p99': round(float(p99), 2),
+            },
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread (again, in a forked child); call with _thread_lock held"""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        if self._thread is None or self._pid != os.getpid():
+            if self._thread is not None:
+                # Depois de um fork (gunicorn com preload) a thread do processo
+                # pai não existe no filho: fila e thread novas
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            # A thread só guarda uma referência fraca: um batcher abandonado (o
+            # processador trocado por reload_processor) é coletado e a encerra
+            weakref.finalize(self, self._queue.put, None)
+            self._thread = threading.Thread(
+                target=self._run, args=(weakref.ref(self), self._queue),
+                name="email-microbatcher", daemon=True
+            )
+            self._thread.start()
+
+    @staticmethod
+    def _run(batcher_ref, requests: queue.Queue) -> None:
+        while True:
+            first = requests.get()
+            batcher = batcher_ref()
+            if first is None or batcher is None:
+                return
+
+            batch = [first]
+            deadline = first.enqueued_at + batcher.max_wait
+            stop = False
+            while len(batch) < batcher.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+
+            batcher._process(batch)
+            del batcher
+            if stop:
+                return
+
+    def _process(self, batch: List[_Request]) -> None:
+        for group in self._group_by_length(batch):
+            try:
+                results = self.predict_batch([request.text for request in group])
+            except Exception as e:
+                for request in group:
+                    request.future.set_exception(e)
+                continue
+
+            if len(results) != len(group):
+                error = RuntimeError(f"predict_batch returned {len(results)} results for {len(group)} texts")
+                for request in group:
+                    request.future.set_exception(error)
+                continue
+
+            finished_at = time.perf_counter()
+            for request, result in zip(group, results):
+                request.future.set_result(result)
+
+            with self._stats_lock:
+                self._total_items += len(group)
+                self._total_batches += 1
+                self._batch_sizes.append(len(group))
+                for request in group:
+                    self._latencies.append(finished_at - request.enqueued_at)
+                    self._completions.append(finished_at)
+
+    def _group_by_length(self, batch: List[_Request]) -> List[List[_Request]]:
+        """Sort by length and split where padding would grow too much"""
+        ordered = sorted(batch, key=lambda request: len(request.text))
+        groups = [[ordered[0]]]
+        for request in ordered[1:]:
+            shortest = max(1, len(groups[-1][0].text))
+            if len(request.text) / shortest > self.max_length_ratio:
+                groups.append([request])
+            else:
+                groups[-1].append(request)
+        return groups
@@ -0,0 +1,171 @@
+"""
+Deduplicated, compressed storage for email bodies and suggested responses.
+
+Mass mailings repeat one body thousands of times, and suggested responses
+come from a handful of templates. Each distinct text is stored once in
+EmailBody, keyed by its SHA-256, and compressed with zlib (or zstd when
+BODY_STORE_CODEC=zstd and the zstandard package is installed). Texts that
+do not shrink are kept as they are. EmailMessage.content and
+suggested_response are properties: assigned texts are resolved to EmailBody
+rows on save/bulk_create/bulk_update, and bodies are decompressed on access.
+On SQLite each body also keeps an uncompressed search_text, which the
+full-text index triggers read in plain SQL (see search.py).
+"""
+
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.db.models.functions import Length
+
+import config
+from .models import BODY_FIELDS, EmailBody, EmailMessage
+
+CODECS = ('none', 'zlib', 'zstd')
+# Limite de parâmetros por consulta IN
+_LOOKUP_BATCH = 500
+# Corpos de campanha são lidos (e reindexados) muitas vezes: os textos
+# descomprimidos mais recentes ficam em memória, até _DECODED_MAX_CHARS cada
+_DECODED_MAX_ENTRIES = 256
+_DECODED_MAX_CHARS = 64 * 1024
+_decoded: "OrderedDict[Tuple[bytes, str], str]" = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def _encode_text(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogatepass')
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(_encode_text(text)).hexdigest()
+
+
+def encode(text: str, codec: str = None) -> Tuple[str, bytes]:
+    """Compress text with the configured codec; returns (codec, data)"""
+    codec = codec or config.BODY_STORE_CODEC
+    raw = _encode_text(text)
+    if codec == 'zstd':
+        import zstandard
+        data = zstandard.ZstdCompressor(level=config.BODY_STORE_LEVEL).compress(raw)
+    elif codec == 'zlib':
+        data = zlib.compress(raw, config.BODY_STORE_LEVEL)
+    elif codec == 'none':
+        data = raw
+    else:
+        raise ValueError(f"Codec de corpo desconhecido: {codec} (opções: {', '.join(CODECS)})")
+    # Textos curtos costumam crescer com o cabeçalho do compressor
+    if len(data) >= len(raw):
+        return 'none', raw
+    return codec, data
+
+
+def _decompress(data: bytes, codec: str) -> str:
+    if codec == 'zlib':
+        data = zlib.decompress(data)
+    elif codec == 'zstd':
+        import zstandard
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return data.decode('utf-8', 'surrogatepass')
+
+
+def decode(data, codec: str) -> str:
+    """Decompress a stored body, reusing recently decoded texts"""
+    key = (bytes(data), codec)
+    with _decoded_lock:
+        text = _decoded.get(key)
+        if text is not None:
+            _decoded.move_to_end(key)
+            return text
+    text = _decompress(key[0], codec)
+    if len(text) <= _DECODED_MAX_CHARS:
+        with _decoded_lock:
+            _decoded[key] = text
+            if len(_decoded) > _DECODED_MAX_ENTRIES:
+                _decoded.popitem(last=False)
+    return text
+
+
+def store(texts: Iterable[str]) -> Dict[str, int]:
+    """Make sure every text has an EmailBody row; returns {text: body id}"""
+    by_digest = {digest(text): text for text in texts}
+    ids: Dict[str, int] = {}
+    digests = list(by_digest)
+    for start in range(0, len(digests), _LOOKUP_BATCH):
+        batch = digests[start:start + _LOOKUP_BATCH]
+        ids.update(EmailBody.objects.filter(digest__in=batch).values_list('digest', 'id'))
+        missing = [key for key in batch if key not in ids]
+        if not missing:
+            continue
+        bodies = []
+        search_copy = connection.vendor == 'sqlite'
+        for key in missing:
+            text = by_digest[key]
+            codec, data = encode(text)
+            bodies.append(EmailBody(digest=key, codec=codec, data=data, size=len(_encode_text(text)),
+                                    search_text=text if search_copy else ''))
+        # Outro processo pode ter gravado o mesmo corpo ao mesmo tempo
+        EmailBody.objects.bulk_create(bodies, ignore_conflicts=True)
+        ids.update(EmailBody.objects.filter(digest__in=missing).values_list('digest', 'id'))
+    return {by_digest[key]: body_id for key, body_id in ids.items()}
+
+
+def attach_bodies(emails: Iterable[EmailMessage]) -> None:
+    """Point emails at the EmailBody rows of the texts assigned to them"""
+    pending: List[Tuple[EmailMessage, str, str]] = [
+        (email, name, text)
+        for email in emails
+        for name, text in email.__dict__.pop('_pending_bodies', {}).items()
+    ]
+    if not pending:
+        return
+    ids = store({text for _, _, text in pending if text})
+    for email, name, text in pending:
+        # Texto vazio não ocupa linha
+        body_id = ids[text] if text else None
+        setattr(email, f'{BODY_FIELDS[name]}_id', body_id)
+        # Lido de volta sem consultar nem descomprimir
+        email.__dict__.setdefault('_stored_bodies', {})[name] = (body_id, text)
+
+
+def _unreferenced():
+    referenced = Q(Exists(EmailMessage.objects.filter(content_body=OuterRef('pk')))) | \
+        Q(Exists(EmailMessage.objects.filter(response_body=OuterRef('pk'))))
+    return EmailBody.objects.exclude(referenced)
+
+
+def prune() -> int:
+    """Delete bodies no email points to any more; returns how many"""
+    # Um corpo recém-gravado por store() só ganha referência no INSERT do email:
+    # rode fora dos horários de importação
+    deleted, _ = _unreferenced().delete()
+    return deleted
+
+
+def space_report() -> Dict[str, float]:
+    """Bytes the texts would take inline versus what the store keeps"""
+    references = EmailMessage.objects.aggregate(
+        content=Sum('content_body__size'), responses=Sum('response_body__size')
+    )
+    stored = EmailBody.objects.aggregate(
+        raw=Sum('size'), stored=Sum(Length('data')), search=Sum('size', filter=~Q(search_text=''))
+    )
+    logical = (references['content'] or 0) + (references['responses'] or 0)
+    distinct = stored['raw'] or 0
+    compressed = stored['stored'] or 0
+    search_copy = stored['search'] or 0
+    return {
+        'emails': EmailMessage.objects.count(),
+        'bodies': EmailBody.objects.count(),
+        'unreferenced_bodies': _unreferenced().count(),
+        'logical_bytes': logical,
+        'distinct_bytes': distinct,
+        'stored_bytes': compressed,
+        'search_bytes': search_copy,
+        'dedup_ratio': logical / distinct if distinct else 1.0,
+        'compression_ratio': distinct / compressed if compressed else 1.0,
+        'saved_bytes': logical - compressed - search_copy,
+    }
@@ -0,0 +1,281 @@
+"""
+Bulk classification over streams of email records.
+
+The request body is read incrementally, either as a JSON array or as NDJSON
+(one object per line), and records are classified in model-sized batches.
+Each finished batch is persisted with bulk_create and yielded as NDJSON lines,
+so memory stays bounded by the batch size on both sides of the request.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List
+
+import config
+from .models import EmailMessage
+from .near_duplicates import index_emails
+from .rollups import record_emails
+
+READ_CHUNK_SIZE = 64 * 1024
+REQUIRED_FIELDS = ('subject', 'content', 'sender')
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_END = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[\s,\]}]')
+
+
+class BulkFormatError(ValueError):
+    """The body is neither a JSON array nor NDJSON"""
+
+
+def iter_records(stream, chunk_size: int = READ_CHUNK_SIZE, max_record_size: int = None) -> Iterator[Any]:
+    """Yield records from a file-like object holding a JSON array or NDJSON.
+
+    Malformed input is yielded as a BulkFormatError instance rather than
+    raised: a bad NDJSON line is skipped, a broken JSON array ends the stream.
+    A record longer than max_record_size characters counts as malformed.
+    """
+    if max_record_size is None:
+        max_record_size = config.BULK_MAX_RECORD_SIZE
+    first = stream.read(chunk_size)
+    if isinstance(first, bytes):
+        decoder = _Utf8Reader(stream, chunk_size)
+        first = decoder.decode(first)
+        read = decoder.read
+    else:
+        read = lambda: stream.read(chunk_size)
+    
+    head = first.lstrip()
+    if head.startswith('['):
+        yield from _iter_json_array(head[1:], read, max_record_size)
+    else:
+        yield from _iter_ndjson(first, read, max_record_size)
+
+
+class _Utf8Reader:
+    """Decode a byte stream chunk by chunk without splitting multibyte characters"""
+    
+    def __init__(self, stream, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+    
+    def decode(self, data: bytes) -> str:
+        return self._decoder.decode(data, final=not data)
+    
+    def read(self) -> str:
+        return self.decode(self.stream.read(self.chunk_size))
+
+
+def _iter_ndjson(buffer: str, read, max_record_size: int) -> Iterator[Any]:
+    skipping = False
+    chunk = buffer
+    while True:
+        # Só um pedaço novo com '\n' pode completar uma linha: a parte acumulada não é varrida de novo
+        lines = []
+        if '\n' in chunk:
+            *lines, buffer = buffer.split('\n')
+        for line in lines:
+            if skipping:
+                # Fim da linha grande demais
+                skipping = False
+                continue
+            yield from _parse_line(line)
+        if len(buffer) > max_record_size:
+            # Descartar o resto da linha até o próximo '\n' em vez de acumulá-la
+            if not skipping:
+                yield _record_too_large(max_record_size)
+            skipping = True
+            buffer = ''
+        chunk = read()
+        if not chunk:
+            break
+        buffer += chunk
+    if not skipping:
+        yield from _parse_line(buffer)
+
+
+class _ValueScanner:
+    """Track where a JSON value that spans reads can end, looking at each character once"""
+    
+    def __init__(self, start: int):
+        self.position = start
+        self.depth = 0
+        self.in_string = False
+        self.complete = False
+    
+    def shift(self, offset: int) -> None:
+        self.position -= offset
+    
+    def feed(self, buffer: str) -> bool:
+        """Scan the data that arrived since the last call; True once the value may be whole"""
+        if self.complete:
+            return True
+        if self.depth == 0 and not self.in_string:
+            first = buffer[self.position]
+            if first not in '{["':
+                # Número ou literal: termina no próximo separador
+                self.complete = _SCALAR_END.search(buffer, self.position) is not None
+                return self.complete
+        while not self.complete:
+            match = (_STRING_END if self.in_string else _STRUCTURE).search(buffer, self.position)
+            if match is None:
+                self.position = max(self.position, len(buffer))
+                break
+            char = match.group()
+            self.position = match.end()
+            if char == '\\':
+                # Pula o caractere escapado, mesmo que ele ainda não tenha chegado
+                self.position += 1
+            elif char == '"':
+                self.in_string = not self.in_string
+                self.complete = not self.in_string and self.depth == 0
+            elif char in '{[':
+                self.depth += 1
+            else:
+                self.depth -= 1
+                self.complete = self.depth == 0
+        return self.complete
+
+
+def _record_too_large(max_record_size: int) -> BulkFormatError:
+    return BulkFormatError(f'Record larger than {max_record_size} characters')
+
+
+def _parse_line(line: str) -> Iterator[Any]:
+    line = line.strip()
+    if not line:
+        return
+    try:
+        yield json.loads(line)
+    except json.JSONDecodeError as e:
+        yield BulkFormatError(f'Invalid JSON: {e.msg}')
+
+
+def _iter_json_array(buffer: str, read, max_record_size: int) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    position = 0
+    eof = False
+    expect_value = True
+    # Um elemento longo chega em muitas leituras: decodificar só quando ele pode estar
+    # completo, em vez de tentar de novo todo o buffer a cada pedaço
+    scanner = None
+    while True:
+        # Pular espaços e vírgulas entre os elementos
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            if buffer[position] == ',':
+                expect_value = True
+            position += 1
+        
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        
+        if position < len(buffer) and expect_value:
+            if scanner is None:
+                scanner = _ValueScanner(position)
+            if scanner.feed(buffer) or eof:
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # Com o elemento fechado, ler mais não o conserta
+                    yield BulkFormatError('Invalid JSON array')
+                    return
+                yield record
+                position = end
+                expect_value = False
+                scanner = None
+                continue
+        elif position < len(buffer):
+            yield BulkFormatError('Expected "," or "]" in JSON array')
+            return
+        elif eof:
+            yield BulkFormatError('Unterminated JSON array')
+            return
+        
+        # Descartar o que já foi consumido e ler mais dados
+        buffer = buffer[position:]
+        if scanner is not None:
+            scanner.shift(position)
+        position = 0
+        if len(buffer) > max_record_size:
+            # Elemento quebrado ou enorme: não ler o resto do corpo para a memória
+            yield _record_too_large(max_record_size)
+            return
+        chunk = read()
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+
+def _validate(record: Any):
+    """Return (subject, content, sender) or an error message"""
+    if isinstance(record, BulkFormatError):
+        return str(record)
+    if not isinstance(record, dict):
+        return 'Record must be a JSON object'
+    values = tuple(record.get(field, '') for field in REQUIRED_FIELDS)
+    if not all(isinstance(value, str) and value for value in values):
+        return 'Missing required fields'
+    return values
+
+
+def _batches(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def classify_records(records: Iterable[Any], processor, batch_size: int = None,
+                     persist: bool = True) -> Iterator[Dict[str, Any]]:
+    """Classify records batch by batch, yielding one result dict per record in order"""
+    batch_size = batch_size or config.BULK_BATCH_SIZE
+    index = 0
+    for batch in _batches(records, batch_size):
+        parsed = [_validate(record) for record in batch]
+        valid = [values for values in parsed if isinstance(values, tuple)]
+        results = iter(processor.process_batch(valid)) if valid else iter(())
+        
+        rows = []
+        lines = []
+        for values in parsed:
+            if not isinstance(values, tuple):
+                lines.append({'index': index, 'error': values})
+            else:
+                subject, content, sender = values
+                result = next(results)
+                line = {'index': index, **result}
+                if persist:
+                    rows.append(EmailMessage(
+                        subject=subject,
+                        content=content,
+                        sender=sender,
+                        category=result['category'],
+                        confidence_score=result['confidence_score'],
+                        suggested_response=result['suggested_response'],
+                        is_processed=True
+                    ))
+                lines.append(line)
+            index += 1
+        
+        if rows:
+            saved = EmailMessage.objects.bulk_create(rows, batch_size=batch_size)
+            if config.NEAR_DUPLICATE_ENABLED:
+                index_emails(saved)
+            record_emails(saved)
+            saved = iter(saved)
+            for line in lines:
+                if 'error' not in line:
+                    line['id'] = next(saved).id
+        yield from lines
+
+
+def stream_ndjson(records: Iterable[Any], processor, **kwargs) -> Iterator[bytes]:
+    """Serialize classify_records output as NDJSON lines"""
+    for result in classify_records(records, processor, **kwargs):
+        yield (json.dumps(result, ensure_ascii=False) + '\n').encode('utf-8')
@@ -0,0 +1,119 @@
+"""
+Content-addressed cache of classification results.
+
+Keys are a SHA-256 of the preprocessed email text together with the model
+and rule version (EmailProcessor.model_version, which also covers the
+long-email, body extraction and cascade settings), so identical bodies (mass
+mailings, chain letters) are classified once and a model or settings change
+never serves stale results. Results live
+in an in-process LRU tier and, optionally, in a Django cache shared by all
+workers.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import config
+
+
+class ClassificationCache:
+    """Two-tier (local LRU + optional Django cache) result cache with TTL"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = config.CACHE_TTL,
+                 shared_alias: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls) -> "ClassificationCache":
+        return cls(
+            max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+            ttl=config.CACHE_TTL,
+            shared_alias=config.RESULT_CACHE_SHARED_ALIAS or None
+        )
+
+    @staticmethod
+    def make_key(processed_text: str, version: str) -> str:
+        """Hash the normalized text and the model/rule version into a key"""
+        digest = hashlib.sha256()
+        digest.update(version.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(processed_text.encode('utf-8'))
+        return f"{config.MODEL_CACHE_KEY}:{digest.hexdigest()}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = None
+        if self.shared_alias:
+            try:
+                value = self._shared_cache().get(key)
+            except Exception as e:
+                print(f"Erro ao consultar cache compartilhado: {e}")
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += 1
+        self._store_local(key, value)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._store_local(key, value)
+        if self.shared_alias:
+            try:
+                self._shared_cache().set(key, value, timeout=self.ttl)
+            except Exception as e:
+                print(f"Erro ao gravar no cache compartilhado: {e}")
+
+    def clear(self) -> None:
+        """Drop the local tier; shared entries expire or miss on version change"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+            }
+
+    def _store_local(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _shared_cache(self):
+        from django.core.cache import caches
+        return caches[self.shared_alias]
@@ -0,0 +1,68 @@
+"""
+Token windows for classifying emails longer than the model's input.
+
+The email is tokenized once, split into overlapping windows of at most
+MODEL_MAX_LENGTH tokens, and the per-window label probabilities are
+combined into a single prediction.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+AGGREGATION_STRATEGIES = ('mean', 'max', 'position')
+
+
+def plan_windows(token_ids: Sequence[int], window_size: int, overlap: int,
+                 max_windows: int) -> List[Sequence[int]]:
+    """Split token ids into overlapping windows, keeping at most max_windows.
+
+    When the cap applies, the kept windows are spread evenly over the email
+    so the beginning and the end are always represented.
+    """
+    if window_size <= 0:
+        raise ValueError("window_size must be positive")
+    step = max(1, window_size - max(0, overlap))
+
+    # A última janela termina exatamente no fim do email
+    starts = [0]
+    while starts[-1] + window_size < len(token_ids):
+        starts.append(min(starts[-1] + step, len(token_ids) - window_size))
+
+    if max_windows and len(starts) > max_windows:
+        picks = np.linspace(0, len(starts) - 1, num=max_windows).round().astype(int)
+        starts = [starts[i] for i in sorted(set(picks.tolist()))]
+
+    return [token_ids[start:start + window_size] for start in starts]
+
+
+def aggregate_scores(window_scores: np.ndarray, strategy: str = 'mean') -> np.ndarray:
+    """Combine an (n_windows, n_labels) probability matrix into one row.
+
+    ``mean`` averages the windows, ``max`` keeps each label's strongest
+    window and ``position`` weights earlier windows (subject and opening
+    paragraphs) more heavily.
+    """
+    scores = np.asarray(window_scores, dtype=np.float64)
+    if scores.ndim != 2 or not scores.shape[0]:
+        raise ValueError("window_scores must be a non-empty 2D array")
+
+    if strategy == 'mean':
+        combined = scores.mean(axis=0)
+    elif strategy == 'max':
+        combined = scores.max(axis=0)
+    elif strategy == 'position':
+        weights = 1.0 / np.arange(1, scores.shape[0] + 1)
+        combined = weights @ scores / weights.sum()
+    else:
+        raise ValueError(f"Unknown aggregation strategy: {strategy}")
+
+    # Renormalizar para que o score continue sendo uma probabilidade
+    return combined / combined.sum()
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Row-wise softmax of model logits"""
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
@@ -0,0 +1,84 @@
+"""
+Bounded concurrency for the async API.
+
+Inference is CPU-bound and must not run on the event loop, so async views hand
+it to a small shared thread pool. An in-flight limit caps how many requests a
+single ASGI process accepts at once; requests beyond it are rejected straight
+away instead of queueing without bound behind the executor.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import config
+
+_executor_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class InFlightLimiter:
+    """Non-blocking counter of requests currently being served"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'limit': self.limit, 'in_flight': self.in_flight, 'rejected': self.rejected}
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared inference executor, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=config.INFERENCE_EXECUTOR_WORKERS,
+                thread_name_prefix='inference',
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """Stop the shared executor; the next get_executor() creates a new one"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_inference(func: Callable[..., Any], *args, timeout: float = None) -> Any:
+    """Run func(*args) on the inference executor without blocking the event loop.
+
+    Raises asyncio.TimeoutError after `timeout` seconds (config.API_TIMEOUT by
+    default). The worker thread cannot be interrupted, so a timed-out call
+    still finishes in the background, but its result is discarded.
+    """
+    from .profiling import run_traced
+    loop = asyncio.get_running_loop()
+    # Leva o contexto da requisição (etapas e profiling) para a thread do executor
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(get_executor(), context.run, run_traced, func, *args)
+    return await asyncio.wait_for(future, timeout or config.API_TIMEOUT)
+
+
+api_limiter = InFlightLimiter(config.API_MAX_IN_FLIGHT)
@@ -0,0 +1,287 @@
+"""
+Body extraction in front of the classifier.
+
+Raw messages can carry base64 attachments, HTML markup and long quoted reply
+chains that say nothing about the email itself. extract_body() walks the MIME
+structure line by line, skips non-text parts without decoding them, turns
+HTML into text incrementally and stops at quoted history, signatures or
+MAX_EMAIL_LENGTH characters, so the work after it grows with the new text
+rather than with the raw message size.
+"""
+
+import base64
+import binascii
+import codecs
+import io
+import quopri
+import re
+from email.parser import HeaderParser
+from html.parser import HTMLParser
+from typing import Iterable, Optional, Union
+
+import config
+
+_HEADER_LINE = re.compile(rb'^[!-9;-~]+:')
+_REPLY_HEADER = re.compile(
+    r'^((on|em)\b.*|.*@.*)\b(wrote|escreveu)\s*:\s*$', re.IGNORECASE
+)
+_FORWARD_MARKER = re.compile(
+    r'^(-{2,}\s*(original message|mensagem original|forwarded message|mensagem encaminhada)\s*-{2,}|_{10,})$',
+    re.IGNORECASE
+)
+_MOBILE_SIGNATURE = re.compile(r'^(sent from my|enviado do meu)\b', re.IGNORECASE)
+
+# Texto simples é lido em pedaços para parar cedo em emails enormes
+_CHUNK_SIZE = 64 * 1024
+
+_BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr'}
+_SKIPPED_TAGS = {'script', 'style', 'head', 'title', 'blockquote'}
+# Classes/ids usados por Gmail e Outlook para o histórico citado
+_QUOTE_MARKERS = ('gmail_quote', 'divrplyfwdmsg', 'appendonsend', 'moz-cite-prefix', 'yahoo_quoted')
+
+
+class TextSink:
+    """Collect new text line by line, dropping quotes and stopping at history or signatures"""
+
+    def __init__(self, max_length: int = None):
+        self.max_length = max_length if max_length is not None else config.MAX_EMAIL_LENGTH
+        self.lines = []
+        self.length = 0
+        self.done = False
+        self._partial = ''
+
+    def feed(self, text: str) -> None:
+        if self.done or not text:
+            return
+        *lines, self._partial = (self._partial + text).split('\n')
+        for line in lines:
+            self._line(line)
+            if self.done:
+                return
+        # Linha enorme sem quebra (ex.: HTML minificado)
+        if len(self._partial) > self.max_length:
+            self._line(self._partial)
+            self._partial = ''
+
+    def close(self) -> str:
+        if self._partial:
+            self._line(self._partial)
+            self._partial = ''
+        return self.text
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.lines).strip()
+
+    def _line(self, line: str) -> None:
+        if self.done:
+            return
+        stripped = line.strip()
+        if stripped.startswith('>'):
+            return
+        # Só o delimitador do RFC 3676 ('-- ', com espaço): '--' sozinho é separador comum no texto
+        if (line.rstrip('\r') == '-- ' or _REPLY_HEADER.match(stripped)
+                or _FORWARD_MARKER.match(stripped) or _MOBILE_SIGNATURE.match(stripped)):
+            self.done = True
+            return
+        if self.length + len(line) >= self.max_length:
+            line = line[:self.max_length - self.length]
+            self.done = True
+        self.lines.append(line)
+        self.length += len(line) + 1
+
+
+class HTMLToText(HTMLParser):
+    """Incremental HTML to text conversion writing into a TextSink"""
+
+    def __init__(self, sink: TextSink):
+        super().__init__(convert_charrefs=True)
+        self.sink = sink
+        self._skip_tag = None
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        markers = ' '.join(value or '' for name, value in attrs if name in ('class', 'id')).lower()
+        if tag in _SKIPPED_TAGS or any(marker in markers for marker in _QUOTE_MARKERS):
+            self._skip_tag, self._skip_depth = tag, 1
+        elif tag in _BLOCK_TAGS:
+            self.sink.feed('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._skip_tag and tag in _BLOCK_TAGS:
+            self.sink.feed('\n')
+
+    def handle_endtag(self, tag):
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if not self._skip_depth:
+                    self._skip_tag = None
+            return
+        if tag in _BLOCK_TAGS:
+            self.sink.feed('\n')
+
+    def handle_data(self, data):
+        if not self._skip_tag:
+            # Quebras de linha do código-fonte não são quebras no texto
+            self.sink.feed(' '.join(data.split('\n')))
+
+
+class _TextPart:
+    """Decode one text/* part incrementally into its own sink"""
+
+    def __init__(self, headers, max_length: int):
+        self.sink = TextSink(max_length)
+        self.is_html = headers.get_content_subtype() == 'html'
+        self.html = HTMLToText(self.sink) if self.is_html else None
+        self.encoding = str(headers.get('content-transfer-encoding', '')).strip().lower()
+        charset = headers.get_content_charset() or 'utf-8'
+        try:
+            self.decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+        except LookupError:
+            self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._base64 = b''
+
+    @property
+    def done(self) -> bool:
+        return self.sink.done
+
+    def feed(self, line: bytes) -> None:
+        if self.encoding == 'base64':
+            self._base64 += line.strip()
+            usable = len(self._base64) - len(self._base64) % 4
+            data, self._base64 = self._base64[:usable], self._base64[usable:]
+            try:
+                data = base64.b64decode(data)
+            except (binascii.Error, ValueError):
+                data = b''
+        elif self.encoding == 'quoted-printable':
+            data = quopri.decodestring(line)
+        else:
+            data = line
+        self._write(self.decoder.decode(data))
+
+    def _write(self, text: str) -> None:
+        text = text.replace('\r\n', '\n')
+        if self.html:
+            self.html.feed(text)
+        else:
+            self.sink.feed(text)
+
+    def close(self) -> str:
+        self._write(self.decoder.decode(b'', final=True))
+        if self.html:
+            self.html.close()
+        return self.sink.close()
+
+
+def _iter_lines(source: Union[bytes, str, io.IOBase, Iterable[bytes]]) -> Iterable[bytes]:
+    if isinstance(source, str):
+        source = source.encode('utf-8', 'surrogateescape')
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return source
+
+
+def _read_headers(lines):
+    """Consume a header block and return it as a headers-only Message"""
+    block = []
+    for line in lines:
+        if line in (b'\n', b'\r\n'):
+            break
+        block.append(line)
+    return HeaderParser().parsestr(b''.join(block).decode('ascii', 'replace'))
+
+
+def looks_like_mime(text: Union[str, bytes]) -> bool:
+    """Whether text starts with an RFC 822 header block that declares its content type"""
+    head = text[:4096]
+    if isinstance(head, str):
+        head = head.encode('utf-8', 'replace')
+    if not _HEADER_LINE.match(head):
+        return False
+    header_block = re.split(rb'\r?\n\r?\n', head, maxsplit=1)[0].lower()
+    return b'content-type:' in header_block or b'mime-version:' in header_block
+
+
+def extract_body(source, max_length: int = None) -> str:
+    """Return the new text of a raw MIME message (bytes, str or binary file)"""
+    max_length = max_length if max_length is not None else config.MAX_EMAIL_LENGTH
+    lines = iter(_iter_lines(source))
+    headers = _read_headers(lines)
+
+    plain: Optional[str] = None
+    html: Optional[str] = None
+    boundaries = []
+    part: Optional[_TextPart] = None
+
+    def start_part(part_headers):
+        if part_headers.get_content_maintype() == 'multipart':
+            boundary = part_headers.get_boundary()
+            if boundary:
+                boundaries.append(b'--' + boundary.encode('ascii', 'replace'))
+            return None
+        # Só partes de texto inline; anexos e mensagens encaminhadas são ignorados sem decodificar
+        if part_headers.get_content_maintype() != 'text' or part_headers.get_content_disposition() == 'attachment':
+            return None
+        if part_headers.get_content_subtype() not in ('plain', 'html'):
+            return None
+        return _TextPart(part_headers, max_length)
+
+    def finish_part():
+        nonlocal plain, html, part
+        if part is None:
+            return
+        text = part.close()
+        if part.is_html:
+            html = html or text
+        else:
+            plain = plain or text
+        part = None
+
+    part = start_part(headers)
+    for line in lines:
+        if boundaries and line.startswith(b'--'):
+            marker = line.rstrip()
+            matched = next((b for b in reversed(boundaries) if marker in (b, b + b'--')), None)
+            if matched is not None:
+                finish_part()
+                if plain:
+                    # Já temos o texto simples: o resto da mensagem não importa
+                    break
+                if marker == matched + b'--':
+                    del boundaries[boundaries.index(matched):]
+                else:
+                    del boundaries[boundaries.index(matched) + 1:]
+                    part = start_part(_read_headers(lines))
+                continue
+        if part is not None:
+            if not part.done:
+                part.feed(line)
+            elif not boundaries:
+                break
+    finish_part()
+
+    return plain or html or ''
+
+
+def extract_content(content: str, max_length: int = None) -> str:
+    """Clean the content given to the API or the form.
+
+    Pasted raw messages go through extract_body; plain text only loses quoted
+    history and signatures and is cut at MAX_EMAIL_LENGTH.
+    """
+    if not content:
+        return ''
+    if looks_like_mime(content):
+        return extract_body(content, max_length)
+    sink = TextSink(max_length)
+    for start in range(0, len(content), _CHUNK_SIZE):
+        sink.feed(content[start:start + _CHUNK_SIZE].replace('\r', ''))
+        if sink.done:
+            break
+    return sink.close()
@@ -1,4 +1,5 @@
 from django import forms
+from django.db.models import Q
 from email_analyzer.models import LogMessage, EmailMessage
 
 class LogMessageForm(forms.ModelForm):
@@ -9,6 +10,22 @@ class LogMessageForm(forms.ModelForm):
 
 class EmailMessageForm(forms.ModelForm):
     """Form for email message processing."""
+    # content é uma propriedade do modelo (o corpo fica em EmailBody)
+    content = forms.CharField(label='Conteúdo', widget=forms.Textarea(attrs={
+        'class': 'form-control',
+        'rows': 6,
+        'placeholder': 'Conteúdo do email...'
+    }))
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial.setdefault('content', self.instance.content)
+    
+    def save(self, commit=True):
+        self.instance.content = self.cleaned_data['content']
+        return super().save(commit)
+    
     class Meta:
         model = EmailMessage
         fields = ['subject', 'content', 'sender']
@@ -17,11 +34,6 @@ class EmailMessageForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'Assunto do email'
             }),
-            'content': forms.Textarea(attrs={
-                'class': 'form-control',
-                'rows': 6,
-                'placeholder': 'Conteúdo do email...'
-            }),
             'sender': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Remetente'
@@ -29,6 +41,47 @@ class EmailMessageForm(forms.ModelForm):
         }
         labels = {
             'subject': 'Assunto',
-            'content': 'Conteúdo',
             'sender': 'Remetente'
         }
+
+class EmailListFilterForm(forms.Form):
+    """Server-side filters for the email list."""
+    CONFIDENCE_LEVELS = {
+        'otimo': (0.7, None),
+        'bom': (0.4, 0.7),
+        'ruim': (None, 0.4),
+    }
+
+    category = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Todas as categorias')] + EmailMessage.CATEGORY_CHOICES
+    )
+    sender = forms.CharField(required=False, max_length=100)
+    confidence = forms.ChoiceField(required=False, choices=[
+        ('', 'Todos os níveis'),
+        ('otimo', 'Ótimo (70%+)'),
+        ('bom', 'Bom (40-69%)'),
+        ('ruim', 'Ruim (0-39%)'),
+    ])
+    min_confidence = forms.FloatField(required=False, min_value=0, max_value=1)
+    max_confidence = forms.FloatField(required=False, min_value=0, max_value=1)
+
+    def filter(self, queryset):
+        """Apply the valid filters to an EmailMessage queryset"""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data['category']:
+            queryset = queryset.filter(category=data['category'])
+        if data['sender'].strip():
+            # Trecho do remetente ou do assunto, como a busca antiga feita no navegador
+            term = data['sender'].strip()
+            queryset = queryset.filter(Q(sender__icontains=term) | Q(subject__icontains=term))
+        low, high = self.CONFIDENCE_LEVELS.get(data['confidence'], (None, None))
+        low = data['min_confidence'] if data['min_confidence'] is not None else low
+        high = data['max_confidence'] if data['max_confidence'] is not None else high
+        if low is not None:
+            queryset = queryset.filter(confidence_score__gte=low)
+        if high is not None:
+            queryset = queryset.filter(confidence_score__lt=high)
+        return queryset
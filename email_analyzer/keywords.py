@@ -0,0 +1,302 @@
+"""
+Keyword lists used by the confidence factors, compiled into one matcher.
+
+Every factor used to rescan the email with ``word in text`` and
+``text.count(word)``. KeywordMatcher compiles all the patterns into a single
+trie-shaped regular expression so one pass over the text yields every
+occurrence of every keyword; the factors are then computed from KeywordHits.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PRODUCTIVE_KEYWORDS = [
+    'reunião', 'meeting', 'projeto', 'project', 'cliente', 'client',
+    'trabalho', 'work', 'relatório', 'report', 'deadline', 'entrega',
+    'solicitação', 'request', 'contrato', 'contract', 'avaliação',
+    'performance', 'sprint', 'agenda', 'urgente', 'importante',
+    'planejamento', 'planning', 'metas', 'goals', 'objetivos',
+    'objectives', 'orçamento', 'budget', 'responsabilidades',
+    'responsibilities', 'cronograma', 'schedule', 'empresa',
+    'company', 'equipe', 'team', 'gerente', 'manager'
+]
+
+UNPRODUCTIVE_KEYWORDS = [
+    'corrente', 'chain', 'reencaminhar', 'forward', 'spam', 'promoção',
+    'desconto', 'discount', 'piada', 'joke', 'fofoca', 'gossip',
+    'marketing', 'newsletter', 'propaganda', 'advertisement',
+    'sorte', 'luck', 'abençoado', 'blessed', 'reencaminhe',
+    'forward now', 'boa sorte', 'good luck', 'prosperidade',
+    'prosperity', 'amor verdadeiro', 'true love', 'sucesso',
+    'success', 'dinheiro inesperado', 'unexpected money'
+]
+
+WORK_CONTEXT_INDICATORS = [
+    'empresa', 'company', 'equipe', 'team', 'gerente', 'manager',
+    'cliente', 'client', 'projeto', 'project', 'trabalho', 'work'
+]
+
+SPAM_CONTEXT_INDICATORS = [
+    'corrente', 'chain', 'reencaminhar', 'forward', 'spam',
+    'sorte', 'luck', 'abençoado', 'blessed', 'prosperidade'
+]
+
+# Grupos de indicadores de trabalho usados no boost final
+WORK_INDICATOR_GROUPS = [
+    ['reunião', 'meeting'],
+    ['planejamento', 'planning'],
+    ['objetivos', 'goals', 'metas'],
+    ['equipe', 'team'],
+    ['responsabilidades', 'responsibilities'],
+    ['cronograma', 'schedule'],
+    ['orçamento', 'budget'],
+    ['gerente', 'manager'],
+]
+
+PRODUCTIVE_COMBINATIONS = [
+    ['reunião', 'planejamento'],
+    ['projeto', 'objetivos', 'metas'],
+    ['equipe', 'responsabilidades', 'cronograma'],
+]
+
+UNPRODUCTIVE_COMBINATIONS = [
+    ['corrente', 'reencaminhar', 'sorte'],
+    ['boa sorte', 'prosperidade', 'abençoado'],
+    ['✨', '💰', '❤️'],
+]
+
+BOOST_COMBINATIONS = [
+    ['reunião', 'planejamento', 'objetivos'],
+    ['equipe', 'responsabilidades', 'cronograma'],
+]
+
+FORMAL_LANGUAGE = ['prezados', 'atenciosamente', 'cordiais']
+SPECIFIC_DETAILS = ['Q1 2024', 'Q4 2023', '23/01/2024', '14h']
+
+PRODUCTIVE_STRUCTURE = ['objetivos', 'metas', 'cronograma']
+UNPRODUCTIVE_CALL_TO_ACTION = ['reencaminhe', 'forward now', 'agora']
+UNPRODUCTIVE_BLESSINGS = ['sorte', 'abençoado', 'prosperidade']
+EMOJIS = ['✨', '💰', '❤️']
+
+PRODUCTIVE_TIEBREAK = ['reunião', 'projeto', 'trabalho', 'cliente']
+UNPRODUCTIVE_TIEBREAK = ['corrente', 'reencaminhar', 'sorte', 'abençoado']
+
+
+class KeywordHits:
+    """Occurrences of every compiled keyword found in one text"""
+
+    __slots__ = ('positions', 'counts', 'first_line')
+
+    def __init__(self, positions: Dict[str, List[int]], counts: Dict[str, int],
+                 first_line: "KeywordHits" = None):
+        self.positions = positions
+        self.counts = counts
+        self.first_line = first_line
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.positions
+
+    def count(self, word: str) -> int:
+        """Non-overlapping occurrences, same as ``text.count(word)``"""
+        return self.counts.get(word, 0)
+
+    def any(self, words: Iterable[str]) -> bool:
+        return any(word in self.positions for word in words)
+
+    def all(self, words: Iterable[str]) -> bool:
+        return all(word in self.positions for word in words)
+
+    def found(self, words: Iterable[str]) -> int:
+        """Number of distinct words from ``words`` present in the text"""
+        return sum(1 for word in words if word in self.positions)
+
+
+class KeywordMatcher:
+    """Multi-pattern substring matcher compiled once for a set of keywords"""
+
+    # Separa os textos de um lote numa única varredura
+    SEPARATOR = '\x00'
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = sorted(set(patterns))
+        self._regex = re.compile(self._trie_pattern(self.patterns))
+
+        # Palavras-chave que são prefixo de outras começam na mesma posição
+        self._prefixes = {
+            word: [other for other in self.patterns if word.startswith(other)]
+            for word in self.patterns
+        }
+        # Posições dentro de uma ocorrência onde outra palavra-chave pode começar
+        self._inner_offsets = {
+            word: [
+                i for i in range(1, len(word))
+                if any(other.startswith(word[i:]) or word[i:].startswith(other)
+                       for other in self.patterns)
+            ]
+            for word in self.patterns
+        }
+        self._self_overlapping = {
+            word for word in self.patterns
+            if any(word[i:] == word[:len(word) - i] for i in range(1, len(word)))
+        }
+
+        # Versão para lotes: a palavra mais longa em cada posição, mais o separador
+        self.index = {word: i for i, word in enumerate(self.patterns)}
+        self._batch_regex = re.compile(
+            '(?=(%s|%s))' % (re.escape(self.SEPARATOR), self._trie_pattern(self.patterns))
+        )
+        self._prefix_matrix = np.zeros((len(self.patterns), len(self.patterns)), dtype=np.int32)
+        for word, prefixes in self._prefixes.items():
+            for prefix in prefixes:
+                self._prefix_matrix[self.index[word], self.index[prefix]] = 1
+
+    def count_matrix(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Scan many texts in one regex pass.
+
+        Returns ``(counts, first_line)``: an (N, len(patterns)) matrix with
+        ``text.count(word)`` for every text and pattern, and a boolean matrix
+        telling which patterns appear in each text's lowercased first line.
+        """
+        n_texts, n_patterns = len(texts), len(self.patterns)
+        if any(self.SEPARATOR in text for text in texts):
+            return self._count_matrix_by_row(texts)
+
+        tokens = self._batch_regex.findall(self.SEPARATOR.join(texts))
+        word_ids = np.fromiter(
+            (self.index.get(token, -1) for token in tokens), dtype=np.int64, count=len(tokens)
+        )
+        rows = np.cumsum(word_ids == -1)
+        found = word_ids >= 0
+        longest = np.bincount(
+            rows[found] * n_patterns + word_ids[found], minlength=n_texts * n_patterns
+        ).reshape(n_texts, n_patterns)
+
+        # Cada ocorrência mais longa implica os seus prefixos na mesma posição
+        counts = longest @ self._prefix_matrix
+
+        # Ocorrências sobrepostas da mesma palavra contam uma vez, como str.count
+        for word in self._self_overlapping:
+            column = self.index[word]
+            for row in np.nonzero(counts[:, column] > 1)[0]:
+                counts[row, column] = texts[row].count(word)
+
+        first_line = counts > 0
+        for row, text in enumerate(texts):
+            if '\n' in text or text != text.lower():
+                line_hits = self.scan(text).first_line
+                first_line[row] = False
+                for word in line_hits.positions:
+                    first_line[row, self.index[word]] = True
+        return counts, first_line
+
+    def _count_matrix_by_row(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        counts = np.zeros((len(texts), len(self.patterns)), dtype=np.int64)
+        first_line = np.zeros(counts.shape, dtype=bool)
+        for row, text in enumerate(texts):
+            hits = self.scan(text)
+            for word, count in hits.counts.items():
+                counts[row, self.index[word]] = count
+            for word in hits.first_line.positions:
+                first_line[row, self.index[word]] = True
+        return counts, first_line
+
+    def scan(self, text: str) -> KeywordHits:
+        """Find every occurrence of every keyword in a single pass"""
+        positions: Dict[str, List[int]] = {}
+        prefixes = self._prefixes
+        inner_offsets = self._inner_offsets
+        match_at = self._regex.match
+
+        for match in self._regex.finditer(text):
+            word, start = match.group(), match.start()
+            for prefix in prefixes[word]:
+                positions.setdefault(prefix, []).append(start)
+
+            # finditer não devolve sobreposições: verificar apenas as posições
+            # internas onde outra palavra-chave poderia começar
+            for offset in inner_offsets[word]:
+                inner = match_at(text, start + offset)
+                if inner is not None:
+                    for prefix in prefixes[inner.group()]:
+                        positions.setdefault(prefix, []).append(start + offset)
+
+        counts = {
+            word: self._non_overlapping(word, starts)
+            for word, starts in positions.items()
+        }
+        hits = KeywordHits(positions, counts)
+        hits.first_line = self._scan_first_line(text, hits)
+        return hits
+
+    def _scan_first_line(self, text: str, hits: KeywordHits) -> KeywordHits:
+        end = text.find('\n')
+        if end == -1 and text == text.lower():
+            return hits
+
+        first_line = text if end == -1 else text[:end]
+        if first_line != first_line.lower():
+            return self.scan(first_line.lower())
+
+        # A primeira linha já está em minúsculas: reaproveitar as posições
+        positions = {}
+        for word, starts in hits.positions.items():
+            inside = [start for start in starts if start + len(word) <= end]
+            if inside:
+                positions[word] = inside
+        counts = {word: self._non_overlapping(word, starts) for word, starts in positions.items()}
+        line_hits = KeywordHits(positions, counts)
+        line_hits.first_line = line_hits
+        return line_hits
+
+    def _non_overlapping(self, word: str, starts: List[int]) -> int:
+        if word not in self._self_overlapping:
+            return len(starts)
+        count, next_free = 0, 0
+        for start in sorted(starts):
+            if start >= next_free:
+                count += 1
+                next_free = start + len(word)
+        return count
+
+    @classmethod
+    def _trie_pattern(cls, patterns: List[str]) -> str:
+        trie: dict = {}
+        for word in patterns:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = True
+        return cls._node_pattern(trie)
+
+    @classmethod
+    def _node_pattern(cls, node: dict) -> str:
+        terminal = '' in node
+        branches = [
+            re.escape(char) + cls._node_pattern(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:%s)' % '|'.join(branches)
+        if terminal:
+            # Ganancioso: tenta primeiro a palavra mais longa
+            return '(?:%s)?' % body
+        return body
+
+
+_matcher: Optional[KeywordMatcher] = None
+
+
+def get_matcher() -> KeywordMatcher:
+    """Return the matcher compiled from every keyword list in this module"""
+    global _matcher
+    if _matcher is None:
+        _matcher = KeywordMatcher(
+            PRODUCTIVE_KEYWORDS + UNPRODUCTIVE_KEYWORDS + WORK_CONTEXT_INDICATORS +
+            SPAM_CONTEXT_INDICATORS + FORMAL_LANGUAGE + SPECIFIC_DETAILS + EMOJIS +
+            UNPRODUCTIVE_CALL_TO_ACTION +
+            [word for group in WORK_INDICATOR_GROUPS for word in group]
+        )
+    return _matcher
@@ -0,0 +1,285 @@
+"""
+Import of mail archives (mbox, Maildir, loose .eml files) into EmailMessage.
+
+Sources are read message by message so archives of any size can be imported.
+Raw messages are parsed and classified in worker processes, each holding one
+warm EmailProcessor, while the parent process writes the results with
+bulk_create and records a per-source checkpoint after every write: the
+number of messages done for mbox and .eml, the last message key for Maildir
+(keys survive the new/ -> cur/ move a mail client makes, positions do not).
+"""
+
+import email.policy
+import json
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timezone as dt_timezone
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+from django.utils import timezone
+
+import config
+from .extraction import extract_body
+
+MBOX_SUFFIXES = ('.mbox', '.mbx')
+EML_SUFFIXES = ('.eml',)
+_MBOX_ESCAPED_FROM = re.compile(rb'^>(>*From )')
+_HEADERS_END = re.compile(rb'\r?\n\r?\n')
+
+# Processador do worker (um por processo, criado no initializer)
+_worker_processor = None
+
+
+def iter_sources(paths: List[str]) -> Iterator[Tuple[str, str]]:
+    """Yield (kind, path) for every mbox, Maildir or .eml found under paths"""
+    for path in map(Path, paths):
+        if path.is_dir():
+            if _is_maildir(path):
+                yield 'maildir', str(path)
+                continue
+            for child in sorted(path.iterdir()):
+                yield from iter_sources([str(child)])
+        elif path.suffix.lower() in EML_SUFFIXES:
+            yield 'eml', str(path)
+        elif path.suffix.lower() in MBOX_SUFFIXES or _looks_like_mbox(path):
+            yield 'mbox', str(path)
+
+
+def _is_maildir(path: Path) -> bool:
+    return all((path / sub).is_dir() for sub in ('cur', 'new', 'tmp'))
+
+
+def _looks_like_mbox(path: Path) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(5) == b'From '
+    except OSError:
+        return False
+
+
+Position = Union[int, str]
+
+
+def iter_raw_messages(kind: str, path: str) -> Iterator[bytes]:
+    """Yield the raw bytes of each message in one source, in a stable order"""
+    for _, raw in iter_messages(kind, path):
+        yield raw
+
+
+def iter_messages(kind: str, path: str) -> Iterator[Tuple[Position, bytes]]:
+    """Yield (position, raw bytes): the index in the source, or the message key in a Maildir"""
+    if kind == 'eml':
+        yield 0, Path(path).read_bytes()
+    elif kind == 'maildir':
+        yield from _iter_maildir(path)
+    else:
+        yield from enumerate(_iter_mbox(path))
+
+
+def _maildir_key(name: str) -> str:
+    # "<chave>:2,<flags>": as flags mudam quando o cliente lê ou move a mensagem
+    return name.split(':', 1)[0]
+
+
+def _maildir_files(path: str) -> Dict[str, str]:
+    files = {}
+    for sub in ('new', 'cur'):
+        for name in os.listdir(os.path.join(path, sub)):
+            if not name.startswith('.'):
+                files[_maildir_key(name)] = os.path.join(path, sub, name)
+    return files
+
+
+def _iter_maildir(path: str) -> Iterator[Tuple[str, bytes]]:
+    """Messages of new/ and cur/ together, ordered by key"""
+    files = _maildir_files(path)
+    for key in sorted(files):
+        try:
+            raw = Path(files[key]).read_bytes()
+        except FileNotFoundError:
+            # Movida (new/ -> cur/) ou com as flags alteradas depois da listagem
+            moved = _maildir_files(path).get(key)
+            if moved is None:
+                continue
+            raw = Path(moved).read_bytes()
+        yield key, raw
+
+
+def _iter_mbox(path: str) -> Iterator[bytes]:
+    """Split an mbox file on 'From ' separator lines without loading it whole"""
+    lines = []
+    previous_blank = True
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'From ') and previous_blank:
+                if lines:
+                    yield b''.join(lines)
+                lines = []
+            else:
+                lines.append(_MBOX_ESCAPED_FROM.sub(rb'\1', line))
+            previous_blank = line in (b'\n', b'\r\n')
+    if lines:
+        yield b''.join(lines)
+
+
+def parse_message(raw: bytes) -> Dict[str, object]:
+    """Extract subject, sender, date and new body text from a raw message"""
+    # Só o bloco de cabeçalhos passa pelo parser do pacote email
+    end = _HEADERS_END.search(raw)
+    headers = BytesHeaderParser(policy=email.policy.default).parsebytes(raw[:end.end() if end else len(raw)])
+
+    return {
+        'subject': str(headers.get('subject', '') or '')[:200],
+        'sender': str(headers.get('from', '') or '')[:100],
+        'content': extract_body(raw),
+        'received_date': _parse_date(headers.get('date')),
+    }
+
+
+def _parse_date(value):
+    try:
+        date = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return timezone.now()
+    if timezone.is_naive(date):
+        date = date.replace(tzinfo=dt_timezone.utc)
+    return date
+
+
+def _init_worker(load_model: bool) -> None:
+    global _worker_processor
+    from .cache import ClassificationCache
+    from .nlp_processor import EmailProcessor
+    # Sem índice de quase-duplicatas: os workers não consultam o banco e não disputam
+    # o lock do SQLite com as gravações em lote do processo principal
+    cache = ClassificationCache.from_config() if config.RESULT_CACHE_ENABLED else None
+    _worker_processor = EmailProcessor(load_model=load_model, cache=cache, near_duplicates=None)
+
+
+def classify_chunk(chunk: List[Tuple[str, Position, bytes]]) -> List[Tuple[str, Position, Dict[str, object]]]:
+    """Parse and classify (source, position, raw) items; runs inside a worker"""
+    parsed = [(source, position, parse_message(raw)) for source, position, raw in chunk]
+    results = _worker_processor.process_batch(
+        [(fields['subject'], fields['content'], fields['sender']) for _, _, fields in parsed]
+    )
+    for (_, _, fields), result in zip(parsed, results):
+        fields.update(
+            category=result['category'],
+            confidence_score=result['confidence_score'],
+            suggested_response=result['suggested_response'],
+            is_processed=True,
+        )
+    return parsed
+
+
+class Checkpoint:
+    """Number of messages already imported per source, persisted as JSON"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.done: Dict[str, int] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = json.load(f).get('sources', {})
+
+    def imported(self, source: str, position: Position) -> bool:
+        """Whether a previous run already wrote the message at this position"""
+        mark = self.done.get(source)
+        if isinstance(position, str):
+            # Maildir: chaves em ordem, a marca é a última importada
+            return isinstance(mark, str) and position <= mark
+        return isinstance(mark, int) and position < mark
+
+    def advance(self, source: str, position: Position) -> None:
+        mark = self.done.get(source)
+        if isinstance(position, str):
+            self.done[source] = max(mark, position) if isinstance(mark, str) else position
+        else:
+            self.done[source] = max(mark if isinstance(mark, int) else 0, position + 1)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        # Escrita atômica: um checkpoint truncado faria reimportar tudo
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'sources': self.done}, f)
+        os.replace(tmp_path, self.path)
+
+
+def iter_chunks(sources, checkpoint: Checkpoint, chunk_size: int) -> Iterator[List[Tuple[str, Position, bytes]]]:
+    """Group pending messages of all sources into chunks of raw messages"""
+    chunk = []
+    for kind, path in sources:
+        source = f"{kind}:{os.path.abspath(path)}"
+        for position, raw in iter_messages(kind, path):
+            if checkpoint.imported(source, position):
+                continue
+            chunk.append((source, position, raw))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_import(paths: List[str], workers: int = 1, chunk_size: int = 64, batch_size: int = 1000,
+               checkpoint_path: str = None, load_model: bool = True, progress=None) -> int:
+    """Import every message under paths; returns how many were written"""
+    from .models import EmailMessage
+    from .near_duplicates import index_emails
+    from .rollups import record_emails
+
+    checkpoint = Checkpoint(checkpoint_path)
+    chunks = iter_chunks(iter_sources(paths), checkpoint, chunk_size)
+    pending_rows = []
+    imported = 0
+
+    def flush():
+        nonlocal imported
+        if not pending_rows:
+            return
+        saved = EmailMessage.objects.bulk_create(
+            [EmailMessage(**fields) for _, _, fields in pending_rows], batch_size=batch_size
+        )
+        if config.NEAR_DUPLICATE_ENABLED:
+            index_emails(saved, batch_size=batch_size)
+        record_emails(saved)
+        for source, position, _ in pending_rows:
+            checkpoint.advance(source, position)
+        checkpoint.save()
+        imported += len(pending_rows)
+        pending_rows.clear()
+        if progress:
+            progress(imported)
+
+    def collect(parsed):
+        pending_rows.extend(parsed)
+        if len(pending_rows) >= batch_size:
+            flush()
+
+    if workers <= 1:
+        _init_worker(load_model)
+        for chunk in chunks:
+            collect(classify_chunk(chunk))
+    else:
+        from django.db import connections
+        # Os workers não usam o banco (_init_worker): não herdar conexões abertas no fork
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(load_model,)) as pool:
+            # Janela limitada de tarefas: o arquivo não é lido além do necessário
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(pool.submit(classify_chunk, chunk))
+                if len(in_flight) >= workers * 2:
+                    collect(in_flight.popleft().result())
+            while in_flight:
+                collect(in_flight.popleft().result())
+    flush()
+    return imported
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from email_analyzer.body_store import prune, space_report
+
+
+def _size(value):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+class Command(BaseCommand):
+    help = "Mostra o espaço economizado pelo armazenamento deduplicado e comprimido dos corpos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true',
+                            help="Apagar antes os corpos que nenhum email referencia mais")
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            self.stdout.write(f"{prune()} corpos sem referência apagados")
+
+        report = space_report()
+        self.stdout.write(f"Emails:                 {report['emails']}")
+        self.stdout.write(f"Corpos distintos:       {report['bodies']} ({report['unreferenced_bodies']} sem referência)")
+        self.stdout.write(f"Texto sem deduplicação: {_size(report['logical_bytes'])}")
+        self.stdout.write(f"Texto distinto:         {_size(report['distinct_bytes'])} "
+                          f"(deduplicação {report['dedup_ratio']:.1f}x)")
+        self.stdout.write(f"Armazenado:             {_size(report['stored_bytes'])} "
+                          f"(compressão {report['compression_ratio']:.1f}x)")
+        if report['search_bytes']:
+            self.stdout.write(f"Cópia para a busca:     {_size(report['search_bytes'])} (SQLite, sem compressão)")
+        self.stdout.write(self.style.SUCCESS(f"Economia: {_size(report['saved_bytes'])}"))
@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+import config
+
+
+def run_worker(worker_id, batch_size, poll_interval, once, stop_event):
+    """Worker loop: claim pending emails until stopped (or the queue drains with once)"""
+    from django.db import connections
+    from email_analyzer.registry import get_processor
+    from email_analyzer.work_queue import process_next_batch
+
+    # Conexões herdadas do processo pai não podem ser compartilhadas
+    connections.close_all()
+    processor = get_processor()
+    processed = 0
+    while not stop_event.is_set():
+        claimed = process_next_batch(processor, worker_id, batch_size)
+        processed += claimed
+        if not claimed:
+            if once:
+                break
+            stop_event.wait(poll_interval)
+    connections.close_all()
+    return processed
+
+
+class Command(BaseCommand):
+    help = "Classifica em segundo plano os emails pendentes (is_processed=False)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Processos de classificação")
+        parser.add_argument('--batch-size', type=int, default=config.QUEUE_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=config.QUEUE_POLL_INTERVAL,
+                            help="Espera em segundos quando a fila está vazia")
+        parser.add_argument('--once', action='store_true', help="Sair quando a fila esvaziar")
+
+    def handle(self, *args, **options):
+        host = f"{socket.gethostname()}-{os.getpid()}"
+        stop_event = multiprocessing.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("Encerrando após o lote atual...")
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        started = time.monotonic()
+        args = (options['batch_size'], options['poll_interval'], options['once'], stop_event)
+        if options['workers'] <= 1:
+            processed = run_worker(f"{host}-0", *args)
+        else:
+            from django.db import connections
+            connections.close_all()
+            workers = [
+                multiprocessing.Process(target=run_worker, args=(f"{host}-{n}", *args), daemon=True)
+                for n in range(options['workers'])
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            processed = None
+
+        elapsed = time.monotonic() - started
+        summary = f"{processed} emails classificados" if processed is not None else "Workers encerrados"
+        self.stdout.write(self.style.SUCCESS(f"{summary} em {elapsed:.1f}s"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+import config
+from email_analyzer import artifacts
+from email_analyzer.backends import export_model
+
+
+class Command(BaseCommand):
+    help = "Salva o modelo Hugging Face num diretório local verificado por checksum (MODEL_DIR)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=config.HUGGING_FACE_MODEL)
+        parser.add_argument('--output', default=config.MODEL_DIR)
+        parser.add_argument('--manifest-only', action='store_true',
+                            help="Só regera o MANIFEST.sha256 de um diretório já preenchido")
+        parser.add_argument('--verify', action='store_true',
+                            help="Só confere o diretório com o manifesto")
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output:
+            raise CommandError("Informe --output ou defina MODEL_DIR")
+
+        if options['verify']:
+            try:
+                manifest = artifacts.verify(output)
+            except artifacts.ArtifactError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(manifest)} arquivos conferidos (revisão {artifacts.revision(manifest)})"
+            ))
+            return
+
+        if options['manifest_only']:
+            manifest = artifacts.write_manifest(output)
+        else:
+            manifest = export_model(options['model'], output) / artifacts.MANIFEST
+        self.stdout.write(self.style.SUCCESS(f"Modelo exportado para {output} ({manifest.name})"))
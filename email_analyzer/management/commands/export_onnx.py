@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+import config
+from email_analyzer.backends import export_onnx
+
+
+class Command(BaseCommand):
+    help = "Exporta o modelo Hugging Face para ONNX (backend INFERENCE_BACKEND=onnx)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=config.HUGGING_FACE_MODEL)
+        parser.add_argument('--output', default=config.ONNX_MODEL_DIR)
+        parser.add_argument('--opset', type=int, default=17)
+
+    def handle(self, *args, **options):
+        output = export_onnx(options['model'], options['output'], opset=options['opset'])
+        self.stdout.write(self.style.SUCCESS(f"Modelo exportado para {output}"))
@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from email_analyzer.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recalcula a tabela de estatísticas diárias (EmailDailyRollup) a partir dos emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Recalcular apenas a partir desta data (AAAA-MM-DD)")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("Data inválida, use AAAA-MM-DD")
+
+        cells = rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"{cells} células de estatísticas recalculadas"))
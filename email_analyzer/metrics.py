@@ -0,0 +1,456 @@
+"""
+Request-stage latency histograms and counters in Prometheus text format.
+
+Each process records into an in-memory Registry: recording is a lock and a
+dict update, with no I/O on the request path. Under several workers
+(gunicorn) every process also writes a snapshot of its values to
+METRICS_DIR, from a background thread at most every METRICS_FLUSH_INTERVAL
+seconds, and /metrics sums the snapshots of all workers. A worker that exits
+folds its values into DEAD_TOTALS and removes its own file; the files of
+workers that died without running atexit (SIGKILL, OOM) are folded in by the
+next collection. Counters never go backwards when a worker is replaced and the
+directory does not grow with every restart.
+Only counters and histograms are offered, since both add up across
+processes.
+"""
+
+import atexit
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import config
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Soma dos workers que já saíram, no mesmo formato de um snapshot
+DEAD_TOTALS = 'dead.json'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _merge(target: Dict[str, Dict[str, object]], snapshot: Dict[str, Dict[str, object]]) -> None:
+    for name, values in snapshot.items():
+        merged = target.get(name)
+        if merged is None:
+            continue
+        for series, value in values.items():
+            current = merged.get(series)
+            if current is None:
+                merged[series] = value
+            elif isinstance(value, list):
+                merged[series] = [a + b for a, b in zip(current, value)]
+            else:
+                merged[series] = current + value
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: "Registry", name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series_cache: Dict[tuple, str] = {}
+
+    def _series(self, labels: Dict[str, str]) -> str:
+        # A chave já é o trecho de rótulos da exposição, montado uma vez por combinação
+        key = tuple(labels.items())
+        series = self._series_cache.get(key)
+        if series is None:
+            if set(labels) != set(self.labelnames):
+                raise ValueError(f"{self.name} espera os rótulos {self.labelnames}, recebeu {tuple(labels)}")
+            series = ','.join(f'{name}="{_escape(labels[name])}"' for name in self.labelnames)
+            self._series_cache[key] = series
+        return series
+
+    def labels(self, **labels) -> "_Child":
+        """Bind label values once, for call sites on the hot path"""
+        return _Child(self, self._series(labels))
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self._inc(self._series(labels), amount)
+
+    def _inc(self, series: str, amount: float) -> None:
+        registry = self.registry
+        with registry._lock:
+            values = registry._values[self.name]
+            values[series] = values.get(series, 0) + amount
+            registry._dirty = True
+        registry._ensure_flusher()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        self._observe(self._series(labels), value)
+
+    def _observe(self, series: str, value: float) -> None:
+        # Contagens por faixa (não acumuladas) + [soma, total]
+        index = bisect.bisect_left(self.buckets, value)
+        registry = self.registry
+        with registry._lock:
+            values = registry._values[self.name]
+            state = values.get(series)
+            if state is None:
+                state = values[series] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+            registry._dirty = True
+        registry._ensure_flusher()
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager observing the seconds spent inside it"""
+        return _Timer(self, self._series(labels))
+
+
+class _Child:
+    __slots__ = ('metric', 'series')
+
+    def __init__(self, metric: _Metric, series: str):
+        self.metric = metric
+        self.series = series
+
+    def inc(self, amount: float = 1) -> None:
+        self.metric._inc(self.series, amount)
+
+    def observe(self, value: float) -> None:
+        self.metric._observe(self.series, value)
+
+    def time(self) -> "_Timer":
+        return _Timer(self.metric, self.series)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'series', 'started')
+
+    def __init__(self, histogram: Histogram, series: str):
+        self.histogram = histogram
+        self.series = series
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram._observe(self.series, time.perf_counter() - self.started)
+        return False
+
+
+class Registry:
+    """Metrics of one process, optionally shared with other workers through a directory"""
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 2.0):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, _Metric] = {}
+        self._values: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._flusher_pid = None
+        self._snapshot_path = None
+        if self.directory is not None:
+            os.register_at_fork(before=self.flush, after_in_child=self._after_fork_in_child)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        self._values[metric.name] = {}
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            return {name: {series: list(value) if isinstance(value, list) else value
+                           for series, value in values.items()}
+                    for name, values in self._values.items()}
+
+    # Vários workers
+
+    def _ensure_flusher(self) -> None:
+        # Depois de um fork (gunicorn --preload) o processo filho precisa da própria thread
+        if self.directory is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            # pid + token: um pid reaproveitado não sobrescreve o arquivo de um worker morto
+            self._snapshot_path = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        thread = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        thread.start()
+        atexit.register(self.close)
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write this process's values to its snapshot file"""
+        if self._snapshot_path is None or self._flusher_pid != os.getpid():
+            return
+        with self._flush_lock:
+            self._dirty = False
+            temporary = self._snapshot_path.with_suffix('.tmp')
+            try:
+                temporary.write_text(json.dumps(self.snapshot()))
+                # Quem coleta nunca lê um arquivo pela metade
+                os.replace(temporary, self._snapshot_path)
+            except OSError as e:
+                print(f"Erro ao gravar métricas em {self.directory}: {e}")
+
+    def close(self) -> None:
+        """Fold this process's values into the dead-worker totals and remove its snapshot"""
+        if self._snapshot_path is None or self._flusher_pid != os.getpid():
+            return
+        with self._flush_lock:
+            path = self._snapshot_path
+            # A thread de gravação para e não recria o arquivo
+            self._flusher_pid = None
+            self._snapshot_path = None
+            self._retire({path: self.snapshot()})
+
+    def prune(self) -> None:
+        """Fold the snapshots of workers that died without closing into the dead-worker totals"""
+        if self.directory is None:
+            return
+        dead = {}
+        for path in self.directory.glob('*-*.json'):
+            pid = path.name.split('-', 1)[0]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                dead[path] = None
+        if dead:
+            self._retire(dead)
+
+    @contextlib.contextmanager
+    def _directory_lock(self, exclusive: bool):
+        # Vários workers coletam e saem ao mesmo tempo: a soma dos mortos é serializada
+        import fcntl
+
+        with open(self.directory / '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _retire(self, snapshots: Dict[Path, Optional[Dict[str, Dict[str, object]]]]) -> None:
+        totals_path = self.directory / DEAD_TOTALS
+        try:
+            with self._directory_lock(exclusive=True):
+                try:
+                    totals = json.loads(totals_path.read_text())
+                except (OSError, ValueError):
+                    totals = {'values': {}, 'retired': []}
+                values = {name: {} for name in self._metrics}
+                _merge(values, totals['values'])
+                # Nomes já somados cujo arquivo ainda existe (queda entre a soma e a remoção)
+                retired = [name for name in totals['retired'] if (self.directory / name).exists()]
+                for path, snapshot in snapshots.items():
+                    if path.name in retired:
+                        continue
+                    if snapshot is None:
+                        try:
+                            snapshot = json.loads(path.read_text())
+                        except FileNotFoundError:
+                            continue  # Outro worker já somou
+                        except (OSError, ValueError):
+                            snapshot = {}
+                    _merge(values, snapshot)
+                    retired.append(path.name)
+                temporary = totals_path.with_suffix('.tmp')
+                temporary.write_text(json.dumps({'values': values, 'retired': retired}))
+                os.replace(temporary, totals_path)
+                for path in snapshots:
+                    path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Erro ao gravar métricas em {self.directory}: {e}")
+
+    def collect(self) -> Dict[str, Dict[str, object]]:
+        """Values of this process, or the sum over the live workers and the dead-worker totals"""
+        if self.directory is None:
+            return self.snapshot()
+        self.flush()
+        self.prune()
+        merged: Dict[str, Dict[str, object]] = {name: {} for name in self._metrics}
+        if not self.directory.is_dir():
+            return merged
+        # Sob a trava: um worker saindo não é contado duas vezes nem nenhuma
+        with self._directory_lock(exclusive=False):
+            for path in self.directory.glob('*.json'):
+                try:
+                    snapshot = json.loads(path.read_text())
+                except (OSError, ValueError):
+                    continue
+                _merge(merged, snapshot['values'] if path.name == DEAD_TOTALS else snapshot)
+        return merged
+
+    def _after_fork_in_child(self) -> None:
+        # Os valores herdados já estão no arquivo do processo pai
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._values = {name: {} for name in self._metrics}
+        self._dirty = False
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        values = self.collect()
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for series, value in sorted(values.get(name, {}).items()):
+                if metric.kind == 'counter':
+                    lines.append(f"{name}{{{series}}} {_format_value(value)}" if series
+                                 else f"{name} {_format_value(value)}")
+                    continue
+                prefix = f"{series}," if series else ''
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-2]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{_format_value(bound)}"}} {cumulative}')
+                labels = f"{{{series}}}" if series else ''
+                lines.append(f"{name}_sum{labels} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{labels} {value[-1]}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry(config.METRICS_DIR or None, config.METRICS_FLUSH_INTERVAL)
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'email_stage_duration_seconds',
+    'Latency of each stage of an email request (parse, preprocess, inference, confidence, response, db_save)',
+    ['stage']
+)
+CLASSIFICATIONS = REGISTRY.counter(
+    'email_classifications_total',
+    'Classified emails by category and by the path that decided (keywords, model, fallback, cache, ...)',
+    ['category', 'path']
+)
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    'email_model_load_seconds', 'Time to load the classification model', ['backend'],
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+MODEL_LOAD_FAILURES = REGISTRY.counter(
+    'email_model_load_failures_total', 'Model loads that failed and left the keyword fallback in place',
+    ['backend']
+)
+BATCH_SIZE = REGISTRY.histogram(
+    'email_inference_batch_size', 'Texts per model call (emails, or token windows of one long email)', ['kind'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+
+_stages: Dict[str, _Child] = {}
+# Segundos por etapa da requisição atual, quando profiling.ProfilingMiddleware acompanha
+request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_stages', default=None)
+
+
+def stage(name: str):
+    """Time a block as one request stage; a no-op when tracking is off"""
+    stages = request_stages.get()
+    if not (config.METRICS_ENABLED and config.PERFORMANCE_TRACKING):
+        return _NOT_TIMED if stages is None else _StageTimer(None, stages, name)
+    child = _stages.get(name)
+    if child is None:
+        child = _stages[name] = STAGE_SECONDS.labels(stage=name)
+    return child.time() if stages is None else _StageTimer(child, stages, name)
+
+
+def timed_stage(name: str):
+    """Decorator form of stage()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_classification(category: str, path: str) -> None:
+    if config.METRICS_ENABLED:
+        CLASSIFICATIONS.inc(category=category, path=path)
+
+
+def observe_batch(size: int, kind: str) -> None:
+    if config.METRICS_ENABLED:
+        BATCH_SIZE.observe(size, kind=kind)
+
+
+class _StageTimer:
+    """Stage timer that also adds to the current request's breakdown"""
+    __slots__ = ('child', 'stages', 'name', 'started')
+
+    def __init__(self, child: Optional[_Child], stages: Dict[str, float], name: str):
+        self.child = child
+        self.stages = stages
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        self.stages[self.name] = self.stages.get(self.name, 0.0) + elapsed
+        if self.child is not None:
+            self.child.observe(elapsed)
+        return False
+
+
+class _NotTimed:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOT_TIMED = _NotTimed()
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0002_emailmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailFingerprint',
+            fields=[
+                ('email', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='email_analyzer.emailmessage')),
+                ('simhash', models.BigIntegerField()),
+                ('band_0', models.IntegerField(db_index=True)),
+                ('band_1', models.IntegerField(db_index=True)),
+                ('band_2', models.IntegerField(db_index=True)),
+                ('band_3', models.IntegerField(db_index=True)),
+            ],
+        ),
+    ]
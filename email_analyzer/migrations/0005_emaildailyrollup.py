@@ -0,0 +1,57 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:24
+
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.db.models.functions import TruncDate
+
+BUCKET_EDGES = (0.2, 0.4, 0.6, 0.8)
+
+
+def fill_rollup(apps, schema_editor):
+    """Count the emails that already exist, as rollups.rebuild() does (copied: migrations stay frozen)"""
+    EmailMessage = apps.get_model('email_analyzer', 'EmailMessage')
+    EmailDailyRollup = apps.get_model('email_analyzer', 'EmailDailyRollup')
+    bucket = Case(
+        *[When(confidence_score__lt=edge, then=Value(i)) for i, edge in enumerate(BUCKET_EDGES)],
+        default=Value(len(BUCKET_EDGES)),
+        output_field=IntegerField(),
+    )
+    cells = (
+        EmailMessage.objects.using(schema_editor.connection.alias)
+        .filter(is_processed=True).exclude(category='')
+        .annotate(day=TruncDate('received_date'), bucket=bucket)
+        .values('day', 'category', 'bucket')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    EmailDailyRollup.objects.using(schema_editor.connection.alias).bulk_create(
+        [EmailDailyRollup(**cell) for cell in cells], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0004_classification_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(choices=[('produtivo', 'Produtivo'), ('improdutivo', 'Improdutivo')], max_length=20)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'category', 'bucket'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='emaildailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'category', 'bucket'), name='unique_rollup_cell'),
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
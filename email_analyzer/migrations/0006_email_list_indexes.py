@@ -0,0 +1,29 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0005_emaildailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailmessage',
+            index=models.Index(fields=['received_date', 'id'], name='email_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailmessage',
+            index=models.Index(fields=['category', 'received_date', 'id'], name='email_category_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailmessage',
+            index=models.Index(fields=['sender', 'received_date', 'id'], name='email_sender_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailmessage',
+            index=models.Index(fields=['confidence_score', 'received_date'], name='email_confidence_idx'),
+        ),
+    ]
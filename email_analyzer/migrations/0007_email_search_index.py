@@ -0,0 +1,80 @@
+from django.db import migrations
+
+# SQLite: tabela FTS5 de conteúdo externo mantida por triggers, que também
+# cobrem bulk_create e inserts feitos fora do ORM
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE email_analyzer_emailsearch USING fts5(
+        subject, sender, content,
+        content='email_analyzer_emailmessage', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER email_search_insert AFTER INSERT ON email_analyzer_emailmessage BEGIN
+        INSERT INTO email_analyzer_emailsearch (rowid, subject, sender, content)
+        VALUES (new.id, new.subject, new.sender, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER email_search_delete AFTER DELETE ON email_analyzer_emailmessage BEGIN
+        INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch, rowid, subject, sender, content)
+        VALUES ('delete', old.id, old.subject, old.sender, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER email_search_update AFTER UPDATE OF subject, sender, content ON email_analyzer_emailmessage
+    WHEN old.subject IS NOT new.subject OR old.sender IS NOT new.sender OR old.content IS NOT new.content
+    BEGIN
+        INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch, rowid, subject, sender, content)
+        VALUES ('delete', old.id, old.subject, old.sender, old.content);
+        INSERT INTO email_analyzer_emailsearch (rowid, subject, sender, content)
+        VALUES (new.id, new.subject, new.sender, new.content);
+    END
+    """,
+    "INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS email_search_update",
+    "DROP TRIGGER IF EXISTS email_search_delete",
+    "DROP TRIGGER IF EXISTS email_search_insert",
+    "DROP TABLE IF EXISTS email_analyzer_emailsearch",
+]
+
+# Postgres: coluna tsvector gerada (o banco a mantém atualizada) com índice GIN.
+# to_tsvector falha acima de 1 MB, por isso o conteúdo é truncado.
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE email_analyzer_emailmessage ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', coalesce(subject, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(sender, '')), 'B') ||
+        setweight(to_tsvector('portuguese', left(coalesce(content, ''), 200000)), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX email_search_idx ON email_analyzer_emailmessage USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS email_search_idx",
+    "ALTER TABLE email_analyzer_emailmessage DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0006_email_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,66 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# O índice de busca da 0007 lê a coluna content; ele sai antes da mudança de
+# esquema (no SQLite, recriar a tabela descartaria os triggers) e volta na 0010
+SQLITE_DROP_SEARCH = [
+    "DROP TRIGGER IF EXISTS email_search_update",
+    "DROP TRIGGER IF EXISTS email_search_delete",
+    "DROP TRIGGER IF EXISTS email_search_insert",
+    "DROP TABLE IF EXISTS email_analyzer_emailsearch",
+]
+POSTGRES_DROP_SEARCH = [
+    "DROP INDEX IF EXISTS email_search_idx",
+    "ALTER TABLE email_analyzer_emailmessage DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP_SEARCH, 'postgresql': POSTGRES_DROP_SEARCH}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def restore_search_index(apps, schema_editor):
+    from importlib import import_module
+    previous = import_module('email_analyzer.migrations.0007_email_search_index')
+    statements = {'sqlite': previous.SQLITE_FORWARD, 'postgresql': previous.POSTGRES_FORWARD}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0007_email_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_index, restore_search_index),
+        migrations.CreateModel(
+            name='EmailBody',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('codec', models.CharField(max_length=8)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='emailmessage',
+            name='preview',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='emailmessage',
+            name='content_body',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='email_analyzer.emailbody'),
+        ),
+        migrations.AddField(
+            model_name='emailmessage',
+            name='response_body',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='email_analyzer.emailbody'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+import hashlib
+import zlib
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+# Cópias de body_store no momento desta migração: o módulo pode mudar depois
+def digest(text):
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def encode(text):
+    raw = text.encode('utf-8', 'surrogatepass')
+    data = zlib.compress(raw, 6)
+    if len(data) >= len(raw):
+        return 'none', raw
+    return 'zlib', data
+
+
+def decode(data, codec):
+    data = bytes(data)
+    if codec == 'zlib':
+        data = zlib.decompress(data)
+    elif codec == 'zstd':
+        import zstandard
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return data.decode('utf-8', 'surrogatepass')
+
+
+def move_bodies(apps, schema_editor):
+    """Copy content/suggested_response of every email into EmailBody, compressed and deduplicated"""
+    EmailMessage = apps.get_model('email_analyzer', 'EmailMessage')
+    EmailBody = apps.get_model('email_analyzer', 'EmailBody')
+    last_id = 0
+    while True:
+        rows = list(
+            EmailMessage.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'content', 'suggested_response')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        texts = {digest(text): text for _, content, response in rows for text in (content, response) if text}
+        ids = dict(EmailBody.objects.filter(digest__in=list(texts)).values_list('digest', 'id'))
+        new_bodies = []
+        for key, text in texts.items():
+            if key not in ids:
+                codec, data = encode(text)
+                new_bodies.append(EmailBody(digest=key, codec=codec, data=data, size=len(text.encode('utf-8', 'surrogatepass'))))
+        EmailBody.objects.bulk_create(new_bodies)
+        ids.update(EmailBody.objects.filter(digest__in=[b.digest for b in new_bodies]).values_list('digest', 'id'))
+
+        EmailMessage.objects.bulk_update([
+            EmailMessage(
+                id=pk,
+                content_body_id=ids[digest(content)] if content else None,
+                response_body_id=ids[digest(response)] if response else None,
+                preview=(content or '')[:100],
+            )
+            for pk, content, response in rows
+        ], ['content_body', 'response_body', 'preview'])
+        last_id = rows[-1][0]
+
+
+def restore_bodies(apps, schema_editor):
+    EmailMessage = apps.get_model('email_analyzer', 'EmailMessage')
+    last_id = 0
+    while True:
+        emails = list(
+            EmailMessage.objects.filter(id__gt=last_id).order_by('id')
+            .select_related('content_body', 'response_body')[:BATCH_SIZE]
+        )
+        if not emails:
+            break
+        for email in emails:
+            email.content = decode(email.content_body.data, email.content_body.codec) if email.content_body else ''
+            email.suggested_response = decode(email.response_body.data, email.response_body.codec) \
+                if email.response_body else ''
+        EmailMessage.objects.bulk_update(emails, ['content', 'suggested_response'])
+        last_id = emails[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0008_emailbody'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_bodies, restore_bodies),
+    ]
@@ -0,0 +1,157 @@
+import zlib
+
+from django.db import migrations, models
+
+# SQLite: o FTS5 passa a ler de uma view que descomprime o corpo com
+# email_body_text(), registrada por esta migração (a 0012 troca a função por
+# uma coluna de texto, lida sem Python)
+SQLITE_FORWARD = [
+    """
+    CREATE VIEW email_analyzer_emailsearchsource AS
+    SELECT email.id AS id, email.subject AS subject, email.sender AS sender,
+           coalesce(email_body_text(body.data, body.codec), '') AS content
+    FROM email_analyzer_emailmessage email
+    LEFT JOIN email_analyzer_emailbody body ON body.id = email.content_body_id
+    """,
+    """
+    CREATE VIRTUAL TABLE email_analyzer_emailsearch USING fts5(
+        subject, sender, content,
+        content='email_analyzer_emailsearchsource', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER email_search_insert AFTER INSERT ON email_analyzer_emailmessage BEGIN
+        INSERT INTO email_analyzer_emailsearch (rowid, subject, sender, content)
+        VALUES (new.id, new.subject, new.sender, coalesce(
+            (SELECT email_body_text(data, codec) FROM email_analyzer_emailbody WHERE id = new.content_body_id), ''
+        ));
+    END
+    """,
+    """
+    CREATE TRIGGER email_search_delete AFTER DELETE ON email_analyzer_emailmessage BEGIN
+        INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch, rowid, subject, sender, content)
+        VALUES ('delete', old.id, old.subject, old.sender, coalesce(
+            (SELECT email_body_text(data, codec) FROM email_analyzer_emailbody WHERE id = old.content_body_id), ''
+        ));
+    END
+    """,
+    # Corpos são imutáveis: basta comparar a chave estrangeira
+    """
+    CREATE TRIGGER email_search_update AFTER UPDATE OF subject, sender, content_body_id ON email_analyzer_emailmessage
+    WHEN old.subject IS NOT new.subject OR old.sender IS NOT new.sender OR old.content_body_id IS NOT new.content_body_id
+    BEGIN
+        INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch, rowid, subject, sender, content)
+        VALUES ('delete', old.id, old.subject, old.sender, coalesce(
+            (SELECT email_body_text(data, codec) FROM email_analyzer_emailbody WHERE id = old.content_body_id), ''
+        ));
+        INSERT INTO email_analyzer_emailsearch (rowid, subject, sender, content)
+        VALUES (new.id, new.subject, new.sender, coalesce(
+            (SELECT email_body_text(data, codec) FROM email_analyzer_emailbody WHERE id = new.content_body_id), ''
+        ));
+    END
+    """,
+    "INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS email_search_update",
+    "DROP TRIGGER IF EXISTS email_search_delete",
+    "DROP TRIGGER IF EXISTS email_search_insert",
+    "DROP TABLE IF EXISTS email_analyzer_emailsearch",
+    "DROP VIEW IF EXISTS email_analyzer_emailsearchsource",
+]
+
+# Postgres: coluna gerada não pode ler outra tabela; o tsvector vira uma
+# coluna comum escrita por search.update_index()
+POSTGRES_FORWARD = [
+    "ALTER TABLE email_analyzer_emailmessage ADD COLUMN search_vector tsvector",
+    "CREATE INDEX email_search_idx ON email_analyzer_emailmessage USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS email_search_idx",
+    "ALTER TABLE email_analyzer_emailmessage DROP COLUMN IF EXISTS search_vector",
+]
+BATCH_SIZE = 1000
+
+
+# Descompressão copiada como na 0009, sem depender do body_store atual
+def decode(data, codec):
+    data = bytes(data)
+    if codec == 'zlib':
+        data = zlib.decompress(data)
+    elif codec == 'zstd':
+        import zstandard
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return data.decode('utf-8', 'surrogatepass')
+
+
+def register_sqlite_functions(connection):
+    connection.ensure_connection()
+    connection.connection.create_function(
+        'email_body_text', 2,
+        lambda data, codec: decode(data, codec) if data is not None else None,
+        deterministic=True
+    )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        register_sqlite_functions(schema_editor.connection)
+    for statement in {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}.get(vendor, []):
+        schema_editor.execute(statement)
+    if vendor != 'postgresql':
+        return
+
+    EmailMessage = apps.get_model('email_analyzer', 'EmailMessage')
+    last_id = 0
+    while True:
+        emails = list(EmailMessage.objects.filter(id__gt=last_id).order_by('id').select_related('content_body')[:BATCH_SIZE])
+        if not emails:
+            break
+        rows = [
+            (email.subject, email.sender,
+             decode(email.content_body.data, email.content_body.codec) if email.content_body else '', email.id)
+            for email in emails
+        ]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                "UPDATE email_analyzer_emailmessage SET search_vector = "
+                "setweight(to_tsvector('portuguese', coalesce(%s, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(%s, '')), 'B') || "
+                "setweight(to_tsvector('portuguese', left(coalesce(%s, ''), 200000)), 'D') "
+                "WHERE id = %s",
+                rows
+            )
+        last_id = emails[-1].id
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0009_move_email_bodies'),
+    ]
+
+    operations = [
+        # Só no estado: permite que a reversão recrie a coluna com ''
+        migrations.AlterField(
+            model_name='emailmessage',
+            name='content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RemoveField(
+            model_name='emailmessage',
+            name='content',
+        ),
+        migrations.RemoveField(
+            model_name='emailmessage',
+            name='suggested_response',
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
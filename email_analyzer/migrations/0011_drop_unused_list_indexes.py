@@ -0,0 +1,21 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:44
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0010_remove_inline_bodies'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='emailmessage',
+            name='email_sender_recent_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='emailmessage',
+            name='email_confidence_idx',
+        ),
+    ]
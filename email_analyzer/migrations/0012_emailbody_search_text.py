@@ -0,0 +1,118 @@
+from importlib import import_module
+
+from django.db import migrations, models
+
+# O SQLite passa a indexar uma cópia sem compressão do corpo: a view e os
+# triggers deixam de chamar email_body_text(), e gravações feitas fora do
+# Django (sqlite3, dbshell, restaurações) não falham mais com "no such function"
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS email_search_update",
+    "DROP TRIGGER IF EXISTS email_search_delete",
+    "DROP TRIGGER IF EXISTS email_search_insert",
+    "DROP TABLE IF EXISTS email_analyzer_emailsearch",
+    "DROP VIEW IF EXISTS email_analyzer_emailsearchsource",
+]
+SQLITE_FORWARD = [
+    """
+    CREATE VIEW email_analyzer_emailsearchsource AS
+    SELECT email.id AS id, email.subject AS subject, email.sender AS sender,
+           coalesce(body.search_text, '') AS content
+    FROM email_analyzer_emailmessage email
+    LEFT JOIN email_analyzer_emailbody body ON body.id = email.content_body_id
+    """,
+    """
+    CREATE VIRTUAL TABLE email_analyzer_emailsearch USING fts5(
+        subject, sender, content,
+        content='email_analyzer_emailsearchsource', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER email_search_insert AFTER INSERT ON email_analyzer_emailmessage BEGIN
+        INSERT INTO email_analyzer_emailsearch (rowid, subject, sender, content)
+        VALUES (new.id, new.subject, new.sender, coalesce(
+            (SELECT search_text FROM email_analyzer_emailbody WHERE id = new.content_body_id), ''
+        ));
+    END
+    """,
+    """
+    CREATE TRIGGER email_search_delete AFTER DELETE ON email_analyzer_emailmessage BEGIN
+        INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch, rowid, subject, sender, content)
+        VALUES ('delete', old.id, old.subject, old.sender, coalesce(
+            (SELECT search_text FROM email_analyzer_emailbody WHERE id = old.content_body_id), ''
+        ));
+    END
+    """,
+    """
+    CREATE TRIGGER email_search_update AFTER UPDATE OF subject, sender, content_body_id ON email_analyzer_emailmessage
+    WHEN old.subject IS NOT new.subject OR old.sender IS NOT new.sender OR old.content_body_id IS NOT new.content_body_id
+    BEGIN
+        INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch, rowid, subject, sender, content)
+        VALUES ('delete', old.id, old.subject, old.sender, coalesce(
+            (SELECT search_text FROM email_analyzer_emailbody WHERE id = old.content_body_id), ''
+        ));
+        INSERT INTO email_analyzer_emailsearch (rowid, subject, sender, content)
+        VALUES (new.id, new.subject, new.sender, coalesce(
+            (SELECT search_text FROM email_analyzer_emailbody WHERE id = new.content_body_id), ''
+        ));
+    END
+    """,
+    "INSERT INTO email_analyzer_emailsearch (email_analyzer_emailsearch) VALUES ('rebuild')",
+]
+BATCH_SIZE = 1000
+
+
+def _previous():
+    return import_module('email_analyzer.migrations.0010_remove_inline_bodies')
+
+
+def drop_search_index(apps, schema_editor):
+    # Em volta do AddField: recriar a tabela emailbody com a view apontando para ela falharia
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+
+
+def restore_udf_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    previous = _previous()
+    previous.register_sqlite_functions(schema_editor.connection)
+    for statement in previous.SQLITE_FORWARD:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    decode = _previous().decode
+    EmailBody = apps.get_model('email_analyzer', 'EmailBody')
+    bodies = EmailBody.objects.using(schema_editor.connection.alias)
+    last_id = 0
+    while True:
+        batch = list(bodies.filter(id__gt=last_id).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            break
+        for body in batch:
+            body.search_text = decode(body.data, body.codec)
+        bodies.bulk_update(batch, ['search_text'])
+        last_id = batch[-1].id
+    for statement in SQLITE_FORWARD:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_analyzer', '0011_drop_unused_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_index, restore_udf_search_index),
+        migrations.AddField(
+            model_name='emailbody',
+            name='search_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
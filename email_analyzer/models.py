@@ -1,6 +1,10 @@
+from datetime import timedelta
+
 from django.db import models
 from django.utils import timezone
 
+import config
+
 class LogMessage(models.Model):
     message = models.CharField(max_length=300)
     log_date = models.DateTimeField("date logged")
@@ -10,6 +14,65 @@ class LogMessage(models.Model):
         date = timezone.localtime(self.log_date)
         return f"'{self.message}' logged on {date.strftime('%A, %d %B, %Y at %X')}"
 
+class EmailBody(models.Model):
+    """One distinct email body or response text, stored once and compressed"""
+    digest = models.CharField(max_length=64, unique=True)
+    codec = models.CharField(max_length=8)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()  # Bytes UTF-8 sem compressão
+    # Só no SQLite: texto lido pelos triggers da busca (FTS5) sem descomprimir em Python
+    search_text = models.TextField(blank=True, default='')
+    
+    def __str__(self):
+        return f"Body {self.digest[:12]} ({self.size} bytes, {self.codec})"
+    
+    @property
+    def text(self):
+        if not hasattr(self, '_text'):
+            from .body_store import decode
+            self._text = decode(self.data, self.codec)
+        return self._text
+
+# Propriedades de texto de EmailMessage e as chaves estrangeiras que as guardam
+BODY_FIELDS = {'content': 'content_body', 'suggested_response': 'response_body'}
+
+def _body_fields(fields):
+    """Translate content/suggested_response in a field list to the columns that store them"""
+    translated = []
+    for name in fields:
+        if name in BODY_FIELDS:
+            translated.append(BODY_FIELDS[name])
+            if name == 'content':
+                translated.append('preview')
+        else:
+            translated.append(name)
+    return translated
+
+class EmailMessageQuerySet(models.QuerySet):
+    """Store pending body texts before bulk writes, which skip Model.save"""
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        from .body_store import attach_bodies
+        objs = list(objs)
+        attach_bodies(objs)
+        created = super().bulk_create(objs, *args, **kwargs)
+        from .search import update_index
+        update_index(created)
+        return created
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .body_store import attach_bodies
+        objs = list(objs)
+        attach_bodies(objs)
+        updated = super().bulk_update(objs, _body_fields(fields), *args, **kwargs)
+        if {'subject', 'sender', 'content'} & set(fields):
+            from .search import update_index
+            update_index(objs)
+        return updated
+    
+    def with_bodies(self):
+        return self.select_related(*BODY_FIELDS.values())
+
 class EmailMessage(models.Model):
     CATEGORY_CHOICES = [
         ('produtivo', 'Produtivo'),
@@ -17,16 +80,112 @@ class EmailMessage(models.Model):
     ]
     
     subject = models.CharField(max_length=200)
-    content = models.TextField()
+    # Corpo e resposta ficam em EmailBody (deduplicados e comprimidos); use
+    # as propriedades content e suggested_response
+    content_body = models.ForeignKey(EmailBody, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    preview = models.CharField(max_length=100, blank=True, default='')
     sender = models.CharField(max_length=100)
     received_date = models.DateTimeField("date received", default=timezone.now)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, blank=True)
     confidence_score = models.FloatField(default=0.0)
-    suggested_response = models.TextField(blank=True)
+    response_body = models.ForeignKey(EmailBody, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
     is_processed = models.BooleanField(default=False)
+    # Fila de classificação em segundo plano (classify_worker)
+    claimed_by = models.CharField(max_length=64, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    
+    objects = EmailMessageQuerySet.as_manager()
     
     def __str__(self):
         return f"Email from {self.sender}: {self.subject}"
     
+    def _get_body(self, name):
+        pending = self.__dict__.get('_pending_bodies', {})
+        if name in pending:
+            return pending[name]
+        # Texto já gravado por este objeto, enquanto a chave não mudar
+        body_id, text = self.__dict__.get('_stored_bodies', {}).get(name, (0, None))
+        if text is not None and body_id == getattr(self, f'{BODY_FIELDS[name]}_id'):
+            return text
+        body = getattr(self, BODY_FIELDS[name])
+        return body.text if body is not None else ''
+    
+    def _set_body(self, name, text):
+        self.__dict__.setdefault('_pending_bodies', {})[name] = text or ''
+    
+    @property
+    def content(self):
+        return self._get_body('content')
+    
+    @content.setter
+    def content(self, text):
+        self._set_body('content', text)
+        self.preview = (text or '')[:100]
+    
+    @property
+    def suggested_response(self):
+        return self._get_body('suggested_response')
+    
+    @suggested_response.setter
+    def suggested_response(self, text):
+        self._set_body('suggested_response', text)
+    
+    def save(self, *args, **kwargs):
+        from .body_store import attach_bodies
+        attach_bodies([self])
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = _body_fields(kwargs['update_fields'])
+        super().save(*args, **kwargs)
+    
+    @property
+    def queue_status(self):
+        """pending, processing, done or failed"""
+        if self.is_processed:
+            return 'done'
+        stale = timezone.now() - timedelta(seconds=config.QUEUE_CLAIM_TIMEOUT)
+        if self.claimed_at is not None and self.claimed_at >= stale:
+            return 'processing'
+        if self.attempts >= config.QUEUE_MAX_ATTEMPTS:
+            return 'failed'
+        return 'pending'
+    
     class Meta:
         ordering = ['-received_date']
+        indexes = [
+            models.Index(fields=['is_processed', 'claimed_at'], name='email_queue_idx'),
+            # Paginação por cursor em (received_date, id), com e sem filtro de categoria;
+            # remetente (trecho) e faixa de confiança filtram as linhas lidas nessa ordem
+            models.Index(fields=['received_date', 'id'], name='email_recent_idx'),
+            models.Index(fields=['category', 'received_date', 'id'], name='email_category_recent_idx'),
+        ]
+
+class EmailFingerprint(models.Model):
+    """SimHash of an email body, split into bands for near-duplicate lookup"""
+    email = models.OneToOneField(EmailMessage, on_delete=models.CASCADE, primary_key=True,
+                                 related_name='fingerprint')
+    simhash = models.BigIntegerField()
+    band_0 = models.IntegerField(db_index=True)
+    band_1 = models.IntegerField(db_index=True)
+    band_2 = models.IntegerField(db_index=True)
+    band_3 = models.IntegerField(db_index=True)
+    
+    def __str__(self):
+        return f"Fingerprint {self.simhash & 0xFFFFFFFFFFFFFFFF:016x} of email {self.email_id}"
+
+class EmailDailyRollup(models.Model):
+    """Processed emails per day, category and confidence bucket (0-20%, ..., 80-100%)"""
+    day = models.DateField()
+    category = models.CharField(max_length=20, choices=EmailMessage.CATEGORY_CHOICES)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day} {self.category} bucket {self.bucket}: {self.count}"
+    
+    class Meta:
+        ordering = ['day', 'category', 'bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category', 'bucket'], name='unique_rollup_cell'),
+        ]
@@ -0,0 +1,144 @@
+"""
+Near-duplicate index over stored emails using 64-bit SimHash fingerprints.
+
+Chain letters and promotions arrive as many slightly different copies, which
+the exact-hash result cache cannot match. Each processed EmailMessage gets a
+SimHash of its word 3-shingles, stored in EmailFingerprint with the hash
+split into four 16-bit bands. Two fingerprints within three differing bits
+always share a band, so a lookup only compares the rows that match one of the
+four indexed bands instead of scanning the table. That guarantee is what lets
+a lookup be exact, so thresholds that would accept four or more differing bits
+(0.9375 and below) are rejected instead of silently missing matches.
+"""
+
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from django.db.models import Q
+
+import config
+from .extraction import extract_content
+from .models import EmailFingerprint, EmailMessage
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+SHINGLE_SIZE = 3
+# Com BANDS bits diferentes cada um pode cair numa faixa: abaixo disso uma faixa sempre coincide
+MIN_THRESHOLD = 1.0 - BANDS / BITS
+_MASK = (1 << BITS) - 1
+_BIT_POSITIONS = np.arange(BITS, dtype=np.uint64)
+
+
+def simhash(processed_text: str) -> int:
+    """64-bit SimHash of the word shingles of an already preprocessed text"""
+    words = processed_text.split()
+    if not words:
+        return 0
+    if len(words) < SHINGLE_SIZE:
+        shingles = words
+    else:
+        shingles = [' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+         for shingle in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # Cada bit do resultado é o voto da maioria entre os shingles
+    bits = (hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int(sum(1 << i for i in np.flatnonzero(votes > 0)))
+
+
+def similarity(a: int, b: int) -> float:
+    """Share of equal bits between two fingerprints"""
+    return 1.0 - ((a ^ b) & _MASK).bit_count() / BITS
+
+
+def bands(fingerprint: int) -> List[int]:
+    return [(fingerprint >> (i * BAND_BITS)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+
+def _to_signed(fingerprint: int) -> int:
+    # BigIntegerField é um inteiro de 64 bits com sinal
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def fingerprint_email(subject: str, content: str) -> int:
+    """Fingerprint the text the classifier sees for an email"""
+    from .nlp_processor import preprocess_text
+    if config.BODY_EXTRACTION_ENABLED:
+        content = extract_content(content)
+    return simhash(preprocess_text(f"{subject} {content}"))
+
+
+def build_fingerprint(email: EmailMessage, fingerprint: int = None) -> EmailFingerprint:
+    if fingerprint is None:
+        fingerprint = fingerprint_email(email.subject, email.content)
+    band_values = bands(fingerprint)
+    return EmailFingerprint(
+        email_id=email.pk,
+        simhash=_to_signed(fingerprint),
+        **{f'band_{i}': value for i, value in enumerate(band_values)}
+    )
+
+
+def index_email(email: EmailMessage) -> None:
+    """Create or refresh the fingerprint of one processed email"""
+    if not email.is_processed or not email.category:
+        return
+    fingerprint = build_fingerprint(email)
+    EmailFingerprint.objects.update_or_create(
+        email_id=email.pk,
+        defaults={
+            'simhash': fingerprint.simhash,
+            **{f'band_{i}': getattr(fingerprint, f'band_{i}') for i in range(BANDS)}
+        }
+    )
+
+
+def index_emails(emails: Iterable[EmailMessage], batch_size: int = 1000) -> None:
+    """Fingerprint emails saved with bulk_create (which skips post_save)"""
+    fingerprints = [build_fingerprint(email) for email in emails
+                    if email.pk and email.is_processed and email.category]
+    EmailFingerprint.objects.bulk_create(fingerprints, batch_size=batch_size, ignore_conflicts=True)
+
+
+class NearDuplicateIndex:
+    """Find the stored email most similar to a fingerprint, above a threshold"""
+
+    def __init__(self, threshold: float = None):
+        self.threshold = threshold if threshold is not None else config.NEAR_DUPLICATE_THRESHOLD
+        if not MIN_THRESHOLD < self.threshold <= 1.0:
+            raise ValueError(
+                f"NEAR_DUPLICATE_THRESHOLD deve ser maior que {MIN_THRESHOLD} "
+                f"({BANDS} faixas só garantem até {BANDS - 1} bits diferentes), recebeu {self.threshold}"
+            )
+
+    @classmethod
+    def from_config(cls):
+        return cls(config.NEAR_DUPLICATE_THRESHOLD)
+
+    def find(self, fingerprint: int) -> Optional[Dict[str, Any]]:
+        if not fingerprint:
+            return None
+        query = Q()
+        for i, value in enumerate(bands(fingerprint)):
+            query |= Q(**{f'band_{i}': value})
+        # Os mais recentes primeiro: com muitos candidatos o resultado não depende da ordem do banco
+        candidates = EmailFingerprint.objects.filter(query).order_by('-email_id').values_list(
+            'email_id', 'simhash', 'email__category', 'email__confidence_score'
+        )[:config.NEAR_DUPLICATE_MAX_CANDIDATES]
+
+        best = None
+        for email_id, stored, category, confidence in candidates:
+            score = similarity(fingerprint, stored)
+            if score >= self.threshold and (best is None or score > best['similarity']):
+                best = {'email_id': email_id, 'similarity': score,
+                        'category': category, 'confidence_score': confidence}
+        return best
+
+    def find_text(self, processed_text: str) -> Optional[Dict[str, Any]]:
+        return self.find(simhash(processed_text))
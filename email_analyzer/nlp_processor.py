@@ -1,102 +1,336 @@
 import re
+import threading
+import time
+from collections import Counter
+
 import numpy as np
-from typing import Tuple, Dict, Any
-from transformers import pipeline
+from typing import Tuple, Dict, Any, List
+
+import config
+from .backends import load_backend
+from .batching import MicroBatcher
+from . import batch_scoring, metrics
+from .cache import ClassificationCache
+from .chunking import plan_windows, aggregate_scores
+from .extraction import extract_content
+from .keywords import (
+    KeywordHits, get_matcher,
+    PRODUCTIVE_KEYWORDS, UNPRODUCTIVE_KEYWORDS,
+    WORK_CONTEXT_INDICATORS, SPAM_CONTEXT_INDICATORS,
+    WORK_INDICATOR_GROUPS, PRODUCTIVE_COMBINATIONS, UNPRODUCTIVE_COMBINATIONS,
+    BOOST_COMBINATIONS, FORMAL_LANGUAGE, SPECIFIC_DETAILS,
+    PRODUCTIVE_STRUCTURE, UNPRODUCTIVE_CALL_TO_ACTION, UNPRODUCTIVE_BLESSINGS, EMOJIS,
+    PRODUCTIVE_TIEBREAK, UNPRODUCTIVE_TIEBREAK,
+)
+
+
+# Camada que decidiu a classificação (campo decided_by)
+TIER_KEYWORDS = 'keywords'
+TIER_MODEL = 'model'
+TIER_MODEL_NEUTRAL = 'model-neutral'
+TIER_FALLBACK = 'fallback'
+TIER_NEAR_DUPLICATE = 'near-duplicate'
+TIER_EMPTY = 'empty'
+
+
+def preprocess_text(text: str) -> str:
+    """Lowercase, keep only letters and collapse whitespace"""
+    if not text:
+        return ""
+    
+    # Convert to lowercase
+    text = text.lower()
+    
+    # Remove special characters and numbers
+    text = re.sub(r'[^a-zA-ZÀ-ÿ\s]', ' ', text)
+    
+    # Remove extra whitespace
+    text = re.sub(r'\s+', ' ', text).strip()
+    
+    return text
+
+
+def _has_more_words_than(text: str, limit: int) -> bool:
+    """Same as len(text.split()) > limit without splitting the whole text"""
+    return len(text.split(None, limit)) > limit
+
 
 class EmailProcessor:
-    def __init__(self):
+    def __init__(self, load_model: bool = True, cache: ClassificationCache = None, near_duplicates=None):
         self.classifier = None
-        
-        # Initialize the classifier
-        self._initialize_classifier()
+        # Motivo da falha ao carregar o modelo, exibido em /ready/
+        self.load_error = None
+        self.batcher = None
+        self.keyword_matcher = get_matcher()
+        self.cache = cache
+        # Índice de quase-duplicatas (NearDuplicateIndex), opcional
+        self.near_duplicates = near_duplicates
+        self.tier_counts = Counter()
+        self._tier_lock = threading.Lock()
+        
+        # Initialize the classifier (load_model=False: apenas palavras-chave)
+        if load_model:
+            self._initialize_classifier()
+        
+        # Agrupar chamadas concorrentes em um único forward pass
+        if self.classifier and config.BATCH_INFERENCE_ENABLED:
+            self.batcher = MicroBatcher(
+                self._predict_batch,
+                max_batch_size=config.BATCH_MAX_SIZE,
+                max_wait_ms=config.BATCH_MAX_WAIT_MS,
+                timeout=config.API_TIMEOUT
+            )
     
     def _initialize_classifier(self):
         """Initialize the Hugging Face classifier for email classification"""
         try:
             # Use a multilingual model for Portuguese and English
-            model_name = "nlptown/bert-base-multilingual-uncased-sentiment"
-            self.classifier = pipeline(
-                "sentiment-analysis",
-                model=model_name,
-                tokenizer=model_name
-            )
-            print("✅ Modelo Hugging Face carregado com sucesso!")
+            model_name = config.HUGGING_FACE_MODEL
+            started = time.perf_counter()
+            self.classifier = load_backend(config.INFERENCE_BACKEND, model_name)
+            if config.METRICS_ENABLED:
+                metrics.MODEL_LOAD_SECONDS.observe(time.perf_counter() - started, backend=config.INFERENCE_BACKEND)
+            print(f"✅ Modelo Hugging Face carregado com sucesso! (backend: {config.INFERENCE_BACKEND})")
         except Exception as e:
+            self.load_error = str(e)
+            if config.METRICS_ENABLED:
+                metrics.MODEL_LOAD_FAILURES.inc(backend=config.INFERENCE_BACKEND)
             print(f"❌ Erro ao carregar modelo Hugging Face: {e}")
             print("⚠️  Sistema funcionará com classificação básica")
     
+    def dispose(self):
+        """Release the loaded model so its memory can be reclaimed"""
+        if self.batcher:
+            self.batcher.close()
+            self.batcher = None
+        if self.cache:
+            self.cache.clear()
+        if self.classifier is not None and hasattr(self.classifier, 'dispose'):
+            self.classifier.dispose()
+        self.classifier = None
+    
+    @property
+    def model_version(self) -> str:
+        """Identify the model, rules and settings behind a result, for cache invalidation"""
+        if self.classifier:
+            backend = getattr(self.classifier, 'name', 'pipeline')
+            model = f"{config.HUGGING_FACE_MODEL}|{backend}"
+            if getattr(self.classifier, 'revision', None):
+                model += f"@{self.classifier.revision}"
+            # Truncamento e janelas de emails longos mudam o que o modelo vê
+            model += f"|max-{config.MODEL_MAX_LENGTH}"
+            if config.LONG_EMAIL_MODE:
+                model += (f"|long-{config.LONG_EMAIL_OVERLAP}-{config.LONG_EMAIL_MAX_WINDOWS}"
+                          f"-{config.LONG_EMAIL_AGGREGATION}")
+            if config.CASCADE_ENABLED:
+                model += f"|cascade-{config.CASCADE_LOWER}-{config.CASCADE_UPPER}"
+        else:
+            model = 'keywords'
+        # A extração decide o texto classificado, inclusive pelas palavras-chave
+        extraction = f"extract-{config.MAX_EMAIL_LENGTH}" if config.BODY_EXTRACTION_ENABLED else 'raw'
+        return f"{model}|{extraction}|rules-{config.RULES_VERSION}"
+    
+    @metrics.timed_stage('inference')
+    def _predict(self, text: str) -> Dict[str, Any]:
+        """Run the classifier on one text, through the micro-batcher if enabled"""
+        if self.batcher:
+            return self.batcher.submit(text)
+        metrics.observe_batch(1, 'emails')
+        return self.classifier(text, truncation=True, max_length=config.MODEL_MAX_LENGTH)[0]
+    
+    def _predict_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Run the classifier on several texts in a single forward pass"""
+        metrics.observe_batch(len(texts), 'emails')
+        return self.classifier(
+            texts, batch_size=len(texts), truncation=True, max_length=config.MODEL_MAX_LENGTH
+        )
+    
+    def _predict_text(self, text: str) -> Dict[str, Any]:
+        """Predict a label for the whole text, splitting long emails into token windows"""
+        if not self._needs_windows(text):
+            return self._predict(text)
+        
+        tokenizer = self.classifier.tokenizer
+        token_ids = tokenizer(text, add_special_tokens=False)['input_ids']
+        window_size = config.MODEL_MAX_LENGTH - tokenizer.num_special_tokens_to_add()
+        if len(token_ids) <= window_size:
+            return self._predict(text)
+        
+        windows = plan_windows(
+            token_ids, window_size,
+            overlap=config.LONG_EMAIL_OVERLAP,
+            max_windows=config.LONG_EMAIL_MAX_WINDOWS
+        )
+        window_scores = self._predict_windows(windows)
+        combined = aggregate_scores(window_scores, config.LONG_EMAIL_AGGREGATION)
+        
+        labels = self.classifier.id2label
+        best = int(np.argmax(combined))
+        return {'label': labels[best], 'score': float(combined[best])}
+    
+    def _needs_windows(self, text: str) -> bool:
+        """Whether the text may exceed the model input and go through token windows"""
+        # Cada token cobre ao menos um caractere: textos curtos cabem sem tokenizar
+        tokenizer = getattr(self.classifier, 'tokenizer', None)
+        return config.LONG_EMAIL_MODE and tokenizer is not None and len(text) > config.MODEL_MAX_LENGTH - 2
+    
+    def _predict_windows(self, windows: List[List[int]]) -> np.ndarray:
+        """Run all token windows of one email through the model in one batch"""
+        metrics.observe_batch(len(windows), 'windows')
+        with metrics.stage('inference'):
+            return self.classifier.predict_windows(windows)
+    
+    def inference_stats(self) -> Dict[str, Any]:
+        """Return micro-batching statistics, or None when batching is disabled"""
+        return self.batcher.stats() if self.batcher else None
+    
+    @metrics.timed_stage('preprocess')
     def preprocess_text(self, text: str) -> str:
         """Preprocess the email text"""
-        if not text:
-            return ""
-        
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove special characters and numbers
-        text = re.sub(r'[^a-zA-ZÀ-ÿ\s]', ' ', text)
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        return preprocess_text(text)
     
     def classify_email(self, subject: str, content: str) -> Tuple[str, float]:
         """Classify email as productive or unproductive"""
         # Combine subject and content
         full_text = f"{subject} {content}"
         processed_text = self.preprocess_text(full_text)
-        
+        return self._classify_processed(processed_text)
+    
+    def _classify_processed(self, processed_text: str) -> Tuple[str, float]:
+        """Classify an already preprocessed email text"""
+        category, confidence, _ = self._classify_with_tier(processed_text)
+        return category, confidence
+    
+    def _classify_with_tier(self, processed_text: str) -> Tuple[str, float, str]:
+        """Classify and report which tier decided: keywords, model or fallback"""
+        decided, hits, keyword_result = self._keyword_tier(processed_text)
+        if decided is not None:
+            return decided
+        return self._model_tier(processed_text, hits, keyword_result)
+    
+    def _keyword_tier(self, processed_text: str):
+        """Decide without the model when possible; returns (decided, hits, keyword_result)"""
         if not processed_text:
-            return "improdutivo", 0.5
-        
+            return self._record_tier("improdutivo", 0.5, TIER_EMPTY), None, None
+        
+        hits = self._scan_keywords(processed_text)
+        if not self.classifier:
+            return self._fallback_tier(processed_text, hits), hits, None
+        
+        # Cascata: palavras-chave decisivas dispensam o modelo
+        keyword_result = None
+        if config.CASCADE_ENABLED:
+            keyword_result = self._keyword_based_classification(processed_text, hits)
+            if not config.CASCADE_LOWER <= keyword_result[1] < config.CASCADE_UPPER:
+                return self._record_tier(*keyword_result, TIER_KEYWORDS), hits, keyword_result
+        return None, hits, keyword_result
+    
+    def _model_tier(self, processed_text: str, hits: KeywordHits,
+                    keyword_result: Tuple[str, float] = None) -> Tuple[str, float, str]:
         try:
-            if self.classifier:
-                # Use Hugging Face classifier
-                result = self.classifier(processed_text[:512])[0]  # Limit to 512 tokens
-                
-                # Map sentiment to productivity - CORRIGIDO
-                # Emails com sentimento negativo (1-2 estrelas) são produtivos (trabalho)
-                # Emails com sentimento positivo (4-5 estrelas) são improdutivos (spam/correntes)
-                if result['label'] in ['1 star', '2 stars']:
-                    category = 'produtivo'
-                    # Ajustar confiança baseada na força do sentimento
-                    base_confidence = result['score']
-                    confidence = self._calculate_enhanced_confidence(
-                        base_confidence, processed_text, 'produtivo'
-                    )
-                elif result['label'] in ['4 stars', '5 stars']:
-                    category = 'improdutivo'
-                    # Ajustar confiança baseada na força do sentimento
-                    base_confidence = result['score']
-                    confidence = self._calculate_enhanced_confidence(
-                        base_confidence, processed_text, 'improdutivo'
-                    )
-                else:
-                    # Para 3 estrelas (neutro), usar classificação por palavras-chave
-                    return self._keyword_based_classification(processed_text)
-                
-                return category, confidence
-            
+            # Use Hugging Face classifier
+            result = self._predict_text(processed_text)
+            return self._from_prediction(result, processed_text, hits, keyword_result)
         except Exception as e:
             print(f"Erro na classificação: {e}")
         
+        return self._fallback_tier(processed_text, hits, keyword_result)
+    
+    def _from_prediction(self, result: Dict[str, Any], processed_text: str, hits: KeywordHits,
+                         keyword_result: Tuple[str, float] = None) -> Tuple[str, float, str]:
+        """Map a model prediction to a category and enhanced confidence"""
+        # Map sentiment to productivity - CORRIGIDO
+        # Emails com sentimento negativo (1-2 estrelas) são produtivos (trabalho)
+        # Emails com sentimento positivo (4-5 estrelas) são improdutivos (spam/correntes)
+        if result['label'] in ['1 star', '2 stars']:
+            category = 'produtivo'
+        elif result['label'] in ['4 stars', '5 stars']:
+            category = 'improdutivo'
+        else:
+            # Para 3 estrelas (neutro), usar classificação por palavras-chave
+            keyword_result = keyword_result or self._keyword_based_classification(processed_text, hits)
+            return self._record_tier(*keyword_result, TIER_MODEL_NEUTRAL)
+        
+        # Ajustar confiança baseada na força do sentimento
+        confidence = self._calculate_enhanced_confidence(result['score'], processed_text, category, hits)
+        return self._record_tier(category, confidence, TIER_MODEL)
+    
+    def _fallback_tier(self, processed_text: str, hits: KeywordHits,
+                       keyword_result: Tuple[str, float] = None) -> Tuple[str, float, str]:
         # Fallback classification based on keywords
-        return self._keyword_based_classification(processed_text)
+        keyword_result = keyword_result or self._keyword_based_classification(processed_text, hits)
+        return self._record_tier(*keyword_result, TIER_FALLBACK)
+    
+    def _classify_batch(self, processed_texts: List[str]) -> List[Tuple[str, float, str]]:
+        """Classify many texts, sending every short one to the model in a single call"""
+        decisions = [None] * len(processed_texts)
+        pending = []
+        for i, text in enumerate(processed_texts):
+            decided, hits, keyword_result = self._keyword_tier(text)
+            if decided is not None:
+                decisions[i] = decided
+            elif self._needs_windows(text):
+                # Emails longos seguem pelo caminho de janelas, um por vez
+                decisions[i] = self._model_tier(text, hits, keyword_result)
+            else:
+                pending.append((i, hits, keyword_result))
+        
+        if pending:
+            try:
+                with metrics.stage('inference'):
+                    predictions = self._predict_batch([processed_texts[i] for i, _, _ in pending])
+            except Exception as e:
+                print(f"Erro na classificação em lote: {e}")
+                predictions = None
+            for n, (i, hits, keyword_result) in enumerate(pending):
+                text = processed_texts[i]
+                if predictions is None:
+                    decisions[i] = self._fallback_tier(text, hits, keyword_result)
+                else:
+                    decisions[i] = self._from_prediction(predictions[n], text, hits, keyword_result)
+        return decisions
+    
+    def _record_tier(self, category: str, confidence: float, tier: str) -> Tuple[str, float, str]:
+        with self._tier_lock:
+            self.tier_counts[tier] += 1
+        return category, confidence, tier
+    
+    def tier_stats(self) -> Dict[str, Any]:
+        """Return how many emails each tier decided and the fast-path share"""
+        with self._tier_lock:
+            counts = dict(self.tier_counts)
+        total = sum(counts.values())
+        fast_path = counts.get(TIER_KEYWORDS, 0)
+        return {
+            'cascade_enabled': config.CASCADE_ENABLED,
+            'uncertainty_band': [config.CASCADE_LOWER, config.CASCADE_UPPER],
+            'counts': counts,
+            'total': total,
+            'fast_path_share': round(fast_path / total, 4) if total else 0.0,
+        }
+    
+    def _scan_keywords(self, text: str) -> KeywordHits:
+        """Find every keyword occurrence in one pass over the text"""
+        return self.keyword_matcher.scan(text)
     
-    def _calculate_enhanced_confidence(self, base_confidence: float, text: str, category: str) -> float:
+    @metrics.timed_stage('confidence')
+    def _calculate_enhanced_confidence(self, base_confidence: float, text: str, category: str,
+                                       hits: KeywordHits = None) -> float:
         """Calculate enhanced confidence score based on multiple factors"""
+        if hits is None:
+            hits = self._scan_keywords(text)
+        
         # Fator base do modelo de sentimento (0.0 a 1.0)
         sentiment_factor = base_confidence
         
         # Fator de palavras-chave (0.0 a 1.0)
-        keyword_factor = self._calculate_keyword_factor(text, category)
+        keyword_factor = self._calculate_keyword_factor(text, category, hits)
         
         # Fator de estrutura do email (0.0 a 1.0)
-        structure_factor = self._calculate_structure_factor(text, category)
+        structure_factor = self._calculate_structure_factor(text, category, hits)
         
         # Fator de contexto (0.0 a 1.0)
-        context_factor = self._calculate_context_factor(text, category)
+        context_factor = self._calculate_context_factor(text, category, hits)
         
         # Calcular confiança final ponderada
         weights = {
@@ -115,35 +349,21 @@ class EmailProcessor:
         
         # NOVO: Aplicar boost final para emails produtivos com características muito claras
         if category == 'produtivo':
-            final_confidence = self._apply_productive_boost(final_confidence, text)
+            final_confidence = self._apply_productive_boost(final_confidence, text, hits)
         
         # Garantir que a confiança esteja entre 0.0 e 1.0
         return max(0.0, min(1.0, final_confidence))
     
-    def _apply_productive_boost(self, base_confidence: float, text: str) -> float:
+    def _apply_productive_boost(self, base_confidence: float, text: str,
+                                hits: KeywordHits = None) -> float:
         """Apply final boost for very clear productive emails"""
+        if hits is None:
+            hits = self._scan_keywords(text)
+        
         boost = 0.0
         
         # Boost para emails com múltiplas características de trabalho
-        work_indicators = 0
-        
-        # Características principais
-        if any(word in text for word in ['reunião', 'meeting']):
-            work_indicators += 1
-        if any(word in text for word in ['planejamento', 'planning']):
-            work_indicators += 1
-        if any(word in text for word in ['objetivos', 'goals', 'metas']):
-            work_indicators += 1
-        if any(word in text for word in ['equipe', 'team']):
-            work_indicators += 1
-        if any(word in text for word in ['responsabilidades', 'responsibilities']):
-            work_indicators += 1
-        if any(word in text for word in ['cronograma', 'schedule']):
-            work_indicators += 1
-        if any(word in text for word in ['orçamento', 'budget']):
-            work_indicators += 1
-        if any(word in text for word in ['gerente', 'manager']):
-            work_indicators += 1
+        work_indicators = sum(1 for group in WORK_INDICATOR_GROUPS if hits.any(group))
         
         # Aplicar boost baseado no número de indicadores
         if work_indicators >= 6:
@@ -158,81 +378,49 @@ class EmailProcessor:
             boost += 0.05
         
         # Boost adicional para combinações específicas
-        if all(word in text for word in ['reunião', 'planejamento', 'objetivos']):
-            boost += 0.10  # Combinação muito forte
-        
-        if all(word in text for word in ['equipe', 'responsabilidades', 'cronograma']):
-            boost += 0.10  # Combinação muito forte
+        for combination in BOOST_COMBINATIONS:
+            if hits.all(combination):
+                boost += 0.10  # Combinação muito forte
         
         # Boost para estrutura profissional
-        if any(word in text for word in ['prezados', 'atenciosamente', 'cordiais']):
+        if hits.any(FORMAL_LANGUAGE):
             boost += 0.05  # Linguagem formal
         
-        if any(word in text for word in ['Q1 2024', 'Q4 2023', '23/01/2024', '14h']):
+        if hits.any(SPECIFIC_DETAILS):
             boost += 0.05  # Detalhes específicos
         
         return base_confidence + boost
     
-    def _calculate_keyword_factor(self, text: str, category: str) -> float:
+    def _calculate_keyword_factor(self, text: str, category: str,
+                                  hits: KeywordHits = None) -> float:
         """Calculate confidence based on keyword presence and frequency"""
+        if hits is None:
+            hits = self._scan_keywords(text)
+        
         if category == 'produtivo':
-            productive_keywords = [
-                'reunião', 'meeting', 'projeto', 'project', 'cliente', 'client',
-                'trabalho', 'work', 'relatório', 'report', 'deadline', 'entrega',
-                'solicitação', 'request', 'contrato', 'contract', 'avaliação',
-                'performance', 'sprint', 'agenda', 'urgente', 'importante',
-                'planejamento', 'planning', 'metas', 'goals', 'objetivos',
-                'objectives', 'orçamento', 'budget', 'responsabilidades',
-                'responsibilities', 'cronograma', 'schedule', 'empresa',
-                'company', 'equipe', 'team', 'gerente', 'manager'
-            ]
-            keywords = productive_keywords
+            keywords = PRODUCTIVE_KEYWORDS
+            combinations = PRODUCTIVE_COMBINATIONS
         else:
-            unproductive_keywords = [
-                'corrente', 'chain', 'reencaminhar', 'forward', 'spam', 'promoção',
-                'desconto', 'discount', 'piada', 'joke', 'fofoca', 'gossip',
-                'marketing', 'newsletter', 'propaganda', 'advertisement',
-                'sorte', 'luck', 'abençoado', 'blessed', 'reencaminhe',
-                'forward now', 'boa sorte', 'good luck', 'prosperidade',
-                'prosperity', 'amor verdadeiro', 'true love', 'sucesso',
-                'success', 'dinheiro inesperado', 'unexpected money'
-            ]
-            keywords = unproductive_keywords
+            keywords = UNPRODUCTIVE_KEYWORDS
+            combinations = UNPRODUCTIVE_COMBINATIONS
         
         # Contar palavras-chave encontradas
-        found_keywords = sum(1 for word in keywords if word in text)
+        found_keywords = hits.found(keywords)
         
         # NOVO: Calcular frequência das palavras-chave
-        word_frequency = 0
-        for word in keywords:
-            word_frequency += text.count(word)
+        word_frequency = sum(hits.count(word) for word in keywords)
         
         # NOVO: Verificar posição das palavras-chave (assunto tem mais peso)
         position_bonus = 0
-        lines = text.split('\n')
-        if lines:
-            first_line = lines[0].lower()
-            for word in keywords:
-                if word in first_line:
-                    position_bonus += 0.1  # Bônus para palavras no início
+        for word in keywords:
+            if word in hits.first_line:
+                position_bonus += 0.1  # Bônus para palavras no início
         
         # NOVO: Verificar combinações de palavras-chave
+        # (trabalho profissional ou spam, conforme a categoria)
         combination_bonus = 0
-        if category == 'produtivo':
-            # Combinações que indicam trabalho profissional
-            if all(word in text for word in ['reunião', 'planejamento']):
-                combination_bonus += 0.15
-            if all(word in text for word in ['projeto', 'objetivos', 'metas']):
-                combination_bonus += 0.15
-            if all(word in text for word in ['equipe', 'responsabilidades', 'cronograma']):
-                combination_bonus += 0.15
-        else:
-            # Combinações que indicam spam
-            if all(word in text for word in ['corrente', 'reencaminhar', 'sorte']):
-                combination_bonus += 0.15
-            if all(word in text for word in ['boa sorte', 'prosperidade', 'abençoado']):
-                combination_bonus += 0.15
-            if all(word in text for word in ['✨', '💰', '❤️']):
+        for combination in combinations:
+            if hits.all(combination):
                 combination_bonus += 0.15
         
         # Calcular fator baseado na presença de palavras-chave
@@ -257,23 +445,24 @@ class EmailProcessor:
         
         return min(0.95, max(0.1, final_score))
     
-    def _calculate_structure_factor(self, text: str, category: str) -> float:
+    def _calculate_structure_factor(self, text: str, category: str,
+                                    hits: KeywordHits = None) -> float:
         """Calculate confidence based on email structure"""
-        lines = text.split('\n')
-        word_count = len(text.split())
+        if hits is None:
+            hits = self._scan_keywords(text)
         
         if category == 'produtivo':
             # Emails produtivos tendem a ter estrutura mais formal
             structure_indicators = 0
             
             # Verificar presença de elementos estruturais
-            if any(':' in line for line in lines):  # Tópicos com dois pontos
+            if ':' in text:  # Tópicos com dois pontos
                 structure_indicators += 1
-            if word_count > 50:  # Emails de trabalho são mais longos
+            if _has_more_words_than(text, 50):  # Emails de trabalho são mais longos
                 structure_indicators += 1
-            if any(line.strip().startswith('-') for line in lines):  # Listas
+            if '-' in text and any(line.strip().startswith('-') for line in text.split('\n')):  # Listas
                 structure_indicators += 1
-            if any(word in text for word in ['objetivos', 'metas', 'cronograma']):
+            if hits.any(PRODUCTIVE_STRUCTURE):
                 structure_indicators += 1
             
             return min(0.9, 0.4 + (structure_indicators * 0.15))
@@ -282,106 +471,87 @@ class EmailProcessor:
             # Emails improdutivos tendem a ter estrutura mais informal
             structure_indicators = 0
             
-            if any('✨' in line or '💰' in line or '❤️' in line for line in lines):  # Emojis
+            if hits.any(EMOJIS):  # Emojis
                 structure_indicators += 1
-            if any(word in text for word in ['reencaminhe', 'forward now', 'agora']):
+            if hits.any(UNPRODUCTIVE_CALL_TO_ACTION):
                 structure_indicators += 1
-            if any(word in text for word in ['sorte', 'abençoado', 'prosperidade']):
+            if hits.any(UNPRODUCTIVE_BLESSINGS):
                 structure_indicators += 1
-            if word_count < 30:  # Correntes são geralmente curtas
+            if not _has_more_words_than(text, 29):  # Correntes são geralmente curtas
                 structure_indicators += 1
             
             return min(0.9, 0.4 + (structure_indicators * 0.15))
     
-    def _calculate_context_factor(self, text: str, category: str) -> float:
+    def _calculate_context_factor(self, text: str, category: str,
+                                  hits: KeywordHits = None) -> float:
         """Calculate confidence based on contextual clues"""
+        if hits is None:
+            hits = self._scan_keywords(text)
+        
         context_score = 0.5  # Base neutra
         
         if category == 'produtivo':
             # Verificar contexto de trabalho
-            work_context_indicators = [
-                'empresa', 'company', 'equipe', 'team', 'gerente', 'manager',
-                'cliente', 'client', 'projeto', 'project', 'trabalho', 'work'
-            ]
-            
-            context_matches = sum(1 for word in work_context_indicators if word in text)
-            if context_matches >= 2:
-                context_score = 0.8
-            elif context_matches == 1:
-                context_score = 0.6
-            else:
-                context_score = 0.4
-                
+            context_matches = hits.found(WORK_CONTEXT_INDICATORS)
         else:
             # Verificar contexto de spam/corrente
-            spam_context_indicators = [
-                'corrente', 'chain', 'reencaminhar', 'forward', 'spam',
-                'sorte', 'luck', 'abençoado', 'blessed', 'prosperidade'
-            ]
-            
-            context_matches = sum(1 for word in spam_context_indicators if word in text)
-            if context_matches >= 2:
-                context_score = 0.8
-            elif context_matches == 1:
-                context_score = 0.6
-            else:
-                context_score = 0.4
+            context_matches = hits.found(SPAM_CONTEXT_INDICATORS)
+        
+        if context_matches >= 2:
+            context_score = 0.8
+        elif context_matches == 1:
+            context_score = 0.6
+        else:
+            context_score = 0.4
         
         return context_score
     
-    def _keyword_based_classification(self, text: str) -> Tuple[str, float]:
+    def _keyword_based_classification(self, text: str, hits: KeywordHits = None) -> Tuple[str, float]:
         """Fallback classification using keyword analysis"""
-        productive_keywords = [
-            'reunião', 'meeting', 'projeto', 'project', 'cliente', 'client',
-            'trabalho', 'work', 'relatório', 'report', 'deadline', 'entrega',
-            'solicitação', 'request', 'contrato', 'contract', 'avaliação',
-            'performance', 'sprint', 'agenda', 'urgente', 'importante',
-            'planejamento', 'planning', 'metas', 'goals', 'objetivos',
-            'objectives', 'orçamento', 'budget', 'responsabilidades',
-            'responsibilities', 'cronograma', 'schedule', 'empresa',
-            'company', 'equipe', 'team', 'gerente', 'manager'
-        ]
-        
-        unproductive_keywords = [
-            'corrente', 'chain', 'reencaminhar', 'forward', 'spam', 'promoção',
-            'desconto', 'discount', 'piada', 'joke', 'fofoca', 'gossip',
-            'marketing', 'newsletter', 'propaganda', 'advertisement',
-            'sorte', 'luck', 'abençoado', 'blessed', 'reencaminhe',
-            'forward now', 'boa sorte', 'good luck', 'prosperidade',
-            'prosperity', 'amor verdadeiro', 'true love', 'sucesso',
-            'success', 'dinheiro inesperado', 'unexpected money'
-        ]
+        if hits is None:
+            hits = self._scan_keywords(text)
         
-        productive_count = sum(1 for word in productive_keywords if word in text)
-        unproductive_count = sum(1 for word in unproductive_keywords if word in text)
+        productive_count = hits.found(PRODUCTIVE_KEYWORDS)
+        unproductive_count = hits.found(UNPRODUCTIVE_KEYWORDS)
         
         # Determinar categoria baseada na contagem
         if productive_count > unproductive_count:
             category = 'produtivo'
             # Usar sistema de confiança aprimorado
             confidence = self._calculate_enhanced_confidence(
-                0.7, text, 'produtivo'  # Base de 0.7 para classificação por palavras-chave
+                0.7, text, 'produtivo', hits  # Base de 0.7 para classificação por palavras-chave
             )
         elif unproductive_count > productive_count:
             category = 'improdutivo'
             # Usar sistema de confiança aprimorado
             confidence = self._calculate_enhanced_confidence(
-                0.7, text, 'improdutivo'  # Base de 0.7 para classificação por palavras-chave
+                0.7, text, 'improdutivo', hits  # Base de 0.7 para classificação por palavras-chave
             )
         else:
             # Se empate, usar análise mais detalhada
-            if any(word in text for word in ['reunião', 'projeto', 'trabalho', 'cliente']):
+            if hits.any(PRODUCTIVE_TIEBREAK):
                 category = 'produtivo'
-                confidence = self._calculate_enhanced_confidence(0.6, text, 'produtivo')
-            elif any(word in text for word in ['corrente', 'reencaminhar', 'sorte', 'abençoado']):
+                confidence = self._calculate_enhanced_confidence(0.6, text, 'produtivo', hits)
+            elif hits.any(UNPRODUCTIVE_TIEBREAK):
                 category = 'improdutivo'
-                confidence = self._calculate_enhanced_confidence(0.6, text, 'improdutivo')
+                confidence = self._calculate_enhanced_confidence(0.6, text, 'improdutivo', hits)
             else:
                 category = 'improdutivo'
                 confidence = 0.5  # Confiança baixa para casos ambíguos
         
         return category, confidence
     
+    def score_batch(self, texts: List[str], base_confidences: List[float] = None,
+                    categories: List[str] = None, preprocess: bool = True) -> Dict[str, Any]:
+        """Score many emails at once with NumPy (see batch_scoring.score_batch)"""
+        if preprocess:
+            texts = [self.preprocess_text(text) for text in texts]
+        return batch_scoring.score_batch(
+            texts, self.keyword_matcher,
+            base_confidences=base_confidences, categories=categories
+        )
+    
+    @metrics.timed_stage('response')
     def generate_response(self, category: str, subject: str, content: str) -> str:
         """Generate automatic response based on email category"""
         if category == 'produtivo':
@@ -428,15 +598,70 @@ class EmailProcessor:
     
     def process_email(self, subject: str, content: str, sender: str) -> Dict[str, Any]:
         """Process email and return classification results"""
-        # Classify email
-        category, confidence = self.classify_email(subject, content)
-        
-        # Generate response
-        suggested_response = self.generate_response(category, subject, content)
-        
-        return {
-            'category': category,
-            'confidence_score': confidence,
-            'suggested_response': suggested_response,
-            'is_productive': category == 'produtivo'
+        return self.process_batch([(subject, content, sender)])[0]
+    
+    def process_batch(self, emails: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        """Process (subject, content, sender) tuples with one model call for the batch"""
+        if config.BODY_EXTRACTION_ENABLED:
+            # Anexos, HTML e histórico citado não chegam ao classificador
+            emails = [(subject, extract_content(content), sender) for subject, content, sender in emails]
+        processed_texts = [self.preprocess_text(f"{subject} {content}") for subject, content, _ in emails]
+        results = [None] * len(emails)
+        
+        # Corpos idênticos (correntes, campanhas) reutilizam o resultado
+        cache_keys = [None] * len(emails)
+        if self.cache is not None:
+            version = self.model_version
+            for i, processed_text in enumerate(processed_texts):
+                cache_keys[i] = self.cache.make_key(processed_text, version)
+                results[i] = self.cache.get(cache_keys[i])
+        
+        misses = [i for i, result in enumerate(results) if result is None]
+        
+        # Quase-duplicatas de emails já gravados herdam a classificação
+        matches = {}
+        if self.near_duplicates is not None:
+            for i in misses:
+                match = self._find_near_duplicate(processed_texts[i])
+                if match is not None:
+                    matches[i] = match
+            misses = [i for i in misses if i not in matches]
+        decided = {
+            i: self._record_tier(match['category'], match['confidence_score'], TIER_NEAR_DUPLICATE)
+            for i, match in matches.items()
         }
+        
+        if len(misses) == 1:
+            # Um único email segue pelo caminho do micro-batcher
+            decided[misses[0]] = self._classify_with_tier(processed_texts[misses[0]])
+        elif misses:
+            decided.update(zip(misses, self._classify_batch([processed_texts[i] for i in misses])))
+        
+        for i, (category, confidence, tier) in decided.items():
+            subject, content, _ = emails[i]
+            match = matches.get(i)
+            results[i] = {
+                'category': category,
+                'confidence_score': confidence,
+                # Generate response
+                'suggested_response': self.generate_response(category, subject, content),
+                'is_productive': category == 'produtivo',
+                'decided_by': tier,
+                'near_duplicate': {
+                    'email_id': match['email_id'], 'similarity': round(match['similarity'], 4)
+                } if match else None
+            }
+            if cache_keys[i] is not None:
+                self.cache.set(cache_keys[i], results[i])
+        
+        for i, result in enumerate(results):
+            # Resultados vindos do cache não passaram por nenhuma camada agora
+            metrics.count_classification(result['category'], result['decided_by'] if i in decided else 'cache')
+        return [dict(result) for result in results]
+    
+    def _find_near_duplicate(self, processed_text: str):
+        try:
+            return self.near_duplicates.find_text(processed_text)
+        except Exception as e:
+            print(f"Erro na busca de quase-duplicatas: {e}")
+            return None
@@ -0,0 +1,63 @@
+"""
+Keyset (cursor) pagination over EmailMessage ordered by (received_date, id).
+
+OFFSET pagination makes the database walk past every skipped row, so deep
+pages get slower as the table grows. Here each page starts from the
+(received_date, id) of the last row shown, which an index on those columns
+turns into a range scan that stops after one page, however deep it is.
+"""
+
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.utils.dateparse import parse_datetime
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(received_date: datetime, pk: int) -> str:
+    raw = f"{received_date.isoformat()}|{pk}".encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """Return (received_date, id), or None for a missing or malformed cursor"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('ascii')
+        date_part, pk_part = raw.rsplit('|', 1)
+        received_date = parse_datetime(date_part)
+        return (received_date, int(pk_part)) if received_date else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(queryset, size: int, after: Cursor = None, before: Cursor = None):
+    """Return (rows, next_cursor, previous_cursor), newest first.
+
+    `after` pages towards older emails, `before` towards newer ones.
+    """
+    if before is not None:
+        date, pk = before
+        # Condição de intervalo na primeira coluna do índice + exclusão do empate
+        rows = list(
+            queryset.filter(received_date__gte=date).exclude(received_date=date, id__lte=pk)
+            .order_by('received_date', 'id')[:size + 1]
+        )
+        has_newer = len(rows) > size
+        rows = rows[:size][::-1]
+        has_older = True
+    else:
+        if after is not None:
+            date, pk = after
+            queryset = queryset.filter(received_date__lte=date).exclude(received_date=date, id__gte=pk)
+        rows = list(queryset.order_by('-received_date', '-id')[:size + 1])
+        has_older = len(rows) > size
+        rows = rows[:size]
+        has_newer = after is not None
+
+    next_cursor = encode_cursor(rows[-1].received_date, rows[-1].pk) if rows and has_older else None
+    previous_cursor = encode_cursor(rows[0].received_date, rows[0].pk) if rows and has_newer else None
+    return rows, next_cursor, previous_cursor
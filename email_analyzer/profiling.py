@@ -0,0 +1,293 @@
+"""
+On-demand sampling profiler and slow-request log.
+
+ProfilingMiddleware follows a request when profiling is on for it:
+- every request, with PROFILING_ENABLED;
+- a single request, with an X-Profile header carrying PROFILING_HEADER_TOKEN
+  or sent by a staff user;
+- any request, for the slow log, with SLOW_REQUEST_MS > 0.
+
+A followed request gets a per-stage breakdown (the metrics.stage timers of
+parse, preprocess, inference, ...). A sampled request also has its thread's
+stack read every PROFILING_SAMPLE_INTERVAL_MS by a single background thread
+per process, which sleeps while nothing is sampled, so requests that are not
+profiled pay nothing and sampled ones pay only the stack walks.
+
+Requests over SLOW_REQUEST_MS are written as one JSON line to SLOW_REQUEST_LOG
+(stdout when empty). Stacks of requests profiled by header, and of slow
+requests while PROFILING_ENABLED, are kept in PROFILE_DIR in the "folded"
+format of flamegraph.pl and speedscope, next to a JSON file with the
+request's metadata, so any worker can serve them at /api/profiles/.
+"""
+
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+import config
+from .metrics import request_stages
+
+HEADER = 'X-Profile'
+# Pilhas mais profundas que isso são cortadas na raiz
+MAX_STACK_DEPTH = 128
+_PROFILE_ID = re.compile(r'\d{8}T\d{6}-\d+-[0-9a-f]{6}')
+
+_profile: ContextVar[Optional["RequestProfile"]] = ContextVar('request_profile', default=None)
+_log_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Timing, stage breakdown and (when sampled) stack samples of one request"""
+
+    def __init__(self, method: str, path: str, sampled: bool, requested: bool):
+        self.method = method
+        self.path = path
+        self.sampled = sampled
+        # Pedido pelo cabeçalho: o perfil é guardado mesmo se a requisição for rápida
+        self.requested = requested
+        self.stages: Dict[str, float] = {}
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+
+
+def _fold(frame) -> str:
+    """One stack as 'outer;...;inner', each frame as 'function (file:line)'"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Background thread reading the stacks of the threads serving sampled requests"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: Dict[int, RequestProfile] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def track(self, profile: RequestProfile, thread_id: int = None) -> None:
+        with self._lock:
+            self._active[thread_id or threading.get_ident()] = profile
+            # Depois de um fork a thread do processo pai não existe no filho
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def untrack(self, thread_id: int = None) -> None:
+        with self._lock:
+            self._active.pop(thread_id or threading.get_ident(), None)
+
+    def _run(self) -> None:
+        while True:
+            # Sob o lock: depois de untrack() o perfil não muda mais
+            with self._lock:
+                active = bool(self._active)
+                if not active:
+                    self._wake.clear()
+                else:
+                    frames = sys._current_frames()
+                    for thread_id, profile in self._active.items():
+                        frame = frames.get(thread_id)
+                        if frame is not None:
+                            profile.stacks[_fold(frame)] += 1
+                            profile.samples += 1
+                    del frames
+            if active:
+                time.sleep(self.interval)
+            else:
+                self._wake.wait()
+
+
+sampler = Sampler(config.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+
+
+def run_traced(func, *args):
+    """Run func on an executor thread, sampled along with the request that called it"""
+    profile = _profile.get()
+    if profile is None or not profile.sampled:
+        return func(*args)
+    sampler.track(profile)
+    try:
+        return func(*args)
+    finally:
+        sampler.untrack()
+
+
+def _header_allowed(value: str, user) -> bool:
+    if not value:
+        return False
+    if config.PROFILING_HEADER_TOKEN and hmac.compare_digest(value, config.PROFILING_HEADER_TOKEN):
+        return True
+    return bool(user is not None and user.is_active and user.is_staff)
+
+
+def _start(request, user) -> Optional[RequestProfile]:
+    requested = _header_allowed(request.headers.get(HEADER, ''), user)
+    sampled = requested or config.PROFILING_ENABLED
+    if not (sampled or config.SLOW_REQUEST_MS > 0):
+        return None
+    return RequestProfile(request.method, request.path, sampled, requested)
+
+
+def _finish(profile: RequestProfile, response) -> None:
+    duration = time.perf_counter() - profile.started
+    slow = config.SLOW_REQUEST_MS > 0 and duration * 1000 >= config.SLOW_REQUEST_MS
+    stages = {name: round(seconds * 1000, 3) for name, seconds in profile.stages.items()}
+    record = {
+        'timestamp': time.time(),
+        'method': profile.method,
+        'path': profile.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'stages_ms': stages,
+        # Tempo fora das etapas medidas (middlewares, serialização, ...)
+        'other_ms': round(max(duration * 1000 - sum(stages.values()), 0.0), 3),
+        'pid': os.getpid(),
+    }
+    if profile.sampled and (profile.requested or slow):
+        record['profile_id'] = save_profile(profile, record)
+        response[f'{HEADER}-Id'] = record['profile_id']
+    if profile.sampled:
+        # Visível no painel de rede do navegador
+        response['Server-Timing'] = ', '.join(f'{name};dur={ms}' for name, ms in stages.items())
+    if slow:
+        log_slow_request(record)
+
+
+def log_slow_request(record: Dict[str, Any]) -> None:
+    """Append one JSON line to SLOW_REQUEST_LOG (stdout when unset)"""
+    line = json.dumps(record, ensure_ascii=False)
+    with _log_lock:
+        if not config.SLOW_REQUEST_LOG:
+            print(line, flush=True)
+            return
+        try:
+            with open(config.SLOW_REQUEST_LOG, 'a', encoding='utf-8') as log:
+                log.write(line + '\n')
+        except OSError as e:
+            print(f"Erro ao gravar log de requisições lentas: {e}")
+
+
+# Perfis guardados
+
+def _profile_dir() -> Path:
+    return Path(config.PROFILE_DIR)
+
+
+def save_profile(profile: RequestProfile, record: Dict[str, Any]) -> str:
+    """Write the folded stacks and metadata of a profile; returns its id"""
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    directory = _profile_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        stacks = ''.join(f"{stack} {count}\n" for stack, count in profile.stacks.most_common())
+        (directory / f"{profile_id}.folded").write_text(stacks, encoding='utf-8')
+        metadata = dict(record, id=profile_id, samples=profile.samples,
+                        interval_ms=config.PROFILING_SAMPLE_INTERVAL_MS)
+        (directory / f"{profile_id}.json").write_text(json.dumps(metadata), encoding='utf-8')
+        _prune(directory)
+    except OSError as e:
+        print(f"Erro ao gravar perfil: {e}")
+    return profile_id
+
+
+def _prune(directory: Path) -> None:
+    # Os ids começam pela data: os primeiros em ordem alfabética são os mais antigos
+    names = sorted(path.stem for path in directory.glob('*.json'))
+    for name in names[:max(len(names) - config.PROFILE_MAX_DUMPS, 0)]:
+        for suffix in ('.json', '.folded'):
+            (directory / f"{name}{suffix}").unlink(missing_ok=True)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Metadata of the stored profiles, newest first"""
+    profiles = []
+    for path in sorted(_profile_dir().glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def read_profile(profile_id: str) -> Optional[str]:
+    """Folded stacks of one profile, or None when it does not exist"""
+    # Só ids no formato gerado por save_profile: nada de caminhos
+    if not _PROFILE_ID.fullmatch(profile_id):
+        return None
+    path = _profile_dir() / f"{profile_id}.folded"
+    try:
+        return path.read_text(encoding='utf-8')
+    except OSError:
+        return None
+
+
+class ProfilingMiddleware:
+    """Stage breakdown, stack sampling and slow-request log for opted-in requests"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile = _start(request, getattr(request, 'user', None) if request.headers.get(HEADER) else None)
+        if profile is None:
+            return self.get_response(request)
+
+        stages_token = request_stages.set(profile.stages)
+        profile_token = _profile.set(profile)
+        if profile.sampled:
+            sampler.track(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            if profile.sampled:
+                sampler.untrack()
+            _profile.reset(profile_token)
+            request_stages.reset(stages_token)
+        _finish(profile, response)
+        return response
+
+    async def __acall__(self, request):
+        user = await request.auser() if request.headers.get(HEADER) and hasattr(request, 'auser') else None
+        profile = _start(request, user)
+        if profile is None:
+            return await self.get_response(request)
+
+        # O laço de eventos atende outras requisições: só as threads de
+        # inferência (run_traced) são amostradas
+        stages_token = request_stages.set(profile.stages)
+        profile_token = _profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(profile_token)
+            request_stages.reset(stages_token)
+        _finish(profile, response)
+        return response
@@ -0,0 +1,80 @@
+"""
+Process-wide registry for the shared EmailProcessor.
+
+Loading the Hugging Face model is expensive, so each worker process keeps a
+single EmailProcessor that is built lazily on first use (or when the WSGI/ASGI
+application is created, if PRELOAD_MODEL is enabled) and shared by every view
+and thread. transformers and torch are only imported by the backend while it
+loads, so management commands never pay for them.
+"""
+
+import threading
+from typing import Optional
+
+import config
+from .cache import ClassificationCache
+from .near_duplicates import NearDuplicateIndex
+from .nlp_processor import EmailProcessor
+
+_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_processor: Optional[EmailProcessor] = None
+
+
+def get_processor() -> EmailProcessor:
+    """Return the shared processor, building it on first use"""
+    global _processor
+    processor = _processor
+    if processor is not None:
+        return processor
+
+    with _lock:
+        # Outra thread pode ter carregado o modelo enquanto esperávamos
+        if _processor is None:
+            _processor = _build_processor()
+        return _processor
+
+
+def reload_processor() -> EmailProcessor:
+    """Build a fresh processor and swap it in.
+
+    Requests keep using the current processor while the new model loads, and
+    the ones already running finish on it: the old processor is not disposed,
+    only dropped, and its memory is reclaimed once the last of them lets go.
+    """
+    global _processor
+    with _reload_lock:
+        new_processor = _build_processor()
+        with _lock:
+            _processor = new_processor
+        return new_processor
+
+
+def dispose_processor() -> None:
+    """Release the shared processor now; the next get_processor() rebuilds it.
+
+    Unlike reload_processor(), requests still holding it would fail: for
+    shutdown and tests.
+    """
+    global _processor
+    with _lock:
+        old_processor, _processor = _processor, None
+    if old_processor is not None:
+        old_processor.dispose()
+
+
+def _build_processor() -> EmailProcessor:
+    cache = ClassificationCache.from_config() if config.RESULT_CACHE_ENABLED else None
+    near_duplicates = NearDuplicateIndex.from_config() if config.NEAR_DUPLICATE_ENABLED else None
+    return EmailProcessor(cache=cache, near_duplicates=near_duplicates)
+
+
+def preload() -> None:
+    """Build the processor now when PRELOAD_MODEL is enabled; called by the server entry points"""
+    if config.PRELOAD_MODEL:
+        get_processor()
+
+
+def is_loaded() -> bool:
+    """Return True if this process already holds a processor"""
+    return _processor is not None
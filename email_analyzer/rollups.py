@@ -0,0 +1,119 @@
+"""
+Incremental analytics rollup.
+
+EmailDailyRollup keeps one counter per (day, category, confidence bucket).
+Counters move whenever an email enters, leaves or changes its classified
+state: post_save/post_delete handle single saves, and the bulk paths (bulk
+API, import_mail, the queue worker) call record_emails after bulk writes.
+The analytics view then sums at most ten rows per day in the selected range,
+whatever the size of the EmailMessage table. rebuild() recomputes everything
+from EmailMessage with one grouped query.
+"""
+
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import EmailDailyRollup, EmailMessage
+
+BUCKET_EDGES = (0.2, 0.4, 0.6, 0.8)
+BUCKET_LABELS = ['0-20%', '21-40%', '41-60%', '61-80%', '81-100%']
+
+RollupKey = Tuple[date, str, int]
+
+
+def confidence_bucket(confidence: float) -> int:
+    return sum(confidence >= edge for edge in BUCKET_EDGES)
+
+
+def rollup_key(email: EmailMessage) -> Optional[RollupKey]:
+    """The rollup cell an email counts towards, or None when it is not classified"""
+    if not email.is_processed or not email.category or email.received_date is None:
+        return None
+    day = timezone.localdate(email.received_date) if timezone.is_aware(email.received_date) \
+        else email.received_date.date()
+    return day, email.category, confidence_bucket(email.confidence_score)
+
+
+def apply_deltas(deltas: Dict[RollupKey, int]) -> None:
+    """Add the given count changes to their rollup cells"""
+    with transaction.atomic():
+        for (day, category, bucket), delta in deltas.items():
+            if not delta:
+                continue
+            cell = EmailDailyRollup.objects.filter(day=day, category=category, bucket=bucket)
+            if cell.update(count=F('count') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    EmailDailyRollup.objects.create(day=day, category=category, bucket=bucket, count=max(delta, 0))
+            except IntegrityError:
+                # Outro processo criou a célula ao mesmo tempo
+                cell.update(count=F('count') + delta)
+
+
+def record_emails(emails: Iterable[EmailMessage]) -> None:
+    """Count emails that were just classified through a bulk write"""
+    apply_deltas(Counter(key for key in map(rollup_key, emails) if key is not None))
+
+
+def record_change(old_key: Optional[RollupKey], new_key: Optional[RollupKey]) -> None:
+    if old_key == new_key:
+        return
+    deltas = Counter()
+    if old_key is not None:
+        deltas[old_key] -= 1
+    if new_key is not None:
+        deltas[new_key] += 1
+    apply_deltas(deltas)
+
+
+def rebuild(since: date = None) -> int:
+    """Recompute the rollup from EmailMessage (optionally only from a day on); returns cells written"""
+    emails = EmailMessage.objects.filter(is_processed=True).exclude(category='')
+    rollups = EmailDailyRollup.objects.all()
+    if since is not None:
+        emails = emails.filter(received_date__date__gte=since)
+        rollups = rollups.filter(day__gte=since)
+
+    bucket = Case(
+        *[When(confidence_score__lt=edge, then=Value(i)) for i, edge in enumerate(BUCKET_EDGES)],
+        default=Value(len(BUCKET_EDGES)),
+        output_field=IntegerField(),
+    )
+    cells = (
+        emails.annotate(day=TruncDate('received_date'), bucket=bucket)
+        .values('day', 'category', 'bucket')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = EmailDailyRollup.objects.bulk_create(
+            [EmailDailyRollup(**cell) for cell in cells], batch_size=1000
+        )
+    return len(created)
+
+
+def summarize(start: date = None, end: date = None) -> Dict[str, object]:
+    """Totals per category and the confidence histogram for a day range"""
+    rollups = EmailDailyRollup.objects.all()
+    if start is not None:
+        rollups = rollups.filter(day__gte=start)
+    if end is not None:
+        rollups = rollups.filter(day__lte=end)
+
+    by_category = dict(rollups.values_list('category').annotate(total=Sum('count')).order_by())
+    histogram = [0] * len(BUCKET_LABELS)
+    for bucket, total in rollups.values_list('bucket').annotate(total=Sum('count')).order_by():
+        histogram[bucket] = total
+    return {
+        'productive': by_category.get('produtivo', 0),
+        'unproductive': by_category.get('improdutivo', 0),
+        'histogram': histogram,
+    }
@@ -0,0 +1,181 @@
+"""
+Full-text search over stored emails (subject, sender and content).
+
+A LIKE '%term%' over every body cannot use an index, so search goes through
+the database's own full-text index, created by migration 0010. On SQLite it
+is an FTS5 table over a view that reads the uncompressed search_text copy of
+each body (migration 0012), kept in sync by triggers on every insert, update
+and delete, bulk_create included. The triggers are plain SQL, so rows written
+outside Django are indexed too, as long as their EmailBody has search_text. On Postgres it is a tsvector column with a
+GIN index, written by update_index() on save and bulk writes. Other backends
+fall back to an unranked icontains filter on subject and sender.
+"""
+
+import html
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import Q
+
+import config
+from .models import EmailMessage
+
+FTS_TABLE = 'email_analyzer_emailsearch'
+POSTGRES_CONFIG = 'portuguese'
+ORDERS = ('relevance', 'recent')
+
+# Pesos por campo: assunto > remetente > conteúdo
+_SQLITE_WEIGHTS = '10.0, 5.0, 1.0'
+# Marcadores trocados por <mark> depois de escapar o trecho
+_START, _STOP = '\x02', '\x03'
+_TERM = re.compile(r'[^\s"]+')
+
+Hit = Tuple[int, float, str]
+
+
+def fts5_query(text: str) -> str:
+    """Turn user input into an FTS5 query: every word must match, 'word*' is a prefix"""
+    terms = []
+    for term in _TERM.findall(text):
+        prefix = term.endswith('*')
+        term = term.rstrip('*')
+        if term:
+            terms.append(f'"{term}"*' if prefix else f'"{term}"')
+    return ' '.join(terms)
+
+
+def filter_queryset(queryset, text: str):
+    """Restrict an EmailMessage queryset to the emails matching text (no ranking)"""
+    if connection.vendor == 'sqlite':
+        match = fts5_query(text)
+        if not match:
+            return queryset.none()
+        return queryset.extra(
+            where=[f'"email_analyzer_emailmessage"."id" IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'],
+            params=[match]
+        )
+    if connection.vendor == 'postgresql':
+        return queryset.extra(
+            where=[f"search_vector @@ websearch_to_tsquery('{POSTGRES_CONFIG}', %s)"],
+            params=[text]
+        )
+    # Corpos comprimidos não podem ser filtrados pelo banco
+    for term in text.split():
+        queryset = queryset.filter(Q(subject__icontains=term) | Q(sender__icontains=term))
+    return queryset
+
+
+def _sqlite_hits(text: str, offset: int, limit: int, order: str) -> List[Hit]:
+    match = fts5_query(text)
+    if not match:
+        return []
+    score = f'bm25({FTS_TABLE}, {_SQLITE_WEIGHTS})'
+    params = [_START, _STOP, match]
+    if order == 'relevance':
+        # Só os SEARCH_RANK_WINDOW resultados mais recentes são ranqueados: um termo
+        # comum casaria com milhões de linhas e o bm25 seria calculado para todas
+        where = (f"AND rowid >= coalesce((SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                 f"ORDER BY rowid DESC LIMIT 1 OFFSET %s), 0)")
+        order_by = score
+        params += [match, config.SEARCH_RANK_WINDOW - 1]
+    else:
+        # Em ordem de rowid o FTS5 para depois de `limit` resultados
+        where, order_by = '', 'rowid DESC'
+    sql = (
+        f"SELECT rowid, -{score}, snippet({FTS_TABLE}, 2, %s, %s, '…', 16) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s {where} ORDER BY {order_by} LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit, offset])
+        return cursor.fetchall()
+
+
+def _postgres_hits(text: str, offset: int, limit: int, order: str) -> List[Hit]:
+    params = [text]
+    if order == 'relevance':
+        # Mesma janela de ranqueamento do SQLite
+        where = ("AND id >= coalesce((SELECT id FROM email_analyzer_emailmessage WHERE search_vector @@ query "
+                 "ORDER BY id DESC LIMIT 1 OFFSET %s), 0)")
+        order_by = 'score DESC, id DESC'
+        params.append(config.SEARCH_RANK_WINDOW - 1)
+    else:
+        where, order_by = '', 'id DESC'
+    sql = (
+        f"SELECT id, ts_rank_cd(search_vector, query) AS score"
+        f" FROM email_analyzer_emailmessage, websearch_to_tsquery('{POSTGRES_CONFIG}', %s) query"
+        f" WHERE search_vector @@ query {where} ORDER BY {order_by} LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit, offset])
+        ranked = cursor.fetchall()
+        if not ranked:
+            return []
+        # ts_headline só nos corpos da página, descomprimidos aqui
+        emails = EmailMessage.objects.select_related('content_body').in_bulk([pk for pk, _ in ranked])
+        contents = [emails[pk].content[:20000] if pk in emails else '' for pk, _ in ranked]
+        cursor.execute(
+            f"SELECT ts_headline('{POSTGRES_CONFIG}', body, websearch_to_tsquery('{POSTGRES_CONFIG}', %s), %s)"
+            f" FROM unnest(%s::text[]) WITH ORDINALITY AS page(body, position) ORDER BY position",
+            [text, f'StartSel={_START}, StopSel={_STOP}, MaxWords=24, MinWords=8', contents]
+        )
+        snippets = [row[0] for row in cursor.fetchall()]
+    return [(pk, score, snippet) for (pk, score), snippet in zip(ranked, snippets)]
+
+
+def _fallback_hits(text: str, offset: int, limit: int, order: str) -> List[Hit]:
+    emails = filter_queryset(EmailMessage.objects.order_by('-id'), text)
+    return [(email.pk, 0.0, email.content[:200]) for email in emails.with_bodies()[offset:offset + limit]]
+
+
+def update_index(emails: Iterable[EmailMessage]) -> None:
+    """Write the Postgres search_vector of saved emails (SQLite triggers do it themselves)"""
+    if connection.vendor != 'postgresql':
+        return
+    rows = [(email.subject, email.sender, email.content, email.pk) for email in emails if email.pk]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE email_analyzer_emailmessage SET search_vector = "
+            f"setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce(%s, '')), 'A') || "
+            f"setweight(to_tsvector('simple', coalesce(%s, '')), 'B') || "
+            f"setweight(to_tsvector('{POSTGRES_CONFIG}', left(coalesce(%s, ''), 200000)), 'D') "
+            f"WHERE id = %s",
+            rows
+        )
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def search(text: str, page: int = 1, page_size: Optional[int] = None, order: str = 'relevance') -> Dict[str, Any]:
+    """Ranked page of emails matching text, with an HTML-safe snippet of the content"""
+    # Um LIMIT negativo no SQLite não limita nada
+    page_size = max(1, min(page_size or config.SEARCH_PAGE_SIZE, config.SEARCH_MAX_PAGE_SIZE))
+    page = max(page, 1)
+    finder = {'sqlite': _sqlite_hits, 'postgresql': _postgres_hits}.get(connection.vendor, _fallback_hits)
+    # Uma linha a mais diz se há próxima página sem contar todos os resultados
+    hits = finder(text, (page - 1) * page_size, page_size + 1, order)
+    has_next = len(hits) > page_size
+    hits = hits[:page_size]
+
+    emails = EmailMessage.objects.defer('last_error').in_bulk([h[0] for h in hits])
+    results = []
+    for pk, score, snippet in hits:
+        email = emails.get(pk)
+        if email is None:
+            continue
+        results.append({
+            'id': email.id,
+            'subject': email.subject,
+            'sender': email.sender,
+            'category': email.category,
+            'confidence_score': email.confidence_score,
+            'received_date': email.received_date.isoformat(),
+            'score': round(float(score), 4),
+            'snippet': _highlight(snippet or '')
+        })
+    return {'query': text, 'order': order, 'page': page, 'page_size': page_size,
+            'has_next': has_next, 'results': results}
@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+import config
+from .models import EmailMessage
+from .near_duplicates import index_email
+from .rollups import record_change, rollup_key
+from .search import update_index
+
+_ROLLUP_FIELDS = {'is_processed', 'category', 'received_date', 'confidence_score'}
+_UNKNOWN = object()
+
+
+@receiver(post_save, sender=EmailMessage)
+def update_fingerprint(sender, instance, raw=False, **kwargs):
+    """Keep the near-duplicate index in step with every saved email"""
+    if config.NEAR_DUPLICATE_ENABLED and not raw:
+        index_email(instance)
+
+
+@receiver(post_save, sender=EmailMessage)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_index([instance])
+
+
+@receiver(post_init, sender=EmailMessage)
+def remember_rollup_key(sender, instance, **kwargs):
+    """Remember which rollup cell a loaded email counts towards"""
+    if instance.get_deferred_fields() & _ROLLUP_FIELDS:
+        # Ler um campo adiado aqui faria uma consulta por instância
+        instance._rollup_key = _UNKNOWN
+    else:
+        instance._rollup_key = rollup_key(instance) if instance.pk else None
+
+
+@receiver(pre_save, sender=EmailMessage)
+def load_rollup_key(sender, instance, raw=False, **kwargs):
+    if getattr(instance, '_rollup_key', None) is _UNKNOWN:
+        previous = EmailMessage.objects.filter(pk=instance.pk).first()
+        instance._rollup_key = rollup_key(previous) if previous else None
+
+
+@receiver(post_save, sender=EmailMessage)
+def update_rollup(sender, instance, raw=False, **kwargs):
+    """Move the email between rollup cells when its classification changes"""
+    if raw:
+        return
+    new_key = rollup_key(instance)
+    record_change(getattr(instance, '_rollup_key', None), new_key)
+    instance._rollup_key = new_key
+
+
+@receiver(post_delete, sender=EmailMessage)
+def remove_from_rollup(sender, instance, **kwargs):
+    old_key = getattr(instance, '_rollup_key', None)
+    if old_key is _UNKNOWN:
+        old_key = rollup_key(instance)
+    record_change(old_key, None)
@@ -1,6 +1,63 @@
-from django.test import TestCase, Client
+import base64
+import gc
+import io
+import json
+import mailbox
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import weakref
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, Client, override_settings
 from django.utils import timezone
-from .models import LogMessage
+from .models import LogMessage, EmailBody, EmailMessage, EmailFingerprint, EmailDailyRollup
+from . import artifacts, body_store, metrics, profiling, rollups, search, warmup
+from .forms import EmailMessageForm
+from . import registry
+from .batching import MicroBatcher, _Request
+from .bulk import BulkFormatError, iter_records
+from .backends import InferenceBackend, check_parity, process_memory_mb
+from .cache import ClassificationCache
+from .chunking import plan_windows, aggregate_scores
+from .concurrency import InFlightLimiter
+from .extraction import extract_body, extract_content
+from .keywords import get_matcher
+from .work_queue import claim_batch, complete, enqueue, fail, process_next_batch, queue_stats
+from .near_duplicates import NearDuplicateIndex, simhash, similarity
+from . import mail_import
+from .mail_import import iter_raw_messages, parse_message
+from .nlp_processor import EmailProcessor, preprocess_text
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def load_example(name):
+    return (BASE_DIR / f"exemplo_email_{name}.txt").read_text(encoding='utf-8')
+
+
+def fake_classifier(texts, **kwargs):
+    """Mimic the pipeline output for a single text or a list of texts"""
+    if isinstance(texts, str):
+        texts = [texts]
+    return [{'label': '1 star', 'score': 0.9} for _ in texts]
+
+
+def fake_backend(*args, **kwargs):
+    """Stand-in for load_backend that never touches the network"""
+    return fake_classifier
 
 class TestLogMessageModel(TestCase):
 
@@ -29,4 +86,1575 @@ class TestViews(TestCase):
         response = self.client.get('/a-url-that-does-not-exist')
 
         self.assertEquals(response.status_code, 404)
- 
\ No newline at end of file
+
+
+class TestProcessorRegistry(TestCase):
+
+    def setUp(self):
+        registry.dispose_processor()
+        patcher = mock.patch('email_analyzer.nlp_processor.load_backend', side_effect=fake_backend)
+        self.load_backend = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(registry.dispose_processor)
+
+    def test_model_loads_once(self):
+        first = registry.get_processor()
+        second = registry.get_processor()
+
+        self.assertIs(first, second)
+        self.assertEqual(self.load_backend.call_count, 1)
+
+    def test_model_loads_once_under_concurrency(self):
+        processors = []
+        threads = [
+            threading.Thread(target=lambda: processors.append(registry.get_processor()))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(p) for p in processors}), 1)
+        self.assertEqual(self.load_backend.call_count, 1)
+
+    def test_reload_and_dispose(self):
+        first = registry.get_processor()
+        reloaded = registry.reload_processor()
+
+        self.assertIsNot(first, reloaded)
+        self.assertIsNotNone(first.classifier)
+        self.assertIs(registry.get_processor(), reloaded)
+        self.assertEqual(self.load_backend.call_count, 2)
+
+        registry.dispose_processor()
+        self.assertFalse(registry.is_loaded())
+        self.assertIsNone(reloaded.classifier)
+
+    def test_reload_while_classifying(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_classifier(texts, **kwargs):
+            started.set()
+            release.wait(5)
+            return fake_classifier(texts)
+
+        self.load_backend.side_effect = lambda *args: slow_classifier
+        results = []
+        with mock.patch('config.BATCH_INFERENCE_ENABLED', True), mock.patch('config.BATCH_MAX_WAIT_MS', 1):
+            first = registry.get_processor()
+            thread = threading.Thread(
+                target=lambda: results.append(first.classify_email('Corrente', 'sorte ' * 50))
+            )
+            thread.start()
+            self.assertTrue(started.wait(5))
+
+            registry.reload_processor()
+            release.set()
+            thread.join(5)
+            # Quem ainda segura o processador antigo continua sendo atendido
+            results.append(first.classify_email('Corrente', 'azar ' * 50))
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(category in ('produtivo', 'improdutivo') for category, _ in results))
+
+        # Sem referências, o processador antigo é coletado e a thread do batcher termina
+        batcher_thread = first.batcher._thread
+        processor = weakref.ref(first)
+        del first
+        gc.collect()
+        batcher_thread.join(5)
+        self.assertIsNone(processor())
+        self.assertFalse(batcher_thread.is_alive())
+
+    def test_api_reuses_shared_processor(self):
+        client = Client()
+        payload = json.dumps({
+            'subject': 'Reunião de projeto',
+            'content': 'Precisamos agendar uma reunião com o cliente.',
+            'sender': 'gerente@empresa.com',
+        })
+        for _ in range(3):
+            response = client.post('/api/email/process/', payload, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.load_backend.call_count, 1)
+        self.assertEqual(EmailMessage.objects.count(), 3)
+
+    def test_preload_only_when_enabled(self):
+        with mock.patch('config.PRELOAD_MODEL', False):
+            registry.preload()
+        self.assertFalse(registry.is_loaded())
+
+        with mock.patch('config.PRELOAD_MODEL', True):
+            registry.preload()
+        self.assertTrue(registry.is_loaded())
+        self.assertEqual(self.load_backend.call_count, 1)
+
+    def test_management_commands_skip_model_and_heavy_imports(self):
+        # Processo novo: nesta suíte outros testes já podem ter importado tudo
+        code = (
+            "import sys, django; django.setup()\n"
+            "from django.core.management import call_command\n"
+            "call_command('check', verbosity=0)\n"
+            "import web_django.urls\n"
+            "from email_analyzer import registry\n"
+            "print(registry.is_loaded(), sorted({'transformers', 'torch'} & set(sys.modules)))\n"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='web_django.settings', PRELOAD_MODEL='true')
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, timeout=120)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'False []')
+
+
+class TestMicroBatcher(TestCase):
+
+    def setUp(self):
+        self.batches = []
+
+        def predict_batch(texts):
+            self.batches.append(list(texts))
+            return [{'label': text, 'score': 1.0} for text in texts]
+
+        self.batcher = MicroBatcher(predict_batch, max_batch_size=8, max_wait_ms=200)
+        self.addCleanup(self.batcher.close)
+
+    def test_concurrent_calls_share_a_batch(self):
+        results = {}
+        barrier = threading.Barrier(8)
+
+        def call(i):
+            barrier.wait()
+            results[i] = self.batcher.submit(f"email {i}", timeout=5)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Cada chamador recebe o seu próprio resultado
+        self.assertEqual({i: r['label'] for i, r in results.items()},
+                         {i: f"email {i}" for i in range(8)})
+        self.assertLess(len(self.batches), 8)
+
+        stats = self.batcher.stats()
+        self.assertEqual(stats['total_items'], 8)
+        self.assertGreater(stats['avg_batch_size'], 1)
+        self.assertGreaterEqual(stats['latency_ms']['p99'], stats['latency_ms']['p50'])
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "requires os.fork")
+    def test_forked_worker_gets_its_own_thread(self):
+        # A thread iniciada no master (gunicorn com preload) não existe no worker
+        self.batcher.submit('master', timeout=5)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.write(write_fd, self.batcher.submit('worker', timeout=5)['label'].encode())
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            output = pipe.read()
+        os.waitpid(pid, 0)
+
+        self.assertEqual(output, 'worker')
+
+    def test_groups_inputs_of_similar_length(self):
+        self.batcher.max_length_ratio = 2.0
+        requests = ['a' * 10, 'b' * 500, 'c' * 12, 'd' * 450]
+        groups = self.batcher._group_by_length(
+            [type('R', (), {'text': text})() for text in requests]
+        )
+
+        self.assertEqual([[r.text[0] for r in group] for group in groups],
+                         [['a', 'c'], ['d', 'b']])
+
+    def test_errors_reach_every_caller(self):
+        batcher = MicroBatcher(mock.Mock(side_effect=RuntimeError("boom")), max_wait_ms=1)
+        self.addCleanup(batcher.close)
+
+        with self.assertRaises(RuntimeError):
+            batcher.submit("texto", timeout=5)
+
+    def test_no_request_is_left_waiting(self):
+        # Menos resultados que textos: todos os chamadores do grupo recebem o erro
+        short = MicroBatcher(lambda texts: [], max_wait_ms=1)
+        self.addCleanup(short.close)
+        with self.assertRaisesRegex(RuntimeError, '0 results for 1 texts'):
+            short.submit("texto", timeout=5)
+
+        # Um modelo travado não prende a requisição para sempre
+        release = threading.Event()
+        stuck = MicroBatcher(lambda texts: release.wait(5) and [], max_wait_ms=1, timeout=0.05)
+        self.addCleanup(stuck.close)
+        self.addCleanup(release.set)
+        with self.assertRaises(TimeoutError):
+            stuck.submit("texto")
+
+    def test_close_fails_pending_and_rejects_new_requests(self):
+        pending = _Request("na fila")
+        self.batcher._queue.put(pending)
+        self.batcher.close()
+
+        self.assertIsInstance(pending.future.exception(timeout=1), RuntimeError)
+        with self.assertRaisesRegex(RuntimeError, 'closed'):
+            self.batcher.submit("depois", timeout=1)
+        self.assertIsNone(self.batcher._thread)
+
+
+class TestKeywordMatcher(TestCase):
+
+    def setUp(self):
+        self.matcher = get_matcher()
+        self.processor = EmailProcessor(load_model=False)
+
+    def test_single_pass_matches_str_count(self):
+        rng = random.Random(7)
+        pieces = self.matcher.patterns + ['network', 'a', ' ', '\n', 'sorte sorte', 'agendagenda']
+        for _ in range(200):
+            text = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+            hits = self.matcher.scan(text)
+            for word in self.matcher.patterns:
+                self.assertEqual(word in hits, word in text, (word, text))
+                self.assertEqual(hits.count(word), text.count(word), (word, text))
+
+    def test_scores_unchanged_for_examples(self):
+        # Valores obtidos com a implementação anterior (varreduras por palavra)
+        expected = {
+            'produtivo': (('produtivo', 1.0), 1.0, 0.54),
+            'neutro': (('produtivo', 0.8049999999999999), 0.885, 0.6360000000000001),
+            'improdutivo': (('improdutivo', 0.7849999999999999), 0.5700000000000001, 0.865),
+        }
+        for name, (classification, productive, unproductive) in expected.items():
+            text = self.processor.preprocess_text(load_example(name))
+            self.assertEqual(self.processor._keyword_based_classification(text), classification)
+            self.assertEqual(self.processor._calculate_enhanced_confidence(0.9, text, 'produtivo'), productive)
+            self.assertEqual(self.processor._calculate_enhanced_confidence(0.9, text, 'improdutivo'), unproductive)
+
+    def test_raw_text_first_line_and_structure(self):
+        raw = "Reunião de Planejamento\n- objetivos: metas Q1 2024\nPrezados, a equipe ✨"
+
+        self.assertEqual(self.processor._calculate_keyword_factor(raw, 'produtivo'), 0.95)
+        self.assertEqual(self.processor._calculate_structure_factor(raw, 'produtivo'), 0.85)
+        self.assertEqual(self.processor._apply_productive_boost(0.5, raw), 0.6)
+
+
+class TestBatchScoring(TestCase):
+
+    def setUp(self):
+        self.processor = EmailProcessor(load_model=False)
+        rng = random.Random(11)
+        pieces = get_matcher().patterns + ['texto', 'Prezados', '- item', ':', '\n']
+        self.texts = [load_example(name) for name in ('produtivo', 'neutro', 'improdutivo')] + ['']
+        self.texts += [' '.join(rng.choice(pieces) for _ in range(rng.randint(0, 80))) for _ in range(150)]
+
+    def test_keyword_path_matches_scalar(self):
+        scores = self.processor.score_batch(self.texts)
+
+        for text, category, confidence in zip(self.texts, scores['categories'], scores['confidences']):
+            expected = self.processor._keyword_based_classification(self.processor.preprocess_text(text))
+            self.assertEqual(category, expected[0])
+            self.assertAlmostEqual(confidence, expected[1], places=9)
+
+    def test_model_scores_match_scalar(self):
+        rng = random.Random(3)
+        bases = [rng.random() for _ in self.texts]
+        categories = [rng.choice(['produtivo', 'improdutivo']) for _ in self.texts]
+        scores = self.processor.score_batch(self.texts, base_confidences=bases, categories=categories)
+
+        for text, base, category, confidence in zip(self.texts, bases, categories, scores['confidences']):
+            processed = self.processor.preprocess_text(text)
+            expected = self.processor._calculate_enhanced_confidence(base, processed, category)
+            self.assertAlmostEqual(confidence, expected, places=9)
+        self.assertEqual(scores['features'].shape[0], len(self.texts))
+
+
+class FakeTokenizer:
+    """One token per word, enough to exercise the window planning"""
+
+    def __call__(self, text, add_special_tokens=True):
+        return {'input_ids': list(range(len(text.split())))}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+class TestLongEmailChunking(TestCase):
+
+    def test_windows_overlap_and_cover_the_email(self):
+        windows = plan_windows(list(range(1000)), window_size=510, overlap=64, max_windows=8)
+
+        self.assertEqual([w[0] for w in windows], [0, 446, 490])
+        self.assertEqual(windows[-1][-1], 999)
+        self.assertTrue(all(len(w) <= 510 for w in windows))
+
+    def test_window_cap_spreads_over_the_email(self):
+        windows = plan_windows(list(range(10000)), window_size=100, overlap=0, max_windows=4)
+
+        self.assertEqual(len(windows), 4)
+        self.assertEqual(windows[0][0], 0)
+        self.assertEqual(windows[-1][-1], 9999)
+
+    def test_aggregation_strategies(self):
+        scores = [[0.8, 0.2], [0.2, 0.8], [0.2, 0.8]]
+
+        self.assertAlmostEqual(aggregate_scores(scores, 'mean')[1], 0.6)
+        self.assertAlmostEqual(aggregate_scores(scores, 'max')[0], 0.5)
+        self.assertGreater(aggregate_scores(scores, 'position')[0], aggregate_scores(scores, 'mean')[0])
+        with self.assertRaises(ValueError):
+            aggregate_scores(scores, 'median')
+
+    def test_long_email_runs_windows_in_one_batch(self):
+        processor = EmailProcessor(load_model=False)
+        processor.classifier = mock.Mock(side_effect=fake_classifier)
+        processor.classifier.tokenizer = FakeTokenizer()
+        processor.classifier.id2label = {0: '1 star', 1: '5 stars'}
+        processor._predict_windows = mock.Mock(
+            side_effect=lambda windows: [[0.1, 0.9] for _ in windows]
+        )
+
+        with mock.patch('config.LONG_EMAIL_MAX_WINDOWS', 3):
+            category, _ = processor.classify_email('Corrente', 'sorte ' * 5000)
+
+        self.assertEqual(category, 'improdutivo')
+        processor._predict_windows.assert_called_once()
+        self.assertEqual(len(processor._predict_windows.call_args[0][0]), 3)
+        processor.classifier.assert_not_called()
+
+
+class TestClassificationCache(TestCase):
+
+    def test_identical_bodies_are_classified_once(self):
+        processor = EmailProcessor(load_model=False, cache=ClassificationCache(max_entries=10))
+        processor._classify_with_tier = mock.Mock(return_value=('improdutivo', 0.8, 'fallback'))
+
+        for _ in range(3):
+            result = processor.process_email('Corrente', 'Reencaminhe  para 10 amigos!', 'a@b.com')
+        # Mesmo texto normalizado: pontuação e maiúsculas não mudam a chave
+        processor.process_email('CORRENTE!', 'reencaminhe para amigos', 'c@d.com')
+
+        self.assertEqual(result['category'], 'improdutivo')
+        self.assertEqual(processor._classify_with_tier.call_count, 1)
+        self.assertEqual(processor.cache.stats()['hits'], 3)
+        self.assertEqual(processor.cache.stats()['misses'], 1)
+
+    def test_lru_eviction_and_ttl(self):
+        cache = ClassificationCache(max_entries=2, ttl=60)
+        cache.set('a', {'v': 1})
+        cache.set('b', {'v': 2})
+        cache.get('a')
+        cache.set('c', {'v': 3})
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'v': 1})
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        with mock.patch('email_analyzer.cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a'))
+
+    def test_model_version_is_part_of_the_key(self):
+        self.assertNotEqual(
+            ClassificationCache.make_key('texto', 'modelo-a|rules-1'),
+            ClassificationCache.make_key('texto', 'modelo-b|rules-1'),
+        )
+
+    def test_settings_that_change_results_change_the_version(self):
+        processor = EmailProcessor(load_model=False)
+        processor.classifier = mock.Mock(side_effect=fake_classifier)
+        versions = {processor.model_version}
+        for setting, value in (('LONG_EMAIL_MODE', False), ('LONG_EMAIL_OVERLAP', 32),
+                               ('LONG_EMAIL_MAX_WINDOWS', 2), ('LONG_EMAIL_AGGREGATION', 'max'),
+                               ('MODEL_MAX_LENGTH', 128), ('BODY_EXTRACTION_ENABLED', False),
+                               ('MAX_EMAIL_LENGTH', 500), ('CASCADE_ENABLED', True)):
+            with mock.patch(f'config.{setting}', value):
+                versions.add(processor.model_version)
+        self.assertEqual(len(versions), 9)
+
+    def test_shared_tier_serves_other_workers(self):
+        worker_a = ClassificationCache(shared_alias='default')
+        worker_b = ClassificationCache(shared_alias='default')
+        worker_a.set('chave', {'category': 'produtivo'})
+
+        self.assertEqual(worker_b.get('chave'), {'category': 'produtivo'})
+        self.assertEqual(worker_b.stats()['shared_hits'], 1)
+
+
+class TestCascadeClassification(TestCase):
+    DECISIVE = ('Reunião do projeto amanhã: revisar o relatório, prazo do contrato e orçamento. '
+                'Atenciosamente, equipe')
+
+    def setUp(self):
+        self.classifier = mock.Mock(side_effect=fake_classifier)
+        self.processor = EmailProcessor(load_model=False)
+        self.processor.classifier = self.classifier
+
+    def test_decisive_keywords_skip_the_model(self):
+        with mock.patch('config.CASCADE_ENABLED', True), mock.patch('config.CASCADE_UPPER', 0.85):
+            result = self.processor.process_email('Projeto', self.DECISIVE, 'a@b.com')
+
+        self.assertEqual(result['decided_by'], 'keywords')
+        self.assertEqual(result['category'], 'produtivo')
+        self.classifier.assert_not_called()
+
+    def test_uncertain_emails_reach_the_model(self):
+        with mock.patch('config.CASCADE_ENABLED', True), mock.patch('config.CASCADE_UPPER', 0.85):
+            result = self.processor.process_email('Oi', 'tudo bem com voce hoje', 'a@b.com')
+
+        self.assertEqual(result['decided_by'], 'model')
+        self.classifier.assert_called_once()
+
+    def test_disabled_cascade_always_uses_the_model(self):
+        with mock.patch('config.CASCADE_ENABLED', False):
+            result = self.processor.process_email('Projeto', self.DECISIVE, 'a@b.com')
+
+        self.assertEqual(result['decided_by'], 'model')
+        stats = self.processor.tier_stats()
+        self.assertEqual(stats['counts'], {'model': 1})
+        self.assertEqual(stats['fast_path_share'], 0.0)
+
+
+class TestAsyncProcessingAPI(TestCase):
+    URL = '/api/email/process/async/'
+    PAYLOAD = json.dumps({'subject': 'Projeto', 'content': 'Reunião sobre o relatório', 'sender': 'a@b.com'})
+
+    def setUp(self):
+        registry.dispose_processor()
+        patcher = mock.patch('email_analyzer.nlp_processor.load_backend', side_effect=fake_backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(registry.dispose_processor)
+
+    def test_processes_and_saves_email(self):
+        response = self.client.post(self.URL, self.PAYLOAD, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['category'], 'produtivo')
+        self.assertTrue(EmailMessage.objects.filter(id=body['id'], is_processed=True).exists())
+
+    def test_missing_fields_and_method(self):
+        response = self.client.post(self.URL, json.dumps({'subject': 'x'}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.URL).status_code, 405)
+
+        # JSON válido que não é um objeto
+        for body in ('[1, 2]', '"texto"', 'null'):
+            response = self.client.post(self.URL, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(response.json()['error'], 'Missing required fields')
+
+    def test_rejects_when_in_flight_limit_reached(self):
+        with mock.patch('email_analyzer.views.api_limiter', InFlightLimiter(0)):
+            response = self.client.post(self.URL, self.PAYLOAD, content_type='application/json')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(EmailMessage.objects.count(), 0)
+
+    def test_times_out_slow_inference(self):
+        def slow_process(*args):
+            time.sleep(0.5)
+
+        with mock.patch('email_analyzer.views._process_with_shared_processor', slow_process), \
+                mock.patch('config.API_TIMEOUT', 0.05):
+            response = self.client.post(self.URL, self.PAYLOAD, content_type='application/json')
+
+        self.assertEqual(response.status_code, 504)
+
+
+class TestBulkProcessingAPI(TestCase):
+    URL = '/api/email/process/bulk/'
+
+    def setUp(self):
+        registry.dispose_processor()
+        self.classifier = mock.Mock(side_effect=fake_classifier)
+        patcher = mock.patch('email_analyzer.nlp_processor.load_backend', return_value=self.classifier)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(registry.dispose_processor)
+
+    def records(self, n):
+        return [{'subject': f'Projeto {i}', 'content': f'Relatório número {"x" * i}', 'sender': 'a@b.com'}
+                for i in range(n)]
+
+    def test_json_array_is_parsed_incrementally(self):
+        records = self.records(5) + [{'subject': 'ção', 'content': 'ü' * 50, 'sender': 'é'}]
+        body = io.BytesIO(json.dumps(records, ensure_ascii=False).encode('utf-8'))
+
+        self.assertEqual(list(iter_records(body, chunk_size=7)), records)
+
+    def test_long_records_are_decoded_once(self):
+        # Chaves, colchetes e aspas escapadas dentro de strings não fecham o elemento
+        records = [{'subject': 'a"}]{', 'content': 'corpo ' * 20000 + '\\', 'sender': 'b'}, [1, {'c': []}], 42]
+        body = io.StringIO(json.dumps(records))
+
+        with mock.patch('json.JSONDecoder.raw_decode', autospec=True,
+                        side_effect=json.JSONDecoder.raw_decode) as raw_decode:
+            self.assertEqual(list(iter_records(body, chunk_size=64)), records)
+        self.assertEqual(raw_decode.call_count, len(records))
+
+    def test_malformed_input_becomes_error_records(self):
+        ndjson = io.StringIO('{"a": 1}\nnot json\n\n{"b": 2}')
+        parsed = list(iter_records(ndjson, chunk_size=4))
+        self.assertEqual(parsed[0], {'a': 1})
+        self.assertIsInstance(parsed[1], BulkFormatError)
+        self.assertEqual(parsed[2], {'b': 2})
+
+        broken = list(iter_records(io.StringIO('[{"a": 1}, {"b": '), chunk_size=4))
+        self.assertEqual(broken[0], {'a': 1})
+        self.assertIsInstance(broken[-1], BulkFormatError)
+
+    def test_oversized_record_is_not_buffered(self):
+        # Elemento quebrado no começo de um corpo grande: para sem ler o resto
+        body = io.StringIO('[{"a": 1}, {"b": ' + 'x' * 100000 + ']')
+        parsed = list(iter_records(body, chunk_size=16, max_record_size=100))
+        self.assertEqual(parsed[0], {'a': 1})
+        self.assertIn('larger than 100', str(parsed[-1]))
+        self.assertLess(body.tell(), 1000)
+
+        # Em NDJSON a linha grande é pulada e as seguintes continuam valendo
+        ndjson = io.StringIO('{"a": 1}\n' + 'y' * 5000 + '\n{"b": 2}\n')
+        parsed = list(iter_records(ndjson, chunk_size=16, max_record_size=100))
+        self.assertEqual(parsed[0], {'a': 1})
+        self.assertIsInstance(parsed[1], BulkFormatError)
+        self.assertEqual(parsed[2:], [{'b': 2}])
+
+    def test_streams_results_and_persists_in_batches(self):
+        body = '\n'.join(json.dumps(record) for record in self.records(70))
+        body += '\n{"subject": "sem corpo"}\n'
+
+        with mock.patch('config.BULK_BATCH_SIZE', 32):
+            response = self.client.post(self.URL, body, content_type='application/x-ndjson')
+            lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([line['index'] for line in lines], list(range(71)))
+        self.assertEqual(lines[-1]['error'], 'Missing required fields')
+        self.assertEqual(EmailMessage.objects.count(), 70)
+        self.assertTrue(EmailMessage.objects.filter(id=lines[0]['id'], subject='Projeto 0').exists())
+        # 70 emails em lotes de 32: três chamadas ao modelo
+        self.assertEqual(self.classifier.call_count, 3)
+
+
+MBOX = b"""From a@b.com Mon Jan  1 00:00:00 2024
+From: Gerente <gerente@empresa.com>
+Subject: Reuniao do projeto
+Date: Mon, 01 Jan 2024 10:00:00 +0000
+
+Precisamos revisar o relatorio.
+>From the archive: linha escapada
+
+From c@d.com Tue Jan  2 00:00:00 2024
+From: spam@promo.com
+Subject: Promocao
+Content-Type: text/html; charset=utf-8
+
+<p>Clique <b>aqui</b> e ganhe</p>
+"""
+
+EML = b"""From: cliente@cliente.com
+Subject: Contrato
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="X"
+
+--X
+Content-Type: text/plain; charset=utf-8
+
+Segue o contrato para assinatura.
+--X
+Content-Type: application/pdf
+Content-Transfer-Encoding: base64
+
+JVBERi0xLjQK
+--X--
+"""
+
+
+class TestMailImport(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        (self.root / 'caixa.mbox').write_bytes(MBOX)
+        (self.root / 'contrato.eml').write_bytes(EML)
+        maildir = mailbox.Maildir(self.root / 'Maildir')
+        maildir.add(b'From: x@y.com\nSubject: Oi\n\nCorpo do Maildir\n')
+
+    def import_mail(self, **options):
+        out = io.StringIO()
+        call_command('import_mail', str(self.root), workers=1, keywords_only=True, stdout=out, **options)
+        return out.getvalue()
+
+    def test_parses_mbox_messages(self):
+        messages = [parse_message(raw) for raw in iter_raw_messages('mbox', str(self.root / 'caixa.mbox'))]
+
+        self.assertEqual([m['subject'] for m in messages], ['Reuniao do projeto', 'Promocao'])
+        self.assertIn('From the archive', messages[0]['content'])
+        self.assertEqual(messages[0]['received_date'].year, 2024)
+        self.assertNotIn('<b>', messages[1]['content'])
+
+    def test_imports_every_source_once(self):
+        checkpoint = str(self.root / 'checkpoint.json')
+        output = self.import_mail(checkpoint=checkpoint)
+
+        self.assertIn('4 mensagens', output)
+        self.assertEqual(EmailMessage.objects.filter(is_processed=True).count(), 4)
+        contrato = EmailMessage.objects.get(subject='Contrato')
+        self.assertNotIn('JVBERi', contrato.content)
+
+        # Retomar com o mesmo checkpoint não duplica mensagens
+        self.import_mail(checkpoint=checkpoint)
+        self.assertEqual(EmailMessage.objects.count(), 4)
+
+    def test_maildir_checkpoint_survives_messages_moving_to_cur(self):
+        checkpoint = str(self.root / 'checkpoint.json')
+        self.import_mail(checkpoint=checkpoint)
+
+        # Chega uma mensagem e o cliente a lê (new/ -> cur/, flags no nome) antes da próxima execução
+        maildir = mailbox.Maildir(self.root / 'Maildir')
+        key = maildir.add(b'From: x@y.com\nSubject: Segunda\n\nOutra mensagem\n')
+        message = maildir.get_message(key)
+        message.set_subdir('cur')
+        message.add_flag('S')
+        maildir[key] = message
+        maildir.add(b'From: x@y.com\nSubject: Terceira\n\nChegou depois\n')
+        self.assertEqual(len(os.listdir(self.root / 'Maildir' / 'cur')), 1)
+        self.import_mail(checkpoint=checkpoint)
+
+        subjects = list(EmailMessage.objects.values_list('subject', flat=True))
+        self.assertEqual(len(subjects), 6)
+        for subject in ('Oi', 'Segunda', 'Terceira'):
+            self.assertEqual(subjects.count(subject), 1)
+
+    def test_workers_classify_without_touching_the_database(self):
+        EmailMessage.objects.create(subject='Contrato', content='Segue o contrato para assinatura.',
+                                    sender='a@b.com', category='produtivo', is_processed=True)
+        with mock.patch('email_analyzer.nlp_processor.load_backend', side_effect=fake_backend), \
+                mock.patch('config.NEAR_DUPLICATE_ENABLED', True):
+            mail_import._init_worker(load_model=True)
+            with CaptureQueriesContext(connection) as queries:
+                parsed = mail_import.classify_chunk([('eml', 0, EML)])
+
+        self.assertEqual(len(queries), 0)
+        self.assertTrue(parsed[0][2]['is_processed'])
+
+
+class TestBodyExtraction(TestCase):
+
+    def test_skips_attachments_and_prefers_plain_text(self):
+        body = extract_body(EML)
+        self.assertEqual(body, 'Segue o contrato para assinatura.')
+
+    def test_html_is_converted_without_quoted_history(self):
+        raw = (
+            b'Content-Type: text/html; charset=utf-8\nContent-Transfer-Encoding: quoted-printable\n\n'
+            b'<html><style>p {color: red}</style><p>Reuni=C3=A3o &amp; relat=\n'
+            b'=C3=B3rio</p><div class=3D"gmail_quote"><p>mensagem antiga</p></div></html>\n'
+        )
+        self.assertEqual(extract_body(raw), 'Reunião & relatório')
+
+    def test_base64_text_and_reply_cut(self):
+        text = 'Novo texto\n\nOn Mon, Jan 1, 2024 at 10:00 Ana <ana@x.com> wrote:\n> antigo\n'
+        raw = (b'Content-Type: text/plain; charset=utf-8\nContent-Transfer-Encoding: base64\n\n'
+               + base64.encodebytes(text.encode('utf-8')))
+        self.assertEqual(extract_body(raw), 'Novo texto')
+
+    def test_plain_content_loses_quotes_signature_and_excess(self):
+        content = 'Oi equipe\n> citado\nsegue o prazo\n-- \nFulano\nTel 123'
+        self.assertEqual(extract_content(content), 'Oi equipe\nsegue o prazo')
+        self.assertEqual(extract_content('Pauta\n--\nItem 1: orçamento'), 'Pauta\n--\nItem 1: orçamento')
+        self.assertEqual(len(extract_content('a' * 50000, max_length=100)), 100)
+
+    def test_processor_classifies_extracted_text(self):
+        processor = EmailProcessor(load_model=False)
+        attachment = 'UEsDBBQ' * 200000
+        raw = EML.decode('ascii').replace('JVBERi0xLjQK', attachment)
+        with mock.patch.object(processor, 'preprocess_text', wraps=processor.preprocess_text) as preprocess:
+            processor.process_email('Contrato', raw, 'a@b.com')
+        self.assertLess(len(preprocess.call_args[0][0]), 100)
+
+
+class TestNearDuplicates(TestCase):
+
+    def setUp(self):
+        self.chain = load_example('improdutivo')
+        # Cópia levemente alterada, como as variações de uma corrente
+        self.variant = self.chain + ' Obrigado!'
+        patcher = mock.patch('config.NEAR_DUPLICATE_ENABLED', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_similar_texts_have_close_fingerprints(self):
+        original = simhash(preprocess_text(self.chain))
+        self.assertGreaterEqual(similarity(original, simhash(preprocess_text(self.variant))), 0.95)
+        self.assertLess(similarity(original, simhash(preprocess_text(load_example('produtivo')))), 0.8)
+
+    def test_saved_emails_are_indexed(self):
+        email = EmailMessage.objects.create(subject='Corrente', content=self.chain, sender='a@b.com',
+                                            category='improdutivo', is_processed=True)
+        EmailMessage.objects.create(subject='Rascunho', content='sem categoria', sender='a@b.com')
+
+        self.assertEqual(EmailFingerprint.objects.get().email_id, email.id)
+
+    def test_near_duplicate_reuses_stored_classification(self):
+        stored = EmailMessage.objects.create(subject='Corrente', content=self.chain, sender='a@b.com',
+                                             category='improdutivo', confidence_score=0.77, is_processed=True)
+        processor = EmailProcessor(load_model=False, near_duplicates=NearDuplicateIndex(threshold=0.95))
+        processor._classify_batch = mock.Mock()
+        processor._classify_with_tier = mock.Mock()
+
+        result = processor.process_email('Corrente', self.variant, 'c@d.com')
+
+        self.assertEqual(result['decided_by'], 'near-duplicate')
+        self.assertEqual(result['confidence_score'], 0.77)
+        self.assertEqual(result['near_duplicate']['email_id'], stored.id)
+        self.assertGreaterEqual(result['near_duplicate']['similarity'], 0.95)
+        processor._classify_with_tier.assert_not_called()
+
+    def test_newest_candidates_win(self):
+        emails = [EmailMessage.objects.create(subject='Corrente', content=self.chain, sender='a@b.com',
+                                              category='improdutivo', is_processed=True) for _ in range(3)]
+        fingerprint = simhash(preprocess_text(self.chain))
+
+        with mock.patch('config.NEAR_DUPLICATE_MAX_CANDIDATES', 1):
+            self.assertEqual(NearDuplicateIndex().find(fingerprint)['email_id'], emails[-1].id)
+        self.assertEqual(NearDuplicateIndex().find(fingerprint)['email_id'], emails[-1].id)
+
+    def test_threshold_boundary_of_the_band_layout(self):
+        stored = EmailMessage.objects.create(subject='Corrente', content=self.chain, sender='a@b.com',
+                                             category='improdutivo', is_processed=True)
+        fingerprint = EmailFingerprint.objects.get().simhash & ((1 << 64) - 1)
+        index = NearDuplicateIndex(threshold=61 / 64)
+
+        # 3 bits diferentes, em três faixas: a quarta coincide e o email é encontrado
+        three_bands = fingerprint ^ (1 << 0) ^ (1 << 16) ^ (1 << 32)
+        self.assertEqual(index.find(three_bands)['email_id'], stored.id)
+        self.assertEqual(index.find(three_bands)['similarity'], 61 / 64)
+        self.assertIsNone(index.find(three_bands ^ (1 << 48)))
+
+        # 60/64 aceitaria 4 bits diferentes, um por faixa, que o índice não encontra
+        for threshold in (60 / 64, 0.9, 1.5):
+            with self.assertRaises(ValueError):
+                NearDuplicateIndex(threshold=threshold)
+
+    def test_unrelated_email_is_classified_normally(self):
+        EmailMessage.objects.create(subject='Corrente', content=self.chain, sender='a@b.com',
+                                    category='improdutivo', is_processed=True)
+        processor = EmailProcessor(load_model=False, near_duplicates=NearDuplicateIndex())
+
+        result = processor.process_email('Projeto', load_example('produtivo'), 'c@d.com')
+
+        self.assertNotEqual(result['decided_by'], 'near-duplicate')
+        self.assertIsNone(result['near_duplicate'])
+
+
+class TestClassificationQueue(TestCase):
+
+    def setUp(self):
+        self.processor = EmailProcessor(load_model=False)
+
+    def test_submit_returns_status_url_and_worker_completes(self):
+        response = self.client.post('/api/email/submit/', json.dumps(
+            {'subject': 'Projeto', 'content': 'Reunião sobre o relatório', 'sender': 'a@b.com'}
+        ), content_type='application/json')
+
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual(body['status'], 'pending')
+        self.assertEqual(self.client.get(body['status_url']).json()['status'], 'pending')
+
+        self.assertEqual(process_next_batch(self.processor, 'w1'), 1)
+        status = self.client.get(body['status_url']).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['category'], 'produtivo')
+        self.assertEqual(self.client.get('/api/queue/stats/').json(),
+                         {'pending': 0, 'processing': 0, 'failed': 0, 'done': 1})
+
+    def test_submit_rejects_bad_payloads(self):
+        for body in ('[1, 2]', '{"subject": "Projeto"}'):
+            response = self.client.post('/api/email/submit/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(self.client.post('/api/email/submit/', '{', content_type='application/json').status_code, 400)
+        self.assertEqual(EmailMessage.objects.count(), 0)
+
+    def test_workers_claim_disjoint_batches_and_reclaim_stale_rows(self):
+        for i in range(5):
+            enqueue(f'Assunto {i}', 'conteúdo', 'a@b.com')
+
+        first = claim_batch('w1', 3)
+        second = claim_batch('w2', 3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({e.id for e in first} & {e.id for e in second})
+        self.assertEqual(claim_batch('w3', 3), [])
+
+        with mock.patch('config.QUEUE_CLAIM_TIMEOUT', -1):
+            self.assertEqual(len(claim_batch('w3', 10)), 5)
+
+    def test_stale_worker_does_not_overwrite_or_count_twice(self):
+        enqueue('Projeto', 'Reunião sobre o relatório', 'a@b.com')
+        stale = claim_batch('w1', 1)
+        with mock.patch('config.QUEUE_CLAIM_TIMEOUT', -1):
+            current = claim_batch('w2', 1)
+        results = self.processor.process_batch([(e.subject, e.content, e.sender) for e in current])
+
+        self.assertEqual(len(complete(current, results)), 1)
+        self.assertEqual(complete(stale, [dict(results[0], category='improdutivo')]), [])
+        fail(stale, 'tarde demais')
+
+        email = EmailMessage.objects.get()
+        self.assertEqual((email.category, email.last_error), ('produtivo', ''))
+        self.assertEqual(rollups.summarize()['productive'], 1)
+        self.assertEqual(rollups.summarize()['unproductive'], 0)
+
+    def test_failures_are_retried_then_marked_failed(self):
+        email = enqueue('Projeto', 'conteúdo', 'a@b.com')
+        self.processor.process_batch = mock.Mock(side_effect=RuntimeError('modelo indisponível'))
+
+        with mock.patch('config.QUEUE_MAX_ATTEMPTS', 2):
+            process_next_batch(self.processor, 'w1')
+            email.refresh_from_db()
+            self.assertEqual((email.queue_status, email.attempts), ('pending', 1))
+
+            process_next_batch(self.processor, 'w1')
+            email.refresh_from_db()
+            self.assertEqual(email.queue_status, 'failed')
+            self.assertEqual(email.last_error, 'modelo indisponível')
+            self.assertEqual(process_next_batch(self.processor, 'w1'), 0)
+            self.assertEqual(queue_stats()['failed'], 1)
+
+
+# Páginas renderizadas nos testes não dependem do collectstatic
+PLAIN_STATIC_FILES = override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+@PLAIN_STATIC_FILES
+class TestAnalyticsRollup(TestCase):
+
+    def create(self, category='produtivo', confidence=0.9, days_ago=0, **kwargs):
+        return EmailMessage.objects.create(
+            subject='Assunto', content='Conteúdo', sender='a@b.com', category=category,
+            confidence_score=confidence, is_processed=True,
+            received_date=timezone.now() - timezone.timedelta(days=days_ago), **kwargs
+        )
+
+    def cells(self):
+        return {(r.day, r.category, r.bucket): r.count for r in EmailDailyRollup.objects.filter(count__gt=0)}
+
+    def test_counts_follow_saves_reclassification_and_deletes(self):
+        email = self.create(confidence=0.9)
+        self.create(category='improdutivo', confidence=0.1)
+        EmailMessage.objects.create(subject='Pendente', content='x', sender='a@b.com')
+        self.assertEqual(rollups.summarize(), {'productive': 1, 'unproductive': 1, 'histogram': [1, 0, 0, 0, 1]})
+
+        email = EmailMessage.objects.defer('preview').get(pk=email.pk)
+        email.category, email.confidence_score = 'improdutivo', 0.5
+        email.save()
+        self.assertEqual(rollups.summarize(), {'productive': 0, 'unproductive': 2, 'histogram': [1, 0, 1, 0, 0]})
+
+        email.delete()
+        self.assertEqual(rollups.summarize()['unproductive'], 1)
+
+    def test_rebuild_matches_incremental_updates(self):
+        for i in range(12):
+            self.create(category='produtivo' if i % 3 else 'improdutivo', confidence=i / 12, days_ago=i % 4)
+        incremental = self.cells()
+
+        self.assertEqual(rollups.rebuild(), len(incremental))
+        self.assertEqual(self.cells(), incremental)
+
+    def test_migration_counts_existing_emails(self):
+        from importlib import import_module
+        from django.apps import apps
+        for i in range(12):
+            self.create(category='produtivo' if i % 3 else 'improdutivo', confidence=i / 12, days_ago=i % 4)
+        incremental = self.cells()
+        # Banco anterior à tabela de estatísticas: emails sem nenhuma célula
+        EmailDailyRollup.objects.all().delete()
+
+        migration = import_module('email_analyzer.migrations.0005_emaildailyrollup')
+        # Só a conexão do schema_editor é usada
+        migration.fill_rollup(apps, mock.Mock(connection=connection))
+
+        self.assertEqual(self.cells(), incremental)
+
+    def test_queue_completion_is_counted(self):
+        enqueue('Projeto', 'Reunião sobre o relatório', 'a@b.com')
+        process_next_batch(EmailProcessor(load_model=False), 'w1')
+        self.assertEqual(rollups.summarize()['productive'], 1)
+
+    def test_view_filters_by_range_with_constant_queries(self):
+        self.create(days_ago=0)
+        self.create(days_ago=40)
+        self.create(category='improdutivo', days_ago=100)
+
+        response = self.client.get('/email/analytics/?range=30')
+        self.assertEqual(response.context['total_emails'], 1)
+        self.assertEqual(self.client.get('/email/analytics/').context['total_emails'], 3)
+        start = (timezone.localdate() - timezone.timedelta(days=120)).isoformat()
+        end = (timezone.localdate() - timezone.timedelta(days=30)).isoformat()
+        response = self.client.get(f'/email/analytics/?start={start}&end={end}')
+        self.assertEqual((response.context['productive_emails'], response.context['unproductive_emails']), (1, 1))
+
+        with self.assertNumQueries(3):
+            self.client.get('/email/analytics/?range=90')
+        for _ in range(20):
+            self.create()
+        with self.assertNumQueries(3):
+            self.client.get('/email/analytics/?range=90')
+
+
+@PLAIN_STATIC_FILES
+class TestEmailList(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        # Pares com a mesma data testam o desempate pelo id
+        self.emails = [
+            EmailMessage.objects.create(
+                subject=f'Email {i}', content='Conteúdo longo ' * 50, sender=f'user{i % 3}@b.com',
+                category='produtivo' if i % 2 else 'improdutivo', confidence_score=i / 25,
+                suggested_response='Resposta', is_processed=True,
+                received_date=now - timezone.timedelta(minutes=i // 2)
+            )
+            for i in range(25)
+        ]
+
+    def walk(self, query=''):
+        pages, url = [], f'/email/list/?{query}'
+        while url:
+            response = self.client.get(url)
+            pages.append([email.pk for email in response.context['emails']])
+            cursor = response.context['next_cursor']
+            url = f'/email/list/?{query}&after={cursor}' if cursor else None
+        return pages
+
+    @mock.patch('config.EMAIL_LIST_PAGE_SIZE', 10)
+    def test_pages_cover_every_email_once_newest_first(self):
+        pages = self.walk()
+        ids = [pk for page in pages for pk in page]
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        expected = sorted(self.emails, key=lambda e: (e.received_date, e.pk), reverse=True)
+        self.assertEqual(ids, [e.pk for e in expected])
+
+        second = self.client.get(f"/email/list/?after={self.client.get('/email/list/').context['next_cursor']}")
+        back = self.client.get(f"/email/list/?before={second.context['previous_cursor']}")
+        self.assertEqual([e.pk for e in back.context['emails']], pages[0])
+        self.assertIsNone(back.context['previous_cursor'])
+
+    @mock.patch('config.EMAIL_LIST_PAGE_SIZE', 4)
+    def test_filters_are_applied_on_the_server(self):
+        ids = [pk for page in self.walk('category=produtivo&sender=user1@b.com&confidence=otimo') for pk in page]
+        expected = [e.pk for e in self.emails
+                    if e.category == 'produtivo' and e.sender == 'user1@b.com' and e.confidence_score >= 0.7]
+
+        self.assertEqual(sorted(ids), sorted(expected))
+        self.assertEqual(sum(map(len, self.walk('min_confidence=0.2&max_confidence=0.4'))), 5)
+
+        # Trecho do remetente ou do assunto, sem diferenciar maiúsculas
+        self.assertEqual(sum(map(len, self.walk('sender=USER1'))), 8)
+        self.assertEqual(sorted(pk for page in self.walk('sender=email%202') for pk in page),
+                         sorted(e.pk for e in self.emails if e.subject.startswith('Email 2')))
+
+    def test_list_defers_bodies_and_detail_api_returns_them(self):
+        response = self.client.get('/email/list/')
+        email = response.context['emails'][0]
+
+        self.assertEqual(email.get_deferred_fields(), {'last_error'})
+        self.assertFalse(EmailMessage.content_body.is_cached(email))
+        self.assertEqual(email.preview, ('Conteúdo longo ' * 50)[:100])
+        detail = self.client.get(f'/api/email/{email.pk}/').json()
+        self.assertEqual(detail['suggested_response'], 'Resposta')
+        self.assertEqual(self.client.get('/api/email/999999/').status_code, 404)
+
+    def test_malformed_cursor_starts_from_the_top(self):
+        response = self.client.get('/email/list/?after=not-a-cursor')
+        # Empate na data mais recente: o maior id vem primeiro
+        self.assertEqual(response.context['emails'][0].pk, self.emails[1].pk)
+
+
+@PLAIN_STATIC_FILES
+class TestEmailSearch(TestCase):
+
+    def create(self, subject, content, sender='cliente@empresa.com'):
+        return EmailMessage.objects.create(subject=subject, content=content, sender=sender)
+
+    def ids(self, text, **kwargs):
+        return [r['id'] for r in search.search(text, **kwargs)['results']]
+
+    def test_matches_subject_sender_and_content_ranked(self):
+        in_subject = self.create('Orçamento do projeto', 'Segue em anexo.')
+        in_content = self.create('Olá', 'Precisamos revisar o orçamento antes da reunião.')
+        by_sender = self.create('Oi', 'Tudo bem?', sender='financeiro@empresa.com')
+        self.create('Promoção', 'Descontos imperdíveis')
+
+        # Sem acento também encontra; o assunto pesa mais que o corpo
+        self.assertEqual(self.ids('orcamento'), [in_subject.pk, in_content.pk])
+        self.assertEqual(self.ids('financeiro@empresa.com'), [by_sender.pk])
+        self.assertEqual(self.ids('orçam*'), [in_subject.pk, in_content.pk])
+        self.assertEqual(self.ids('orçamento reunião'), [in_content.pk])
+        self.assertEqual(self.ids('"'), [])
+
+    def test_index_follows_updates_deletes_and_bulk_create(self):
+        email = self.create('Relatório', 'Versão inicial')
+        email.content = 'Versão final aprovada'
+        email.save()
+        self.assertEqual(self.ids('aprovada'), [email.pk])
+        self.assertEqual(self.ids('inicial'), [])
+
+        EmailMessage.objects.bulk_create([EmailMessage(subject='Lote', content=f'fatura {i}', sender='a@b.com')
+                                          for i in range(3)])
+        self.assertEqual(len(self.ids('fatura')), 3)
+        email.delete()
+        self.assertEqual(self.ids('aprovada'), [])
+
+    def test_triggers_need_no_python_functions(self):
+        email = self.create('Aviso', 'Multa de trânsito')
+        other = self.create('Aviso', 'Fatura vencida')
+
+        # Como no sqlite3 ou no dbshell: a função que a migração 0010 registrou não existe
+        connection.connection.create_function('email_body_text', 2, None)
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE email_analyzer_emailmessage SET subject = 'Infração' WHERE id = %s", [email.pk])
+            cursor.execute("DELETE FROM email_analyzer_emailmessage WHERE id = %s", [other.pk])
+
+        self.assertEqual(self.ids('infracao transito'), [email.pk])
+        self.assertEqual(self.ids('aviso'), [])
+        self.assertEqual(self.ids('fatura'), [])
+
+    def test_relevance_ranks_only_the_newest_matches(self):
+        old = self.create('Fatura', 'Fatura da fatura')
+        newer = [self.create('Aviso', f'Sobre a fatura {i}') for i in range(3)]
+
+        self.assertEqual(self.ids('fatura')[0], old.pk)
+        with mock.patch('config.SEARCH_RANK_WINDOW', 2):
+            self.assertEqual(sorted(self.ids('fatura')), sorted(e.pk for e in newer[1:]))
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        self.create('Aviso', '<script>alert(1)</script> reunião amanhã')
+        snippet = search.search('reuniao')['results'][0]['snippet']
+
+        self.assertIn('<mark>reunião</mark>', snippet)
+        self.assertNotIn('<script>', snippet)
+
+    def test_api_pages_results(self):
+        emails = [self.create(f'Fatura {i}', 'Pagamento pendente') for i in range(5)]
+
+        first = self.client.get('/api/email/search/', {'q': 'pagamento', 'page_size': 2, 'order': 'recent'}).json()
+        self.assertEqual([r['id'] for r in first['results']], [emails[4].pk, emails[3].pk])
+        self.assertTrue(first['has_next'])
+        last = self.client.get('/api/email/search/', {'q': 'pagamento', 'page_size': 2, 'page': 3}).json()
+        self.assertEqual(len(last['results']), 1)
+        self.assertFalse(last['has_next'])
+
+        self.assertEqual(self.client.get('/api/email/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/email/search/', {'q': 'x', 'order': 'oldest'}).status_code, 400)
+
+    def test_negative_page_or_page_size_is_rejected(self):
+        for _ in range(4):
+            self.create('Reunião', 'Pauta da reunião')
+
+        for params in ({'page_size': -5}, {'page_size': 0}, {'page': -1}, {'page': 0}):
+            response = self.client.get('/api/email/search/', dict(params, q='reuniao', order='recent'))
+            self.assertEqual(response.status_code, 400, params)
+        # Chamadas diretas não viram LIMIT negativo (sem limite no SQLite)
+        self.assertEqual(len(search.search('reuniao', page_size=-5, order='recent')['results']), 1)
+
+    def test_admin_search_uses_index(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@b.com', 'senha'))
+        match = self.create('Contrato', 'Renovação do contrato anual')
+        self.create('Outro', 'Nada a ver')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/email_analyzer/emailmessage/', {'q': 'renovacao'})
+        self.assertEqual([e.pk for e in response.context['cl'].result_list], [match.pk])
+        self.assertTrue(any('MATCH' in q['sql'] for q in queries))
+        self.assertFalse(any('LIKE' in q['sql'] for q in queries))
+
+
+class TestBodyStore(TestCase):
+
+    MAILING = 'Aproveite nossa promoção de fim de ano com descontos exclusivos! ' * 30
+
+    def test_identical_bodies_are_stored_once_and_compressed(self):
+        first = EmailMessage.objects.create(subject='Oferta', content=self.MAILING, sender='a@loja.com',
+                                            suggested_response='Obrigado')
+        second = EmailMessage.objects.create(subject='Oferta', content=self.MAILING, sender='b@loja.com',
+                                             suggested_response='Obrigado')
+
+        self.assertEqual(first.content_body_id, second.content_body_id)
+        self.assertEqual(EmailBody.objects.count(), 2)
+        body = EmailBody.objects.get(pk=first.content_body_id)
+        self.assertEqual(body.codec, 'zlib')
+        self.assertLess(len(body.data), body.size / 10)
+        # Textos curtos não compensam a compressão
+        self.assertEqual(EmailBody.objects.get(pk=first.response_body_id).codec, 'none')
+        # Depois de gravar, o objeto lê o próprio texto sem consultar EmailBody
+        with self.assertNumQueries(0):
+            self.assertEqual(second.content, self.MAILING)
+        # e não volta a procurar os corpos ao salvar de novo
+        with self.assertNumQueries(1):
+            second.save(update_fields=['category'])
+
+        loaded = EmailMessage.objects.get(pk=second.pk)
+        self.assertEqual((loaded.content, loaded.suggested_response, loaded.preview),
+                         (self.MAILING, 'Obrigado', self.MAILING[:100]))
+
+    def test_bulk_writes_resolve_bodies(self):
+        emails = EmailMessage.objects.bulk_create([
+            EmailMessage(subject=f'Oferta {i}', content=self.MAILING, sender='a@loja.com', is_processed=True)
+            for i in range(50)
+        ])
+        self.assertEqual(EmailBody.objects.count(), 1)
+
+        enqueue('Projeto', 'Reunião sobre o relatório', 'a@b.com')
+        process_next_batch(EmailProcessor(load_model=False), 'w1')
+        done = EmailMessage.objects.with_bodies().get(subject='Projeto')
+        self.assertTrue(done.suggested_response)
+        self.assertEqual(EmailMessage.objects.with_bodies().get(pk=emails[7].pk).content, self.MAILING)
+
+    def test_codecs_round_trip(self):
+        for codec in ('zlib', 'none'):
+            self.assertEqual(body_store.decode(*reversed(body_store.encode(self.MAILING, codec))), self.MAILING)
+        with self.assertRaises(ValueError):
+            body_store.encode(self.MAILING, 'lzma')
+
+    def test_form_saves_content(self):
+        form = EmailMessageForm({'subject': 'Assunto', 'content': 'Corpo do email', 'sender': 'a@b.com'})
+        self.assertTrue(form.is_valid())
+        email = form.save()
+        self.assertEqual(EmailMessage.objects.get(pk=email.pk).content, 'Corpo do email')
+        self.assertEqual(EmailMessageForm(instance=email).initial['content'], 'Corpo do email')
+
+    def test_report_and_prune(self):
+        for i in range(4):
+            EmailMessage.objects.create(subject='Oferta', content=self.MAILING, sender='a@loja.com')
+        changed = EmailMessage.objects.create(subject='Outro', content='Texto antigo', sender='a@b.com')
+        changed.content = 'Texto novo'
+        changed.save()
+
+        report = body_store.space_report()
+        self.assertEqual((report['bodies'], report['unreferenced_bodies']), (3, 1))
+        self.assertGreater(report['dedup_ratio'], 3)
+        self.assertLess(report['stored_bytes'], report['logical_bytes'] / 20)
+
+        out = io.StringIO()
+        call_command('body_store_report', '--prune', stdout=out)
+        self.assertIn('1 corpos sem referência apagados', out.getvalue())
+        self.assertEqual(EmailBody.objects.count(), 2)
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        registry.dispose_processor()
+        patcher = mock.patch('email_analyzer.nlp_processor.load_backend', side_effect=fake_backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(registry.dispose_processor)
+
+    def test_api_request_records_every_stage(self):
+        payload = json.dumps({'subject': 'Reunião de projeto', 'content': 'Relatório do cliente para revisão',
+                              'sender': 'gerente@empresa.com'})
+        self.assertEqual(self.client.post('/api/email/process/', payload, content_type='application/json').status_code, 200)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        for stage in ('parse', 'preprocess', 'inference', 'confidence', 'response', 'db_save'):
+            self.assertIn(f'email_stage_duration_seconds_count{{stage="{stage}"}}', body)
+        self.assertIn('email_classifications_total{category="produtivo",path="model"}', body)
+        self.assertIn('email_model_load_seconds_count{backend="pytorch"}', body)
+        self.assertIn('email_inference_batch_size_bucket{kind="emails",le="1"}', body)
+
+    def test_histogram_exposition(self):
+        registry_ = metrics.Registry()
+        latency = registry_.histogram('job_seconds', 'Job latency', ['job'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            latency.observe(value, job='a"b')
+
+        lines = registry_.render().splitlines()
+        self.assertEqual(lines[:2], ['# HELP job_seconds Job latency', '# TYPE job_seconds histogram'])
+        self.assertEqual(lines[2:], [
+            'job_seconds_bucket{job="a\\"b",le="0.1"} 1',
+            'job_seconds_bucket{job="a\\"b",le="1"} 3',
+            'job_seconds_bucket{job="a\\"b",le="+Inf"} 4',
+            'job_seconds_sum{job="a\\"b"} 4.05',
+            'job_seconds_count{job="a\\"b"} 4',
+        ])
+        with self.assertRaises(ValueError):
+            latency.observe(1.0)
+
+    def test_workers_are_summed(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        directory = tmp.name
+        workers = []
+        for increment in (1, 2):
+            # Cada Registry faz o papel de um worker com o mesmo diretório
+            worker = metrics.Registry(directory, flush_interval=3600)
+            self.addCleanup(worker.close)
+            jobs = worker.counter('jobs_total', 'Jobs', ['kind'])
+            latency = worker.histogram('job_seconds', 'Job latency', buckets=(1.0,))
+            jobs.inc(increment, kind='x')
+            latency.observe(0.5 * increment)
+            workers.append(worker)
+        workers[1].close()  # worker encerrado: os valores vão para os totais dos mortos
+
+        body = workers[0].render()
+        self.assertIn('jobs_total{kind="x"} 3', body)
+        self.assertIn('job_seconds_bucket{le="1"} 2', body)
+        self.assertIn('job_seconds_count 2', body)
+        self.assertEqual(sorted(os.listdir(directory)),
+                         sorted(['.lock', metrics.DEAD_TOTALS, workers[0]._snapshot_path.name]))
+
+    def test_snapshots_of_dead_workers_are_folded(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        directory = Path(tmp.name)
+        # Worker morto sem atexit (SIGKILL): só o arquivo dele sobra
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        dead = directory / f"{process.pid}-deadbeef.json"
+        dead.write_text(json.dumps({'jobs_total': {'kind="x"': 5}}))
+
+        worker = metrics.Registry(str(directory), flush_interval=3600)
+        self.addCleanup(worker.close)
+        jobs = worker.counter('jobs_total', 'Jobs', ['kind'])
+        jobs.inc(kind='x')
+
+        self.assertIn('jobs_total{kind="x"} 6', worker.render())
+        self.assertFalse(dead.exists())
+        self.assertIn('jobs_total{kind="x"} 6', worker.render())
+
+    def test_disabled(self):
+        with mock.patch('config.METRICS_ENABLED', False):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            with mock.patch.object(metrics.STAGE_SECONDS, '_observe') as observe:
+                with metrics.stage('parse'):
+                    pass
+                observe.assert_not_called()
+
+
+def slow_classifier(texts, **kwargs):
+    """fake_classifier that takes long enough to be sampled"""
+    time.sleep(0.05)
+    return fake_classifier(texts)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TestProfiling(TestCase):
+
+    PAYLOAD = json.dumps({'subject': 'Reunião de projeto', 'content': 'Relatório do cliente',
+                          'sender': 'gerente@empresa.com'})
+
+    def setUp(self):
+        registry.dispose_processor()
+        self.addCleanup(registry.dispose_processor)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        for patcher in (
+            mock.patch('email_analyzer.nlp_processor.load_backend', return_value=slow_classifier),
+            mock.patch('config.PROFILE_DIR', self.directory),
+            mock.patch('config.PROFILING_HEADER_TOKEN', 'segredo'),
+            mock.patch.object(profiling.sampler, 'interval', 0.002),
+            # Cada requisição passa pelo modelo
+            mock.patch('config.RESULT_CACHE_ENABLED', False),
+            mock.patch('config.NEAR_DUPLICATE_ENABLED', False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, **headers):
+        return self.client.post('/api/email/process/', self.PAYLOAD, content_type='application/json', headers=headers)
+
+    def test_slow_requests_are_logged_with_stages(self):
+        log = Path(self.directory) / 'slow.jsonl'
+        with mock.patch('config.SLOW_REQUEST_MS', 10), mock.patch('config.SLOW_REQUEST_LOG', str(log)):
+            response = self.post()
+            self.client.get('/api/queue/stats/')
+
+        self.assertNotIn('X-Profile-Id', response)
+        records = [json.loads(line) for line in log.read_text().splitlines()]
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual((record['method'], record['path'], record['status']), ('POST', '/api/email/process/', 200))
+        self.assertGreaterEqual(record['stages_ms']['inference'], 50)
+        self.assertTrue({'parse', 'preprocess', 'confidence', 'response', 'db_save'} <= set(record['stages_ms']))
+        self.assertGreaterEqual(record['duration_ms'], sum(record['stages_ms'].values()))
+        # Sem PROFILING_ENABLED as pilhas não são amostradas
+        self.assertNotIn('profile_id', record)
+
+    def test_header_profiles_one_request(self):
+        self.assertNotIn('X-Profile-Id', self.post(x_profile='errado'))
+        self.assertEqual(profiling.list_profiles(), [])
+
+        response = self.post(x_profile='segredo')
+        profile_id = response['X-Profile-Id']
+        self.assertIn('inference;dur=', response['Server-Timing'])
+
+        # Só staff baixa os perfis
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 302)
+        from django.contrib.auth.models import User
+        User.objects.create_user('admin', password='x', is_staff=True)
+        self.client.login(username='admin', password='x')
+        listing = self.client.get('/api/profiles/').json()['profiles']
+        self.assertEqual([p['id'] for p in listing], [profile_id])
+        self.assertGreater(listing[0]['samples'], 0)
+
+        download = self.client.get(listing[0]['download_url'])
+        stacks = download.content.decode()
+        self.assertIn('slow_classifier (tests.py:', stacks)
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in stacks.splitlines()))
+        self.assertEqual(self.client.get('/api/profiles/..%2Fslow/').status_code, 404)
+
+        # Staff não precisa do token
+        self.assertIn('X-Profile-Id', self.post(x_profile='1'))
+
+
+class FakeInferenceBackend(InferenceBackend):
+    """Logits derived from the text length, no model files involved"""
+
+    name = 'fake'
+
+    def __init__(self, model_name='fake', noise=0.0):
+        self.noise = noise
+        super().__init__(model_name)
+
+    def _load(self):
+        self.id2label = {0: '1 star', 1: '5 stars'}
+        self.tokenizer = lambda texts, **kwargs: {
+            'input_ids': np.array([[len(text)] for text in texts])
+        }
+
+    def logits(self, encoded):
+        lengths = encoded['input_ids'][:, 0].astype(float)
+        return np.stack([lengths % 7 + 0.5, 3 + self.noise * np.ones_like(lengths)], axis=1)
+
+
+class TestInferenceBackends(TestCase):
+
+    def test_backend_is_pipeline_compatible(self):
+        backend = FakeInferenceBackend()
+
+        single = backend('abcdefg')
+        batch = backend(['a' * 6, 'b' * 7, 'c' * 13], batch_size=2)
+
+        self.assertEqual(single[0]['label'], '5 stars')
+        self.assertEqual([r['label'] for r in batch], ['1 star', '5 stars', '1 star'])
+        self.assertTrue(all(0.5 <= r['score'] <= 1.0 for r in batch))
+
+    def test_parity_check(self):
+        texts = ['x' * n for n in range(1, 30)]
+        reference = FakeInferenceBackend()
+
+        self.assertTrue(check_parity(FakeInferenceBackend(noise=0.001), reference, texts)['passed'])
+        self.assertFalse(check_parity(FakeInferenceBackend(noise=2.0), reference, texts)['passed'])
+
+    def test_processor_uses_selected_backend(self):
+        with mock.patch('email_analyzer.nlp_processor.load_backend', return_value=FakeInferenceBackend()) as load, \
+                mock.patch('config.INFERENCE_BACKEND', 'pytorch-int8'):
+            processor = EmailProcessor()
+            category, _ = processor.classify_email('Reunião', 'Relatório do projeto')
+
+        load.assert_called_once_with('pytorch-int8', mock.ANY)
+        self.assertIn(category, ('produtivo', 'improdutivo'))
+        self.assertIn('|fake|', processor.model_version)
+
+
+class WeightedBackend(FakeInferenceBackend):
+    """FakeInferenceBackend holding `megabytes` of resident, read-only weights"""
+
+    def __init__(self, megabytes):
+        self.megabytes = megabytes
+        super().__init__()
+
+    def _load(self):
+        super()._load()
+        self.weights = np.ones(self.megabytes * 1024 * 1024 // 8)
+
+    def logits(self, encoded):
+        # Lê os pesos sem escrever neles, como a inferência
+        self.weights[::4096].sum()
+        return super().logits(encoded)
+
+
+def load_gunicorn_config():
+    import importlib.util
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', BASE_DIR / 'gunicorn.conf.py')
+    module = importlib.util.module_from_spec(spec)
+    # Sem mexer no ambiente nem no gc do processo de testes
+    with mock.patch.dict(os.environ, {'GUNICORN_PRELOAD': 'true'}), mock.patch('gc.disable'):
+        spec.loader.exec_module(module)
+    return module
+
+
+@unittest.skipUnless(hasattr(os, 'fork') and os.path.exists('/proc/self/smaps_rollup'), "Linux only")
+class TestPreforkMemory(TestCase):
+    WEIGHTS_MB = 64
+
+    def setUp(self):
+        registry.dispose_processor()
+        self.addCleanup(registry.dispose_processor)
+        self.gunicorn = load_gunicorn_config()
+        for name, value in (('RESULT_CACHE_ENABLED', False), ('NEAR_DUPLICATE_ENABLED', False),
+                            ('BATCH_INFERENCE_ENABLED', False), ('PRELOAD_MODEL', True),
+                            ('LONG_EMAIL_MODE', False)):
+            patcher = mock.patch(f'config.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('email_analyzer.nlp_processor.load_backend',
+                             side_effect=lambda *args: WeightedBackend(self.WEIGHTS_MB))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def worker_memory(self, preload):
+        """Memory of a forked worker after it served one email, as gunicorn would run it"""
+        if preload:
+            registry.preload()
+        # A conexão do banco de testes não pode ser fechada
+        with mock.patch('django.db.connections.close_all'):
+            self.gunicorn.pre_fork(None, None)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_fd)
+                self.gunicorn.post_fork(None, None)
+                registry.get_processor().process_email('Reunião', 'Relatório do projeto', 'a@b.com')
+                os.write(write_fd, json.dumps(process_memory_mb()).encode())
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            output = pipe.read()
+        os.waitpid(pid, 0)
+        gc.unfreeze()
+        registry.dispose_processor()
+        return json.loads(output)
+
+    def test_preloaded_weights_are_shared_with_workers(self):
+        shared = self.worker_memory(preload=True)
+        private = self.worker_memory(preload=False)
+
+        # Sem preload cada worker tem a própria cópia dos pesos (USS); com preload
+        # eles continuam nas páginas do master e só entram pela metade no PSS
+        self.assertGreater(private['uss'] - shared['uss'], self.WEIGHTS_MB * 0.8)
+        self.assertGreater(private['pss'] - shared['pss'], self.WEIGHTS_MB * 0.3)
+
+
+class TestModelArtifacts(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model_dir = Path(directory.name)
+        (self.model_dir / 'config.json').write_text('{"id2label": {"0": "1 star"}}')
+        (self.model_dir / 'tokenizer').mkdir()
+        (self.model_dir / 'tokenizer' / 'vocab.txt').write_text('reunião\nprojeto\n')
+        (self.model_dir / 'model.safetensors').write_bytes(b'\x00' * 4096)
+        artifacts.write_manifest(self.model_dir)
+
+    def test_manifest_round_trip(self):
+        manifest = artifacts.verify(self.model_dir)
+
+        self.assertEqual(sorted(manifest), ['config.json', 'model.safetensors', 'tokenizer/vocab.txt'])
+        self.assertEqual(artifacts.revision(manifest), artifacts.revision(artifacts.verify(self.model_dir)))
+
+    def test_tampered_incomplete_or_unlisted_files_fail(self):
+        (self.model_dir / 'model.safetensors').write_bytes(b'\x01' * 4096)
+        with self.assertRaisesRegex(artifacts.ArtifactError, 'Checksum'):
+            artifacts.verify(self.model_dir)
+
+        (self.model_dir / 'model.safetensors').unlink()
+        with self.assertRaisesRegex(artifacts.ArtifactError, 'ausente'):
+            artifacts.verify(self.model_dir)
+
+        artifacts.write_manifest(self.model_dir)
+        (self.model_dir / 'pytorch_model.bin').write_bytes(b'\x02')
+        with self.assertRaisesRegex(artifacts.ArtifactError, 'pytorch_model.bin'):
+            artifacts.verify(self.model_dir)
+
+        (self.model_dir / artifacts.MANIFEST).unlink()
+        with self.assertRaisesRegex(artifacts.ArtifactError, 'export_model'):
+            artifacts.verify(self.model_dir)
+
+    def test_backend_loads_verified_directory_offline(self):
+        class LocalBackend(FakeInferenceBackend):
+            def _load(self):
+                self.source = self._local_source(self.model_name)
+                super()._load()
+
+        with mock.patch.dict(os.environ):
+            backend = LocalBackend(str(self.model_dir))
+            self.assertEqual(os.environ['HF_HUB_OFFLINE'], '1')
+
+            (self.model_dir / 'config.json').write_text('{}')
+            with self.assertRaises(artifacts.ArtifactError):
+                LocalBackend(str(self.model_dir))
+
+        self.assertEqual(backend.source, str(self.model_dir))
+        self.assertEqual(len(backend.revision), 12)
+
+
+class TestWarmup(TestCase):
+
+    def setUp(self):
+        registry.dispose_processor()
+        self.addCleanup(registry.dispose_processor)
+        warmup._reset()
+        self.addCleanup(warmup._reset)
+        patcher = mock.patch('config.LONG_EMAIL_MODE', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ready_only_after_warmup(self):
+        self.assertEqual(self.client.get('/ready/').status_code, 503)
+
+        with mock.patch('email_analyzer.nlp_processor.load_backend', return_value=FakeInferenceBackend()), \
+                mock.patch('config.WARMUP_INFERENCES', 3):
+            warmup.run()
+        response = self.client.get('/ready/')
+
+        self.assertEqual(response.status_code, 200)
+        status = response.json()
+        self.assertEqual((status['state'], status['backend'], status['model_loaded']), ('ready', 'fake', True))
+        self.assertEqual(len(status['warmup_latency_ms']), 3)
+        # /health/ continua dizendo só que o processo está no ar
+        self.assertEqual(self.client.get('/health/').status_code, 200)
+
+    def test_failed_model_load_is_not_ready(self):
+        with mock.patch('email_analyzer.nlp_processor.load_backend',
+                        side_effect=artifacts.ArtifactError('Checksum divergente: model.safetensors')):
+            warmup.run()
+        response = self.client.get('/ready/')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['state'], 'failed')
+        self.assertIn('Checksum divergente', response.json()['error'])
+
+        # Aceitando o classificador por palavras-chave
+        with mock.patch('config.READINESS_REQUIRE_MODEL', False):
+            warmup._reset()
+            warmup.run()
+            self.assertEqual(self.client.get('/ready/').json()['model_loaded'], False)
+            self.assertEqual(self.client.get('/ready/').status_code, 200)
+
+    def test_disabled_warmup_keeps_the_old_behaviour(self):
+        with mock.patch('config.WARMUP_ENABLED', False), mock.patch('threading.Thread') as thread:
+            warmup.start()
+            response = self.client.get('/ready/')
+
+        thread.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['state'], 'disabled')
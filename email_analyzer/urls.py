@@ -9,5 +9,16 @@ urlpatterns = [
     path("email/list/", views.email_list, name="email_list"),
     path("email/analytics/", views.email_analytics, name="email_analytics"),
     path("api/email/process/", views.api_process_email, name="api_process_email"),
+    path("api/email/process/async/", views.api_process_email_async, name="api_process_email_async"),
+    path("api/email/process/bulk/", views.api_process_bulk, name="api_process_bulk"),
+    path("api/email/submit/", views.api_submit_email, name="api_submit_email"),
+    path("api/email/search/", views.api_search_emails, name="api_search_emails"),
+    path("api/email/<int:email_id>/", views.api_email_detail, name="api_email_detail"),
+    path("api/email/<int:email_id>/status/", views.api_email_status, name="api_email_status"),
+    path("api/queue/stats/", views.api_queue_stats, name="api_queue_stats"),
+    path("api/inference/stats/", views.api_inference_stats, name="api_inference_stats"),
+    path("metrics", views.metrics_view, name="metrics"),
+    path("api/profiles/", views.api_profiles, name="api_profiles"),
+    path("api/profiles/<str:profile_id>/", views.api_profile_download, name="api_profile_download"),
 ]
 
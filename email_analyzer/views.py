@@ -1,14 +1,25 @@
 import re
+from datetime import date, timedelta
+from django.utils import timezone
 from django.utils.timezone import datetime
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import render
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
 from django.shortcuts import redirect
-from email_analyzer.forms import LogMessageForm, EmailMessageForm
+from email_analyzer.forms import LogMessageForm, EmailMessageForm, EmailListFilterForm
 from email_analyzer.models import LogMessage, EmailMessage
 from django.views.generic import ListView
 from django.views.decorators.csrf import csrf_exempt
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
-from .nlp_processor import EmailProcessor
+from .bulk import iter_records, stream_ndjson
+from .concurrency import api_limiter, run_inference
+import config
+from . import metrics, profiling, rollups, search
+from .pagination import decode_cursor, keyset_page
+from .registry import get_processor, is_loaded
+from .work_queue import enqueue, queue_stats
+import asyncio
 import json
 
 def home(request):
@@ -39,7 +50,7 @@ def email_processor(request):
             email = form.save(commit=False)
             
             # Process email using NLP
-            processor = EmailProcessor()
+            processor = get_processor()
             results = processor.process_email(
                 email.subject, 
                 email.content, 
@@ -51,7 +62,8 @@ def email_processor(request):
             email.confidence_score = results['confidence_score']
             email.suggested_response = results['suggested_response']
             email.is_processed = True
-            email.save()
+            with metrics.stage('db_save'):
+                email.save()
             
             return render(request, "email_analyzer/email_result.html", {
                 "email": email,
@@ -63,47 +75,129 @@ def email_processor(request):
     return render(request, "email_analyzer/email_processor.html", {"form": form})
 
 def email_list(request):
-    """View to list all processed emails"""
-    emails = EmailMessage.objects.all()
-    return render(request, "email_analyzer/email_list.html", {"emails": emails})
+    """View to list emails one keyset page at a time, with server-side filters"""
+    filter_form = EmailListFilterForm(request.GET or None)
+    # Corpo e resposta sugerida (em EmailBody) só são carregados ao abrir um email
+    emails = filter_form.filter(EmailMessage.objects.defer('last_error'))
+    emails, next_cursor, previous_cursor = keyset_page(
+        emails, config.EMAIL_LIST_PAGE_SIZE,
+        after=decode_cursor(request.GET.get('after')),
+        before=decode_cursor(request.GET.get('before'))
+    )
+    
+    # Links de página preservam os filtros
+    query = request.GET.copy()
+    for key in ('after', 'before'):
+        query.pop(key, None)
+    return render(request, "email_analyzer/email_list.html", {
+        "emails": emails,
+        "filter_form": filter_form,
+        "filter_query": query.urlencode(),
+        "next_cursor": next_cursor,
+        "previous_cursor": previous_cursor
+    })
+
+def api_email_detail(request, email_id):
+    """Full content and suggested response of one email, loaded on demand by the list"""
+    email = get_object_or_404(EmailMessage.objects.with_bodies(), pk=email_id)
+    return JsonResponse({
+        'id': email.id,
+        'subject': email.subject,
+        'sender': email.sender,
+        'content': email.content,
+        'category': email.category,
+        'confidence_score': email.confidence_score,
+        'suggested_response': email.suggested_response
+    })
+
+def api_search_emails(request):
+    """Ranked full-text search over subject, sender and content"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({
+            'error': 'Missing search query (q)'
+        }, status=400)
+    order = request.GET.get('order', 'relevance')
+    if order not in search.ORDERS:
+        return JsonResponse({
+            'error': f"order must be one of: {', '.join(search.ORDERS)}"
+        }, status=400)
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', config.SEARCH_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({
+            'error': 'page and page_size must be integers'
+        }, status=400)
+    if page < 1 or page_size < 1:
+        return JsonResponse({
+            'error': 'page and page_size must be positive'
+        }, status=400)
+    
+    results = search.search(query, page=page, page_size=page_size, order=order)
+    if results['has_next']:
+        params = request.GET.copy()
+        params['page'] = results['page'] + 1
+        results['next_url'] = f"{request.path}?{params.urlencode()}"
+    return JsonResponse(results)
+
+@metrics.timed_stage('parse')
+def _parse_email_payload(body):
+    """Return (subject, content, sender), or None when a field is missing"""
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        return None
+    subject = data.get('subject', '')
+    content = data.get('content', '')
+    sender = data.get('sender', '')
+    
+    if not all([subject, content, sender]):
+        return None
+    return subject, content, sender
+
+def _email_fields(subject, content, sender, results):
+    return {
+        'subject': subject,
+        'content': content,
+        'sender': sender,
+        'category': results['category'],
+        'confidence_score': results['confidence_score'],
+        'suggested_response': results['suggested_response'],
+        'is_processed': True
+    }
+
+def _api_result(email, results):
+    return {
+        'id': email.id,
+        'category': results['category'],
+        'confidence_score': results['confidence_score'],
+        'suggested_response': results['suggested_response'],
+        'is_productive': results['is_productive'],
+        'decided_by': results['decided_by'],
+        'near_duplicate': results['near_duplicate']
+    }
 
 @csrf_exempt
 def api_process_email(request):
     """API endpoint for email processing"""
     if request.method == "POST":
         try:
-            data = json.loads(request.body)
-            subject = data.get('subject', '')
-            content = data.get('content', '')
-            sender = data.get('sender', '')
-            
-            if not all([subject, content, sender]):
+            payload = _parse_email_payload(request.body)
+            if payload is None:
                 return JsonResponse({
                     'error': 'Missing required fields'
                 }, status=400)
+            subject, content, sender = payload
             
             # Process email
-            processor = EmailProcessor()
+            processor = get_processor()
             results = processor.process_email(subject, content, sender)
             
             # Save to database
-            email = EmailMessage.objects.create(
-                subject=subject,
-                content=content,
-                sender=sender,
-                category=results['category'],
-                confidence_score=results['confidence_score'],
-                suggested_response=results['suggested_response'],
-                is_processed=True
-            )
+            with metrics.stage('db_save'):
+                email = EmailMessage.objects.create(**_email_fields(subject, content, sender, results))
             
-            return JsonResponse({
-                'id': email.id,
-                'category': results['category'],
-                'confidence_score': results['confidence_score'],
-                'suggested_response': results['suggested_response'],
-                'is_productive': results['is_productive']
-            })
+            return JsonResponse(_api_result(email, results))
             
         except json.JSONDecodeError:
             return JsonResponse({
@@ -118,11 +212,180 @@ def api_process_email(request):
         'error': 'Method not allowed'
     }, status=405)
 
+@csrf_exempt
+def api_process_bulk(request):
+    """Bulk API: JSON array or NDJSON in, one NDJSON result line per record out"""
+    if request.method != "POST":
+        return JsonResponse({
+            'error': 'Method not allowed'
+        }, status=405)
+    
+    # Ler o corpo como stream (request.body carregaria tudo na memória)
+    records = iter_records(request)
+    return StreamingHttpResponse(
+        stream_ndjson(records, get_processor()),
+        content_type='application/x-ndjson'
+    )
+
+@csrf_exempt
+def api_submit_email(request):
+    """Queue an email for background classification and return its status URL"""
+    if request.method != "POST":
+        return JsonResponse({
+            'error': 'Method not allowed'
+        }, status=405)
+    
+    try:
+        payload = _parse_email_payload(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'error': 'Invalid JSON'
+        }, status=400)
+    if payload is None:
+        return JsonResponse({
+            'error': 'Missing required fields'
+        }, status=400)
+    
+    email = enqueue(*payload)
+    return JsonResponse({
+        'id': email.id,
+        'status': email.queue_status,
+        'status_url': reverse('api_email_status', args=[email.id])
+    }, status=202)
+
+def api_email_status(request, email_id):
+    """Status of a queued email, with the results once it is classified"""
+    email = get_object_or_404(EmailMessage.objects.select_related('response_body'), pk=email_id)
+    data = {'id': email.id, 'status': email.queue_status, 'attempts': email.attempts}
+    if email.is_processed:
+        data.update({
+            'category': email.category,
+            'confidence_score': email.confidence_score,
+            'suggested_response': email.suggested_response,
+            'is_productive': email.category == 'produtivo'
+        })
+    elif email.last_error:
+        data['error'] = email.last_error
+    return JsonResponse(data)
+
+def api_queue_stats(request):
+    """Queue depth by state"""
+    return JsonResponse(queue_stats())
+
+def _process_with_shared_processor(subject, content, sender):
+    return get_processor().process_email(subject, content, sender)
+
+@csrf_exempt
+async def api_process_email_async(request):
+    """Async API endpoint: inference on a bounded executor, async ORM save"""
+    if request.method != "POST":
+        return JsonResponse({
+            'error': 'Method not allowed'
+        }, status=405)
+    
+    try:
+        payload = _parse_email_payload(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'error': 'Invalid JSON'
+        }, status=400)
+    if payload is None:
+        return JsonResponse({
+            'error': 'Missing required fields'
+        }, status=400)
+    subject, content, sender = payload
+    
+    # Rejeitar cedo em vez de enfileirar sem limite
+    if not api_limiter.try_acquire():
+        return JsonResponse({
+            'error': 'Server busy, try again later'
+        }, status=503, headers={'Retry-After': '1'})
+    
+    try:
+        results = await run_inference(_process_with_shared_processor, subject, content, sender)
+        with metrics.stage('db_save'):
+            email = await EmailMessage.objects.acreate(**_email_fields(subject, content, sender, results))
+        return JsonResponse(_api_result(email, results))
+    except asyncio.TimeoutError:
+        return JsonResponse({
+            'error': 'Processing timed out'
+        }, status=504)
+    except Exception as e:
+        return JsonResponse({
+            'error': str(e)
+        }, status=500)
+    finally:
+        api_limiter.release()
+
+def api_inference_stats(request):
+    """API endpoint exposing batching, cache, cascade tier and async API statistics"""
+    if not is_loaded():
+        return JsonResponse({'model_loaded': False, 'batching': None, 'cache': None, 'tiers': None,
+                             'async_api': api_limiter.stats()})
+
+    processor = get_processor()
+    return JsonResponse({
+        'model_loaded': True,
+        'batching': processor.inference_stats(),
+        'cache': processor.cache.stats() if processor.cache else None,
+        'tiers': processor.tier_stats(),
+        'async_api': api_limiter.stats()
+    })
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: stage latencies, classifications, model load and batch sizes"""
+    if not config.METRICS_ENABLED:
+        return JsonResponse({
+            'error': 'Metrics are disabled'
+        }, status=404)
+    return HttpResponse(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@staff_member_required
+def api_profiles(request):
+    """Stored request profiles (slow or requested with X-Profile), newest first"""
+    profiles = profiling.list_profiles()
+    for profile in profiles:
+        profile['download_url'] = reverse('api_profile_download', args=[profile['id']])
+    return JsonResponse({'profiles': profiles})
+
+@staff_member_required
+def api_profile_download(request, profile_id):
+    """Folded stacks of one profile, for flamegraph.pl or speedscope"""
+    stacks = profiling.read_profile(profile_id)
+    if stacks is None:
+        return JsonResponse({
+            'error': 'Profile not found'
+        }, status=404)
+    return HttpResponse(stacks, content_type='text/plain; charset=utf-8', headers={
+        'Content-Disposition': f'attachment; filename="{profile_id}.folded"'
+    })
+
+ANALYTICS_RANGES = {'7': 7, '30': 30, '90': 90}
+
+def _analytics_range(request):
+    """Return (start, end, selected) from ?range=7|30|90|all or ?start=&end= (AAAA-MM-DD)"""
+    selected = request.GET.get('range', 'all')
+    start = end = None
+    if selected in ANALYTICS_RANGES:
+        end = timezone.localdate()
+        start = end - timedelta(days=ANALYTICS_RANGES[selected] - 1)
+    try:
+        if request.GET.get('start'):
+            start, selected = date.fromisoformat(request.GET['start']), 'custom'
+        if request.GET.get('end'):
+            end, selected = date.fromisoformat(request.GET['end']), 'custom'
+    except ValueError:
+        start = end = None
+        selected = 'all'
+    return start, end, selected
+
 def email_analytics(request):
-    """View for email analytics and statistics"""
-    total_emails = EmailMessage.objects.count()
-    productive_emails = EmailMessage.objects.filter(category='produtivo').count()
-    unproductive_emails = EmailMessage.objects.filter(category='improdutivo').count()
+    """View for email analytics and statistics, read from the daily rollup"""
+    start, end, selected_range = _analytics_range(request)
+    summary = rollups.summarize(start, end)
+    productive_emails = summary['productive']
+    unproductive_emails = summary['unproductive']
+    total_emails = productive_emails + unproductive_emails
     
     if total_emails > 0:
         productive_percentage = (productive_emails / total_emails) * 100
@@ -143,6 +406,11 @@ def email_analytics(request):
         'unproductive_emails': unproductive_emails,
         'productive_percentage': round(productive_percentage, 1),
         'unproductive_percentage': round(unproductive_percentage, 1),
+        'confidence_labels': rollups.BUCKET_LABELS,
+        'confidence_histogram': summary['histogram'],
+        'selected_range': selected_range,
+        'range_start': start,
+        'range_end': end,
         'recent_emails': recent_emails
     }
     
@@ -0,0 +1,136 @@
+"""
+Worker warm-up and readiness.
+
+A cold worker used to make its first requests pay for loading the model and
+for the first forward passes (allocator growth, thread pools, lazy kernels).
+run() does that before traffic arrives: it builds the shared processor (from
+MODEL_DIR when set, checksum-verified and offline) and classifies
+WARMUP_INFERENCES dummy emails through the same prediction path as requests.
+/ready/ answers 503 until it is done, so the Docker HEALTHCHECK or a load
+balancer only routes to hot workers; /health/ keeps meaning "process alive".
+
+The server entry points (web_django.wsgi/asgi) call start(), which warms up
+in a background thread. With gunicorn preload the model is loaded in the
+master, but inference must not run there (the inference thread pools do not
+survive fork), so gunicorn.conf.py sets WARMUP_AFTER_FORK and calls run() in
+each worker's post_fork, before it accepts connections.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict
+
+import config
+
+# Exemplos representativos; o segundo é longo e passa pelas janelas de tokens
+SAMPLES = [
+    "Precisamos agendar uma reunião com o cliente para revisar o relatório do projeto.",
+    " ".join(["O prazo de entrega do contrato foi alterado e a equipe precisa revisar o orçamento."] * 60),
+    "Parabéns pelo aniversário! Desejo um ótimo dia e muitas felicidades.",
+    "Segue em anexo a fatura do mês. Por favor, confirme o recebimento até sexta-feira.",
+]
+
+_lock = threading.Lock()
+_run_lock = threading.Lock()
+_state: Dict[str, Any] = {}
+
+
+def _reset() -> None:
+    with _lock:
+        _state.clear()
+        _state.update({
+            'state': 'cold',
+            'model_loaded': False,
+            'backend': None,
+            'model_dir': config.MODEL_DIR or None,
+            'load_seconds': None,
+            'warmup_seconds': None,
+            'warmup_latency_ms': [],
+            'error': None,
+            'pid': os.getpid(),
+        })
+
+
+def _update(**fields) -> None:
+    with _lock:
+        _state.update(fields)
+
+
+def status() -> Dict[str, Any]:
+    """Snapshot of this process's warm-up, with ``ready`` as /ready/ reports it"""
+    with _lock:
+        snapshot = dict(_state, warmup_latency_ms=list(_state['warmup_latency_ms']))
+    if not config.WARMUP_ENABLED and snapshot['state'] == 'cold':
+        # Sem aquecimento o worker aceita tráfego como antes, carregando na primeira requisição
+        snapshot['state'] = 'disabled'
+        snapshot['ready'] = True
+    else:
+        snapshot['ready'] = snapshot['state'] == 'ready' and (
+            snapshot['model_loaded'] or not config.READINESS_REQUIRE_MODEL
+        )
+    return snapshot
+
+
+def run() -> Dict[str, Any]:
+    """Load the model and run the dummy inferences in this process; returns status()"""
+    if not config.WARMUP_ENABLED:
+        return status()
+    with _run_lock:
+        if _state['state'] == 'ready':
+            return status()
+        _update(state='loading', error=None, pid=os.getpid())
+
+        from .registry import get_processor
+
+        started = time.perf_counter()
+        try:
+            processor = get_processor()
+        except Exception as e:
+            print(f"❌ Erro no aquecimento do modelo: {e}")
+            _update(state='failed', error=str(e))
+            return status()
+        classifier = processor.classifier
+        _update(
+            load_seconds=round(time.perf_counter() - started, 3),
+            model_loaded=classifier is not None,
+            backend=getattr(classifier, 'name', 'pipeline') if classifier is not None else None,
+            error=processor.load_error,
+        )
+        if classifier is None:
+            # Classificador por palavras-chave: não há o que aquecer
+            _update(state='failed' if config.READINESS_REQUIRE_MODEL else 'ready')
+            return status()
+
+        _update(state='warming')
+        latencies = []
+        try:
+            for index in range(config.WARMUP_INFERENCES):
+                text = processor.preprocess_text(SAMPLES[index % len(SAMPLES)])
+                started = time.perf_counter()
+                processor._predict_text(text)
+                latencies.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            print(f"❌ Erro no aquecimento do modelo: {e}")
+            _update(state='failed', error=f"Erro no aquecimento: {e}")
+            return status()
+        _update(
+            state='ready',
+            warmup_seconds=round(sum(latencies) / 1000, 3),
+            warmup_latency_ms=[round(latency, 1) for latency in latencies],
+        )
+    print(f"✅ Modelo aquecido em {sum(latencies):.0f} ms ({len(latencies)} inferências)")
+    return status()
+
+
+def start() -> None:
+    """Warm up in a background thread, unless disabled or left to gunicorn's post_fork"""
+    if not config.WARMUP_ENABLED or config.WARMUP_AFTER_FORK:
+        return
+    threading.Thread(target=run, name='model-warmup', daemon=True).start()
+
+
+_reset()
+# Um processo filho começa frio: o aquecimento do pai não vale para as threads dele
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
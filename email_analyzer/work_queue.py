@@ -0,0 +1,133 @@
+"""
+Database-backed classification queue.
+
+Submissions are stored with is_processed=False and picked up later by
+``manage.py classify_worker``. Workers claim pending rows in batches: with
+SELECT ... FOR UPDATE SKIP LOCKED where the database supports it (PostgreSQL),
+otherwise with a single conditional UPDATE that stamps a claim token (SQLite
+serializes writers, so two workers can never stamp the same row). Claims older
+than QUEUE_CLAIM_TIMEOUT are treated as abandoned and become pending again;
+rows that fail QUEUE_MAX_ATTEMPTS times stay unprocessed as failed. Results
+and failures are only written while the row still carries the worker's own
+token, so a worker whose claim was taken over cannot overwrite or count twice.
+"""
+
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+import config
+from .body_store import attach_bodies
+from .models import EmailMessage
+from .near_duplicates import index_emails
+from .rollups import record_emails
+
+
+def enqueue(subject: str, content: str, sender: str) -> EmailMessage:
+    """Store an email for background classification"""
+    return EmailMessage.objects.create(subject=subject, content=content, sender=sender, is_processed=False)
+
+
+def _claimable():
+    stale = timezone.now() - timedelta(seconds=config.QUEUE_CLAIM_TIMEOUT)
+    return EmailMessage.objects.filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale),
+        is_processed=False,
+        attempts__lt=config.QUEUE_MAX_ATTEMPTS,
+    )
+
+
+def claim_batch(worker_id: str, size: int = None) -> List[EmailMessage]:
+    """Claim up to size pending emails for this worker"""
+    size = size or config.QUEUE_BATCH_SIZE
+    token = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+    now = timezone.now()
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                _claimable().order_by('id').select_for_update(skip_locked=True).values_list('id', flat=True)[:size]
+            )
+            EmailMessage.objects.filter(id__in=ids).update(
+                claimed_by=token, claimed_at=now, attempts=F('attempts') + 1
+            )
+    else:
+        # O UPDATE reavalia as condições: uma linha já reivindicada não é tomada de novo
+        ids = list(_claimable().order_by('id').values_list('id', flat=True)[:size])
+        _claimable().filter(id__in=ids).update(
+            claimed_by=token, claimed_at=now, attempts=F('attempts') + 1
+        )
+    return list(EmailMessage.objects.filter(claimed_by=token).select_related('content_body').order_by('id'))
+
+
+def complete(emails: List[EmailMessage], results: List[Dict[str, Any]]) -> List[EmailMessage]:
+    """Write classification results back and release the claims; returns the emails still owned"""
+    emails = emails[:len(results)]
+    for email, result in zip(emails, results):
+        email.category = result['category']
+        email.confidence_score = result['confidence_score']
+        email.suggested_response = result['suggested_response']
+    # update() não passa pelo armazenamento dos textos: as respostas viram EmailBody antes
+    attach_bodies(emails)
+    completed = []
+    with transaction.atomic():
+        for email in emails:
+            # Reivindicação vencida e tomada por outro worker: o resultado dele prevalece
+            updated = EmailMessage.objects.filter(id=email.id, claimed_by=email.claimed_by).update(
+                category=email.category,
+                confidence_score=email.confidence_score,
+                response_body=email.response_body_id,
+                is_processed=True,
+                claimed_by='',
+                claimed_at=None,
+                last_error='',
+            )
+            if updated:
+                email.is_processed = True
+                email.claimed_by = ''
+                email.claimed_at = None
+                email.last_error = ''
+                completed.append(email)
+    # update() não dispara post_save
+    if config.NEAR_DUPLICATE_ENABLED:
+        index_emails(completed)
+    record_emails(completed)
+    return completed
+
+
+def fail(emails: List[EmailMessage], error: str) -> None:
+    """Release the claims so the emails are retried, keeping the error"""
+    EmailMessage.objects.filter(
+        id__in=[email.id for email in emails], claimed_by__in={email.claimed_by for email in emails}
+    ).update(claimed_by='', claimed_at=None, last_error=error[:2000])
+
+
+def process_next_batch(processor, worker_id: str, size: int = None) -> int:
+    """Claim, classify and store one batch; returns how many emails were claimed"""
+    emails = claim_batch(worker_id, size)
+    if not emails:
+        return 0
+    try:
+        results = processor.process_batch([(email.subject, email.content, email.sender) for email in emails])
+        complete(emails, results)
+    except Exception as e:
+        print(f"❌ Erro ao classificar lote da fila: {e}")
+        fail(emails, str(e))
+    return len(emails)
+
+
+def queue_stats() -> Dict[str, int]:
+    """Queue depth by state"""
+    stale = timezone.now() - timedelta(seconds=config.QUEUE_CLAIM_TIMEOUT)
+    unprocessed = Q(is_processed=False)
+    retryable = Q(attempts__lt=config.QUEUE_MAX_ATTEMPTS)
+    return EmailMessage.objects.aggregate(
+        pending=Count('id', filter=unprocessed & retryable & (Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale))),
+        processing=Count('id', filter=unprocessed & Q(claimed_at__gte=stale)),
+        failed=Count('id', filter=unprocessed & ~retryable & (Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale))),
+        done=Count('id', filter=Q(is_processed=True)),
+    )
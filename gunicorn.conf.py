@@ -0,0 +1,56 @@
+"""
+Configuração do gunicorn (lida de ./gunicorn.conf.py ou com -c gunicorn.conf.py).
+
+Com preload_app o master importa web_django.wsgi, que carrega o modelo
+(PRELOAD_MODEL) uma única vez antes do fork. Os workers herdam as páginas
+dos pesos por copy-on-write em vez de cada um carregar a sua cópia: com 3
+workers, a memória dos pesos deixa de ser paga 3 vezes.
+
+Para as páginas continuarem compartilhadas, a coleta de lixo fica desligada
+no master enquanto a aplicação carrega e os objetos criados até o fork são
+congelados (gc.freeze): a coleta nos workers não escreve nos cabeçalhos
+deles. GUNICORN_PRELOAD=false volta ao modelo antigo, um carregamento por
+worker (na primeira requisição, ou no boot do worker com PRELOAD_MODEL).
+
+As inferências de aquecimento (email_analyzer/warmup.py) rodam em cada worker
+no post_fork, antes de ele aceitar conexões, e não no master: os pools de
+threads da inferência não sobrevivem ao fork.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '3'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+if preload_app:
+    # Lido pelo config.py quando o wsgi.py é importado, logo depois deste arquivo
+    os.environ.setdefault('PRELOAD_MODEL', 'true')
+    os.environ.setdefault('WARMUP_AFTER_FORK', 'true')
+    # Sem coletas durante o carregamento: elas deixariam buracos nas páginas
+    # que os workers vão compartilhar
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    if not preload_app:
+        return
+    # Uma conexão aberta no master seria usada por vários processos ao mesmo tempo
+    from django.db import connections
+    connections.close_all()
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # Um worker morto sem passar pelo atexit (timeout, OOM) deixa o snapshot das métricas
+    from email_analyzer import metrics
+    metrics.REGISTRY.prune()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+        from email_analyzer import warmup
+        warmup.run()
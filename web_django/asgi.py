@@ -14,3 +14,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "web_django.settings")
 
 application = get_asgi_application()
+
+# Só o servidor carrega o modelo na inicialização (PRELOAD_MODEL); migrate,
+# collectstatic e os demais comandos do manage.py não passam por aqui
+from email_analyzer import warmup  # noqa: E402
+from email_analyzer.registry import preload  # noqa: E402
+
+preload()
+# Carrega e aquece o modelo antes do tráfego; /ready/ responde 503 até terminar
+warmup.start()
@@ -19,11 +19,18 @@ from django.urls import include, path
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.http import JsonResponse
 
+from email_analyzer import warmup
+
 def health_check(request):
     return JsonResponse({"status": "healthy", "message": "Django app running"})
 
+def readiness_check(request):
+    status = warmup.status()
+    return JsonResponse(status, status=200 if status["ready"] else 503)
+
 urlpatterns = [
     path("health/", health_check, name="health"),
+    path("ready/", readiness_check, name="ready"),
     path("", include("email_analyzer.urls")),
     path('admin/', admin.site.urls)
 ]